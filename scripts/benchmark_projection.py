@@ -0,0 +1,55 @@
+import importlib.util
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+PROJECTION_MODULE = Path(__file__).parent / ".." / "src" / "osm" / "core" / "projection.py"
+POINT_COUNTS = [100_000, 1_000_000, 5_000_000]
+REPEATS = 5
+
+
+def load_projection():
+    """
+    Load projection module straight from its file, the addon package itself needs bpy
+    """
+    spec = importlib.util.spec_from_file_location("projection", PROJECTION_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_time(func, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """Projection benchmark entry point"""
+    projection = load_projection()
+    rng = np.random.default_rng(0)
+    center_lat, center_lon = 43.723, 10.395
+
+    for count in POINT_COUNTS:
+        # Points spread over a box about 10 km wide
+        lat = center_lat + rng.uniform(-0.05, 0.05, count)
+        lon = center_lon + rng.uniform(-0.07, 0.07, count)
+
+        for method, _, _ in projection.PROJECTION_ITEMS:
+            elapsed = best_time(projection.project, lat, lon,
+                                center_lat, center_lon, method)
+            print(f"{method:<20} {count:>10,} points: {elapsed * 1000:8.1f} ms "
+                  f"({count / elapsed / 1e6:6.1f} M points/s)")
+
+        x, y = projection.project(lat, lon, center_lat, center_lon)
+        elapsed = best_time(projection.to_local, x, y)
+        print(f"{'float32 cast':<20} {count:>10,} points: {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare depsgraph evaluation of sidewalks built as beveled curves and as one ribbon mesh.
+
+Runs inside Blender:
+    blender --background --factory-startup --python scripts/benchmark_sidewalks.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+# Core modules are imported as a top-level "core" package, the addon package itself
+# needs to be installed
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "osm"))
+from core.polylines import offsets_from_lengths  # noqa: E402
+from core.roads import HIGHWAY_WIDTHS, build_sidewalks  # noqa: E402
+
+
+SIDEWALK_COUNTS = [1_000, 5_000]
+POINTS_PER_SIDEWALK = 6
+REPEATS = 5
+
+
+def random_sidewalks(count: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Short random walks spread over a 2 km square
+    """
+    starts = rng.uniform(-1000, 1000, (count, 1, 2))
+    steps = rng.normal(0, 15, (count, POINTS_PER_SIDEWALK, 2))
+    steps[:, 0] = 0
+    coords = (starts + np.cumsum(steps, axis=1)).reshape(-1, 2).astype(np.float32)
+    return coords, offsets_from_lengths(np.full(count, POINTS_PER_SIDEWALK))
+
+
+def build_curves(coords, offsets) -> list:
+    objects = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        curve_data = bpy.data.curves.new('Sidewalk', type='CURVE')
+        curve_data.dimensions = '3D'
+        curve_data.bevel_depth = HIGHWAY_WIDTHS['sidewalk'] / 2.0
+        curve_data.bevel_resolution = 1
+        polyline = curve_data.splines.new('POLY')
+        polyline.points.add(end - start - 1)
+        for i, (x, y) in enumerate(coords[start:end]):
+            polyline.points[i].co = (x, y, 0.0, 1.0)
+        obj = bpy.data.objects.new('Sidewalk', curve_data)
+        bpy.context.collection.objects.link(obj)
+        objects.append(obj)
+    return objects
+
+
+def build_mesh(coords, offsets) -> list:
+    arrays = build_sidewalks(coords, offsets, np.arange(len(offsets) - 1))
+    mesh = bpy.data.meshes.new('Sidewalks')
+    mesh.vertices.add(len(arrays.vertices))
+    mesh.vertices.foreach_set("co", arrays.vertices.ravel())
+    mesh.loops.add(len(arrays.loop_vertices))
+    mesh.loops.foreach_set("vertex_index", arrays.loop_vertices)
+    mesh.polygons.add(len(arrays.loop_starts))
+    mesh.polygons.foreach_set("loop_start", arrays.loop_starts)
+    mesh.update(calc_edges=True)
+    obj = bpy.data.objects.new('Sidewalks', mesh)
+    bpy.context.collection.objects.link(obj)
+    return [obj]
+
+
+def evaluation_time(objects: list) -> float:
+    """
+    Best time of re-evaluating the tagged objects, what every edit touching them costs
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    best = float("inf")
+    for _ in range(REPEATS):
+        for obj in objects:
+            obj.data.update_tag()
+        start = time.perf_counter()
+        depsgraph.update()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj)
+    for curve in list(bpy.data.curves):
+        bpy.data.curves.remove(curve)
+    for mesh in list(bpy.data.meshes):
+        bpy.data.meshes.remove(mesh)
+
+
+def main():
+    """Sidewalk benchmark entry point"""
+    rng = np.random.default_rng(0)
+    for count in SIDEWALK_COUNTS:
+        coords, offsets = random_sidewalks(count, rng)
+        for label, build in (("curves", build_curves), ("mesh", build_mesh)):
+            clear_scene()
+            start = time.perf_counter()
+            objects = build(coords, offsets)
+            bpy.context.evaluated_depsgraph_get()
+            created = time.perf_counter() - start
+            elapsed = evaluation_time(objects)
+            print(f"{label:<8} {count:>7,} sidewalks: build {created * 1000:8.1f} ms, "
+                  f"evaluate {elapsed * 1000:8.1f} ms")
+    clear_scene()
+
+
+if __name__ == "__main__":
+    main()
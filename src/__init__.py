@@ -5,11 +5,14 @@ from bpy.props import PointerProperty
 from bpy.utils import register_class, unregister_class
 
 from .operators import MAPBRIDGE_OT_OpenWebInterface, MAPBRIDGE_OT_PasteCoordinates
-from .osm.operator import MAPBRIDGE_OT_RunOsmImport
+from .osm.lod import register_handlers, unregister_handlers
+from .osm.operator import MAPBRIDGE_OT_ApplyOsmChange, MAPBRIDGE_OT_PrefetchOsm, MAPBRIDGE_OT_RunOsmImport
 from .properties import MapBridgeProperties
 
 from .google_earth.operator import MAPBRIDGE_OT_OpenEarthWebsite, MAPBRIDGE_OT_RunGoogleEarthImport
 from .panel import MAPBRIDGE_PT_MainPanel
+from .scheduler import MAPBRIDGE_OT_ResumeBuild
+from .tracing import MAPBRIDGE_OT_SaveTrace
 
 from .google_earth.register_binaries import register_binaries
 
@@ -25,6 +28,10 @@ classes = [
     MAPBRIDGE_OT_RunGoogleEarthImport,
     MAPBRIDGE_OT_OpenEarthWebsite,
     MAPBRIDGE_OT_RunOsmImport,
+    MAPBRIDGE_OT_PrefetchOsm,
+    MAPBRIDGE_OT_ApplyOsmChange,
+    MAPBRIDGE_OT_ResumeBuild,
+    MAPBRIDGE_OT_SaveTrace,
     MAPBRIDGE_OT_OpenWebInterface,
     MAPBRIDGE_OT_PasteCoordinates,
 ]
@@ -44,8 +51,12 @@ def register():
     for prop in properties:
         setattr(bpy.types.Scene, prop.name, PointerProperty(type=prop))
 
+    register_handlers()
+
 
 def unregister():
+    unregister_handlers()
+
     # unregister classes
     for cls in classes:
         unregister_class(cls)
@@ -1,13 +1,64 @@
 import bpy
+import hashlib
+import json
 import os
 import platform
 import shutil
 import glob
 import subprocess
+import threading
+import time
 import webbrowser
 from decimal import Context
 
+from bpy.types import Event, Object
 from .._types import OperatorReturnItems
+from ..library import LIBRARY_COLLECTION_NAME, LibraryCache, headless_steps, link_library, write_library
+from ..osm.core.trace import Tracer, traced_steps
+from ..scheduler import WAIT, BuilderOperator, SceneBuilder
+from ..tracing import finish_trace, start_trace
+
+
+TEXTURES_PER_STEP = 100
+
+
+def import_model(model_path: str, override: dict | None = None) -> list[Object]:
+    """
+    Import an exported model, returns the objects it created.
+
+    override holds the window, area and region to run the importer in. Builder steps run from
+    timers, which have no window, and the importer's poll fails without one.
+    """
+    before = set(bpy.data.objects)
+    with bpy.context.temp_override(**(override or {})):
+        bpy.ops.wm.obj_import(filepath=model_path)
+    return [obj for obj in bpy.data.objects if obj not in before]
+
+
+def earth_library_key(binary_path: str, bbox: tuple[float, float, float, float]) -> str | None:
+    """
+    Library key of an area exported by a binary, identified by path, size and modification
+    time. None when the binary can't be read.
+    """
+    try:
+        stat = os.stat(binary_path)
+    except OSError:
+        return None
+    text = json.dumps([os.path.abspath(binary_path), stat.st_size, stat.st_mtime_ns, list(bbox)])
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def write_model_library(model_path: str, path: str) -> None:
+    """
+    Headless pass: import an exported model and write it to a library file
+    """
+    objects = import_model(model_path)
+    for texture in bpy.data.textures:
+        texture.extension = 'EXTEND'
+    collection = bpy.data.collections.new(LIBRARY_COLLECTION_NAME)
+    for obj in objects:
+        collection.objects.link(obj)
+    write_library(collection, path)
 
 
 class MAPBRIDGE_OT_OpenEarthWebsite(bpy.types.Operator):
@@ -22,7 +73,139 @@ class MAPBRIDGE_OT_OpenEarthWebsite(bpy.types.Operator):
         return {'FINISHED'}
 
 
-class MAPBRIDGE_OT_RunGoogleEarthImport(bpy.types.Operator):
+class EarthImport:
+    """
+    Scene steps and final report of one import, kept off the operator since a paused import
+    is finished by the resume operator. override is the window, area and region the import
+    was started from, the model is imported there.
+    """
+
+    def __init__(self, tracer: Tracer, libraries: LibraryCache | None = None, override: dict | None = None,
+                 library_key: str | None = None, max_age: float | None = None):
+        self.tracer = tracer
+        self.libraries = libraries
+        self.override = override
+        # Areas are only exported again once their library is older than max_age
+        self.library_key = (library_key or LibraryCache.new_key()) if libraries is not None else None
+        self.library_path = libraries.path(self.library_key) if libraries is not None else None
+        self.max_age = max_age
+        self.model_path: str | None = None
+
+    def find_latest_model(self, obj_dir):
+        """
+        Found the latest created model.sc.obj file with formatted model
+        """
+        date_folders = glob.glob(os.path.join(obj_dir, "*-*-*T*-*-*.*"))
+
+        if not date_folders:
+            return None
+
+        # Sort by creation date (take the latest)
+        date_folders.sort(key=lambda x: os.path.getctime(x))
+        latest_folder = date_folders[-1]
+
+        model_path = os.path.join(latest_folder, "model.sc.obj")
+
+        if os.path.exists(model_path):
+            return model_path
+
+        return None
+
+    def forward_output(self, process):
+        """
+        Print console logs of the export binary from a background thread
+        """
+        def forward():
+            for line in process.stdout:
+                line = line.strip()
+                if line:
+                    print(f"GOOGLE EARTH IMPORT: {line}")
+
+        threading.Thread(target=forward, daemon=True).start()
+
+    def import_steps(self, binary_path, bbox_string, temp_export_dir, obj_dir, library=None):
+        """
+        Export the area with the binary, then import and set up the model. The export runs
+        outside Blender, the steps only poll it.
+
+        With library, a (parent, scene, view_layer, override) tuple, the model is imported by
+        a headless Blender into a library file that is linked instead.
+        """
+        tracer = self.tracer
+        if library is not None and self.libraries.get(self.library_key, self.max_age) is not None:
+            with tracer.span("link library", "scene", bytes=os.path.getsize(self.library_path)):
+                link_library(self.library_path, *library)
+            yield 1
+            return
+
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [binary_path, bbox_string],
+            cwd=temp_export_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            bufsize=1
+        )
+        self.forward_output(process)
+
+        # Wait till process ends
+        while process.poll() is None:
+            yield WAIT
+        print(f"GOOGLE EARTH IMPORT: export exited with {process.returncode}")
+
+        # Found created model
+        model_path = self.find_latest_model(obj_dir)
+        tracer.add("export", start, time.perf_counter(), "external", "earth export",
+                   exit_code=process.returncode, bytes=os.path.getsize(model_path) if model_path else 0)
+        if not model_path:
+            raise FileNotFoundError("Model not found after export")
+        self.model_path = model_path
+
+        if library is not None:
+            yield from headless_steps('google_earth.operator', 'write_model_library',
+                                      model_path, self.library_path, tracer=tracer)
+            with tracer.span("link library", "scene", bytes=os.path.getsize(self.library_path)):
+                link_library(self.library_path, *library)
+            self.libraries.added(self.library_key)
+            yield 1
+            return
+
+        # Import model into Blender, a single call that can't be split
+        with tracer.span("import model", "scene", bytes=os.path.getsize(model_path)) as args:
+            args['items'] = len(import_model(model_path, self.override))
+        yield 1
+
+        # Setup textures
+        textures = list(bpy.data.textures)
+        for first in range(0, len(textures), TEXTURES_PER_STEP):
+            chunk = textures[first:first + TEXTURES_PER_STEP]
+            with tracer.span("textures", "scene", items=len(chunk)):
+                for texture in chunk:
+                    texture.extension = 'EXTEND'
+            yield len(chunk)
+
+    def finished(self, context, builder: SceneBuilder, report) -> set[OperatorReturnItems]:
+        finish_trace(self.tracer)
+        if builder.state == 'FAILED':
+            report({'ERROR'}, f"Error importing model: {builder.error}")
+            return {'CANCELLED'}
+
+        if self.library_path is not None and self.model_path is None:
+            report({'INFO'}, f"Model linked from existing library {self.library_path} "
+                             f"in {self.tracer.duration:.2f} s")
+            return {'FINISHED'}
+        if self.library_path is not None:
+            report({'INFO'}, f"Model {os.path.basename(self.model_path)} linked from library "
+                             f"{self.library_path} in {self.tracer.duration:.2f} s: {builder.summary()}")
+            return {'FINISHED'}
+        report(
+            {'INFO'}, f"Model {os.path.basename(self.model_path)} imported in {self.tracer.duration:.2f} s: "
+                      f"{builder.summary()}")
+        return {'FINISHED'}
+
+
+class MAPBRIDGE_OT_RunGoogleEarthImport(BuilderOperator, bpy.types.Operator):
     bl_idname = "google_earth.run"
     bl_label = "Google Earth Import"
 
@@ -62,26 +245,6 @@ class MAPBRIDGE_OT_RunGoogleEarthImport(bpy.types.Operator):
         else:
             raise OSError(f"Unsupported OS: {system}")
 
-    def find_latest_model(self, obj_dir):
-        """
-        Found the latest created model.sc.obj file with formatted model
-        """
-        date_folders = glob.glob(os.path.join(obj_dir, "*-*-*T*-*-*.*"))
-
-        if not date_folders:
-            return None
-
-        # Sort by creation date (take the latest)
-        date_folders.sort(key=lambda x: os.path.getctime(x))
-        latest_folder = date_folders[-1]
-
-        model_path = os.path.join(latest_folder, "model.sc.obj")
-
-        if os.path.exists(model_path):
-            return model_path
-
-        return None
-
     def cleanup_cache(self, obj_dir):
         """
         Clear cache folder
@@ -93,10 +256,10 @@ class MAPBRIDGE_OT_RunGoogleEarthImport(bpy.types.Operator):
         except Exception as e:
             print(f"Exception while cleaning cache folder: {e}")
 
-    def execute(self, context) -> set[OperatorReturnItems]:
+    def create_builder(self, context) -> SceneBuilder | None:
         scene = context.scene
         if not scene:
-            return {'CANCELLED'}
+            return None
 
         addon_dir = os.path.dirname(__file__)
 
@@ -104,7 +267,7 @@ class MAPBRIDGE_OT_RunGoogleEarthImport(bpy.types.Operator):
             binary_path, system = self.get_binary_path(addon_dir)
         except (OSError, FileNotFoundError) as e:
             self.report({'ERROR'}, str(e))
-            return {'CANCELLED'}
+            return None
 
         # Create temporary folder for export
         home_dir = os.path.expanduser("~")
@@ -119,62 +282,41 @@ class MAPBRIDGE_OT_RunGoogleEarthImport(bpy.types.Operator):
         map_bridge = scene.map_bridge
         bbox_string = self.create_bbox_string(
             system, map_bridge.minLat, map_bridge.minLng, map_bridge.maxLat, map_bridge.maxLng)
-        self.report({'INFO'}, f"Run binary with bbox: {bbox_string}")
-
-        # Run binary
-        try:
-            self.report({'INFO'}, f"Run export... {binary_path}")
-
-            process = subprocess.Popen(
-                [binary_path, bbox_string],
-                cwd=temp_export_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-
-            # Read console logs
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    print(f"GOOGLE EARTH IMPORT: {line}")
-
-                    if "done. saved as" in line:
-                        break
-
-            # Wait till process ends
-            awaited_process = process.wait()
-            self.report({'INFO'}, f"awaited_process: {awaited_process}")
+        self.report({'INFO'}, f"Run export {binary_path} with bbox: {bbox_string}")
+
+        library = None
+        bbox = (map_bridge.minLat, map_bridge.minLng, map_bridge.maxLat, map_bridge.maxLng)
+        state = EarthImport(start_trace("Google Earth import"),
+                            LibraryCache(map_bridge.libraryDirectory) if map_bridge.useLibrary else None,
+                            {'window': context.window, 'area': context.area, 'region': context.region},
+                            earth_library_key(binary_path, bbox), map_bridge.cacheTtlHours * 3600)
+        if map_bridge.useLibrary:
+            library = (context.collection, scene, context.view_layer, map_bridge.libraryOverride)
+
+        return SceneBuilder("Google Earth import",
+                            traced_steps(state.tracer, "create objects", state.import_steps(
+                                binary_path, bbox_string, temp_export_dir, obj_dir, library)),
+                            budget_ms=map_bridge.tickBudgetMs, on_finish=state.finished)
 
-        except subprocess.CalledProcessError as e:
-            self.report({'ERROR'}, f"Error in run binary: {e}")
-            return {'CANCELLED'}
-        except Exception as e:
-            self.report({'ERROR'}, f"Unexpected error: {e}")
+    def execute(self, context) -> set[OperatorReturnItems]:
+        builder = self.create_builder(context)
+        if builder is None:
             return {'CANCELLED'}
 
-        # Found created model
-        model_path = self.find_latest_model(obj_dir)
-        self.report({'INFO'}, f"model_path: {model_path}")
+        builder.run()
+        return self.builder_finished(context, builder)
 
-        if not model_path:
-            self.report({'ERROR'}, "Model not found after export")
+    def invoke(self, context, event: Event) -> set[OperatorReturnItems]:
+        """
+        Export and import without blocking the UI, Esc pauses
+        """
+        self._builder = self.create_builder(context)
+        if self._builder is None:
             return {'CANCELLED'}
 
-        # Import model into Blender
-        try:
-            bpy.ops.wm.obj_import(filepath=model_path)
-
-            # Setup textures
-            for texture in bpy.data.textures:
-                texture.extension = 'EXTEND'
-
-            self.report(
-                {'INFO'}, f"Model {model_path} imported: {os.path.basename(model_path)}")
-
-        except Exception as e:
-            self.report({'ERROR'}, f"Error importing model: {e}")
-            return {'CANCELLED'}
+        self._builder.start()
+        self.begin_modal(context)
+        return {'RUNNING_MODAL'}
 
-        return {'FINISHED'}
+    def modal(self, context, event: Event) -> set[OperatorReturnItems]:
+        return self.watch_builder(context, event)
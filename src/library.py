@@ -0,0 +1,151 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+
+import bpy
+from bpy.types import Collection, Scene, ViewLayer
+
+from .osm.core.store import FileStore
+from .osm.core.trace import Tracer
+from .scheduler import WAIT
+
+
+DEFAULT_LIBRARY_DIR = os.path.join(os.path.expanduser("~"), ".map-bridge", "libraries")
+DEFAULT_LIBRARY_MAX_BYTES = 2 * 1024 * 1024 * 1024
+LIBRARY_COLLECTION_NAME = "Map Bridge Library"
+COUNTS_KEY = "map_bridge_counts"  # buildings, roads, sidewalks of an OSM library
+
+_ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the headless Blender: import the addon package from its parent directory,
+# without registering it, and call one function with the arguments after "--"
+_HEADLESS_SCRIPT = (
+    "import importlib, sys; sys.path.insert(0, {parent!r}); "
+    "getattr(importlib.import_module({module!r}), {function!r})(*sys.argv[sys.argv.index('--') + 1:])"
+)
+
+
+class LibraryError(Exception):
+    """Headless library build failed exception"""
+
+
+class LibraryCache(FileStore):
+    """
+    Library .blend files, named by their key so identical imports share one file.
+
+    The files are written by the headless pass and recorded by added() once linked. A
+    library is reused until it is older than the max_age of the lookup, and the least
+    recently used ones are removed once the folder grows beyond max_bytes. Libraries
+    linked in the open file are kept.
+    """
+    body_suffix = ".blend"
+    created_field = 'written_at'
+
+    def __init__(self, directory: str = "", max_bytes: int = DEFAULT_LIBRARY_MAX_BYTES):
+        super().__init__(bpy.path.abspath(directory) or DEFAULT_LIBRARY_DIR, max_bytes)
+
+    @staticmethod
+    def new_key() -> str:
+        return uuid.uuid4().hex
+
+    def path(self, key: str) -> str:
+        return self._body_path(key)
+
+    def get(self, key: str, max_age: float | None = None) -> str | None:
+        """
+        Path of the library of key, None when missing or written more than max_age seconds
+        ago. Safe to call from a worker thread.
+        """
+        with self._lock:
+            record = self._lookup(key, max_age)
+        return self._body_path(key) if record is not None else None
+
+    def added(self, key: str) -> None:
+        """
+        Record a library file written by the headless pass, on the main thread
+        """
+        now = time.time()
+        with self._lock:
+            size = os.path.getsize(self._body_path(key))
+            self._write_record(key, {'written_at': now, 'accessed_at': now, 'size': size})
+            self._added(size)
+
+    def _evictable(self, key: str) -> bool:
+        path = os.path.normcase(os.path.abspath(self._body_path(key)))
+        return all(os.path.normcase(os.path.abspath(bpy.path.abspath(library.filepath))) != path
+                   for library in bpy.data.libraries)
+
+
+def headless_steps(module: str, function: str, *args: str, tracer: Tracer | None = None):
+    """
+    Call function(*args) of an addon module in a background Blender with factory settings,
+    yielding WAIT until it exits. The tracer gets the run as a span of its own track.
+    """
+    start = time.perf_counter()
+    parent, package = os.path.split(_ADDON_DIR)
+    script = _HEADLESS_SCRIPT.format(parent=parent, module=f"{package}.{module}", function=function)
+    process = subprocess.Popen(
+        [bpy.app.binary_path, '--background', '--factory-startup', '--python-exit-code', '1',
+         '--python-expr', script, '--', *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        bufsize=1
+    )
+
+    # Keep the pipe drained and the end of the log for the error message
+    tail = deque(maxlen=5)
+
+    def forward():
+        for line in process.stdout:
+            line = line.strip()
+            if line:
+                tail.append(line)
+                print(f"MAP BRIDGE LIBRARY: {line}")
+
+    reader = threading.Thread(target=forward, daemon=True)
+    reader.start()
+    while process.poll() is None:
+        yield WAIT
+    reader.join(timeout=1.0)
+    if tracer is not None:
+        tracer.add(f"headless {function}", start, time.perf_counter(), "external", "headless Blender",
+                   exit_code=process.returncode)
+    if process.returncode != 0:
+        raise LibraryError(f"Headless Blender exited with {process.returncode}: {' | '.join(tail)}")
+
+
+def write_library(collection: Collection, path: str) -> None:
+    """
+    Write a collection with everything it uses to a .blend file, replacing it atomically
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.blend"
+    bpy.data.libraries.write(tmp_path, {collection}, fake_user=True)
+    os.replace(tmp_path, path)
+
+
+def link_library(path: str, parent: Collection, scene: Scene, view_layer: ViewLayer,
+                 override: bool = False) -> Collection:
+    """
+    Link the library collection of a .blend file under parent, as an editable library
+    override when asked. Linked data stays in the library file, the working file only
+    references it.
+    """
+    with bpy.data.libraries.load(path, link=True) as (data_from, data_to):
+        if LIBRARY_COLLECTION_NAME not in data_from.collections:
+            raise LibraryError(f"No {LIBRARY_COLLECTION_NAME} collection in {path}")
+        data_to.collections = [LIBRARY_COLLECTION_NAME]
+    collection = data_to.collections[0]
+
+    if override:
+        collection = collection.override_hierarchy_create(scene, view_layer)
+        # Overrides are instantiated in the scene collection, move them under parent
+        if scene.collection != parent and collection in scene.collection.children.values():
+            scene.collection.children.unlink(collection)
+    if collection not in parent.children.values():
+        parent.children.link(collection)
+    return collection
@@ -0,0 +1,156 @@
+import bpy
+import numpy as np
+
+from .core.mesh_arrays import MeshArrays
+
+
+SPLINES_PER_STEP = 200
+
+
+def _attribute_type(values: np.ndarray) -> str:
+    if np.issubdtype(values.dtype, np.integer):
+        return 'INT'
+    return 'FLOAT'
+
+
+def fill_mesh_steps(mesh: bpy.types.Mesh, arrays: MeshArrays):
+    """
+    Fill an empty mesh from flat arrays using bulk foreach_set calls, yielding between the
+    uploads so a scheduler can spread a large mesh over several ticks.
+
+    Yields 0 after every upload and the face and loose edge count once done.
+    """
+    mesh.vertices.add(len(arrays.vertices))
+    mesh.vertices.foreach_set(
+        "co", np.ascontiguousarray(arrays.vertices, dtype=np.float32).ravel())
+    yield 0
+
+    mesh.loops.add(len(arrays.loop_vertices))
+    mesh.loops.foreach_set(
+        "vertex_index", np.ascontiguousarray(arrays.loop_vertices, dtype=np.int32))
+    yield 0
+
+    # Polygon sizes are derived from consecutive loop starts
+    mesh.polygons.add(len(arrays.loop_starts))
+    mesh.polygons.foreach_set(
+        "loop_start", np.ascontiguousarray(arrays.loop_starts, dtype=np.int32))
+    yield 0
+
+    if arrays.edges is not None:
+        mesh.edges.add(len(arrays.edges))
+        mesh.edges.foreach_set(
+            "vertices", np.ascontiguousarray(arrays.edges, dtype=np.int32).ravel())
+        yield 0
+
+    attributes = [(name, values, 'FACE') for name, values in arrays.face_attributes.items()]
+    if arrays.point_attributes is not None:
+        attributes += [(name, values, 'POINT') for name, values in arrays.point_attributes.items()]
+    for attr_name, values, domain in attributes:
+        attr_type = _attribute_type(values)
+        attribute = mesh.attributes.get(attr_name) or mesh.attributes.new(
+            attr_name, attr_type, domain)
+        dtype = np.int32 if attr_type == 'INT' else np.float32
+        attribute.data.foreach_set(
+            "value", np.ascontiguousarray(values, dtype=dtype))
+    yield 0
+
+    mesh.update(calc_edges=True)
+    yield arrays.element_count
+
+
+def create_mesh_steps(name: str, arrays: MeshArrays):
+    """
+    New mesh datablock filled step by step, returns the mesh
+    """
+    mesh = bpy.data.meshes.new(name)
+    yield from fill_mesh_steps(mesh, arrays)
+    return mesh
+
+
+def create_mesh(name: str, arrays: MeshArrays) -> bpy.types.Mesh:
+    """
+    Create mesh datablock from flat arrays in one go
+    """
+    steps = create_mesh_steps(name, arrays)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def replace_mesh(mesh: bpy.types.Mesh, arrays: MeshArrays) -> None:
+    """
+    Swap the geometry of an existing mesh, objects using it keep their settings
+    """
+    mesh.clear_geometry()
+    for _ in fill_mesh_steps(mesh, arrays):
+        pass
+
+
+def read_mesh(mesh: bpy.types.Mesh, attribute_names: tuple[str, ...] | None = ('osm_id',)) -> MeshArrays:
+    """
+    Flat arrays of an existing mesh with the given face attributes, the inverse of create_mesh.
+
+    None reads every integer and float face attribute that isn't internal to Blender.
+    """
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+
+    if attribute_names is None:
+        attribute_names = tuple(attribute.name for attribute in mesh.attributes
+                                if attribute.domain == 'FACE' and attribute.data_type in ('INT', 'FLOAT')
+                                and not attribute.name.startswith('.') and attribute.name != 'material_index')
+    face_attributes = {}
+    for name in attribute_names:
+        attribute = mesh.attributes.get(name)
+        if attribute is None or attribute.domain != 'FACE':
+            continue
+        dtype = np.int32 if attribute.data_type == 'INT' else np.float32
+        values = np.empty(len(mesh.polygons), dtype=dtype)
+        attribute.data.foreach_get("value", values)
+        face_attributes[name] = values
+
+    return MeshArrays(vertices.reshape(-1, 3), loop_vertices, loop_starts, face_attributes,
+                      len(np.unique(face_attributes['osm_id'])) if 'osm_id' in face_attributes else 0)
+
+
+def new_curve(name: str, bevel_depth: float) -> bpy.types.Curve:
+    """
+    Empty 3D curve datablock with a round bevel
+    """
+    curve_data = bpy.data.curves.new(name, type='CURVE')
+    curve_data.dimensions = '3D'
+    curve_data.bevel_depth = bevel_depth
+    curve_data.bevel_resolution = 1
+    return curve_data
+
+
+def fill_curve_steps(curve_data: bpy.types.Curve, coords: np.ndarray, offsets: np.ndarray):
+    """
+    Add one poly spline per polyline, yielding the number of splines added after every chunk
+    """
+    points = np.zeros((len(coords), 4), dtype=np.float32)
+    # Coords carry a third column once draped on the terrain
+    points[:, :coords.shape[1]] = coords
+    points[:, 3] = 1.0
+    for first in range(0, len(offsets) - 1, SPLINES_PER_STEP):
+        chunk = offsets[first:first + SPLINES_PER_STEP + 1]
+        for start, end in zip(chunk[:-1], chunk[1:]):
+            polyline = curve_data.splines.new('POLY')
+            polyline.points.add(end - start - 1)
+            polyline.points.foreach_set("co", points[start:end].ravel())
+        yield len(chunk) - 1
+
+
+def replace_curve(curve_data: bpy.types.Curve, coords: np.ndarray, offsets: np.ndarray) -> None:
+    """
+    Swap the splines of an existing curve, objects using it keep their settings
+    """
+    curve_data.splines.clear()
+    for _ in fill_curve_steps(curve_data, coords, offsets):
+        pass
@@ -0,0 +1,27 @@
+"""
+Run with runpy.run_path by every spawned pool worker before its first job, with PACKAGE and
+CORE_DIR passed in as globals.
+
+Registers this directory as the package PACKAGE, the import name the core has in the addon,
+so pickled functions and results resolve to the same modules and classes as in Blender.
+The packages above it get empty stand-ins: importing the addon __init__ needs bpy, which
+fails outside Blender.
+"""
+import importlib.machinery
+import importlib.util
+import sys
+import types
+
+
+_parts = PACKAGE.split('.')
+for _depth in range(1, len(_parts)):
+    _name = '.'.join(_parts[:_depth])
+    if _name not in sys.modules:
+        _module = types.ModuleType(_name)
+        _module.__path__ = []
+        sys.modules[_name] = _module
+
+if PACKAGE not in sys.modules:
+    _spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    _spec.submodule_search_locations = [CORE_DIR]
+    sys.modules[PACKAGE] = importlib.util.module_from_spec(_spec)
@@ -0,0 +1,29 @@
+from typing import NamedTuple
+import numpy as np
+
+
+class BBox(NamedTuple):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+
+    def split(self) -> list['BBox']:
+        """
+        Four equal quadrants
+        """
+        mid_lat = (self.min_lat + self.max_lat) / 2
+        mid_lon = (self.min_lon + self.max_lon) / 2
+        return [
+            BBox(self.min_lat, self.min_lon, mid_lat, mid_lon),
+            BBox(self.min_lat, mid_lon, mid_lat, self.max_lon),
+            BBox(mid_lat, self.min_lon, self.max_lat, mid_lon),
+            BBox(mid_lat, mid_lon, self.max_lat, self.max_lon),
+        ]
+
+    def contains(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """
+        Mask of the points inside the box, borders included
+        """
+        return (lat >= self.min_lat) & (lat <= self.max_lat) & \
+            (lon >= self.min_lon) & (lon <= self.max_lon)
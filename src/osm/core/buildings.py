@@ -0,0 +1,65 @@
+import numpy as np
+
+from .mesh_arrays import MeshArrays, empty_mesh_arrays, osm_id_attribute
+from .polylines import drop_repeated, filter_polylines, lengths, next_in_ring, owners, ring_areas
+
+
+DEFAULT_BUILDING_HEIGHT = 10.0
+
+
+def orient_counter_clockwise(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    owner = owners(offsets)
+    clockwise = ring_areas(coords, offsets) < 0
+    index = np.arange(len(coords))
+    flipped = offsets[:-1][owner] + offsets[1:][owner] - 1 - index
+    return coords[np.where(clockwise[owner], flipped, index)]
+
+
+def extrude_footprints(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                       heights: np.ndarray | None = None) -> MeshArrays:
+    """
+    Extrude all building footprints at once into walls plus bottom and top caps.
+
+    coords/offsets describe the footprint rings in local metres, way_ids holds the OSM id of
+    every ring and heights its extrusion height (DEFAULT_BUILDING_HEIGHT when omitted).
+    """
+    if heights is None:
+        heights = np.full(len(offsets) - 1, DEFAULT_BUILDING_HEIGHT)
+
+    coords, offsets = drop_repeated(coords, offsets, closed=True)
+    keep = lengths(offsets) >= 3
+    coords, offsets = filter_polylines(coords, offsets, keep)
+    way_ids = np.asarray(way_ids)[keep]
+    heights = np.asarray(heights, dtype=np.float64)[keep]
+    if len(coords) == 0:
+        return empty_mesh_arrays(('osm_id',))
+
+    coords = orient_counter_clockwise(coords, offsets)
+    owner = owners(offsets)
+    nxt = next_in_ring(offsets)
+    count = len(coords)
+    index = np.arange(count)
+
+    # Bottom ring first, top ring second
+    vertices = np.empty((2 * count, 3), dtype=np.float32)
+    vertices[:count, :2] = coords
+    vertices[:count, 2] = 0.0
+    vertices[count:, :2] = coords
+    vertices[count:, 2] = heights[owner]
+
+    # Bottom caps are wound backwards so they face down
+    bottom = offsets[:-1][owner] + offsets[1:][owner] - 1 - index
+    top = count + index
+    walls = np.stack([index, nxt, count + nxt, count + index], axis=1).ravel()
+    loop_vertices = np.concatenate([bottom, top, walls]).astype(np.int32)
+
+    ring_starts = offsets[:-1]
+    loop_starts = np.concatenate([
+        ring_starts,
+        count + ring_starts,
+        2 * count + 4 * index,
+    ]).astype(np.int32)
+
+    osm_id = osm_id_attribute(np.concatenate([way_ids, way_ids, way_ids[owner]]))
+
+    return MeshArrays(vertices, loop_vertices, loop_starts, {'osm_id': osm_id}, len(way_ids))
@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import os
+import time
+from typing import NamedTuple
+
+from .store import FileStore
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".map-bridge", "osm-cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+
+class CacheEntry(NamedTuple):
+    path: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+    fresh: bool
+
+    def conditional_headers(self) -> dict[str, str]:
+        """
+        Request headers for revalidating a stale entry
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def open(self) -> gzip.GzipFile:
+        """
+        Stream the decompressed body
+        """
+        return gzip.open(self.path, 'rb')
+
+
+class OsmCache(FileStore):
+    """
+    On-disk cache of OSM responses keyed by source URL and normalized bbox.
+
+    Bodies are stored gzip-compressed, as received from the server, next to a small JSON
+    record. Entries younger than ttl are served without touching the network, older ones
+    are revalidated, and the least recently used entries are evicted once the cache grows
+    beyond max_bytes.
+    """
+    body_suffix = ".osm.gz"
+    created_field = 'fetched_at'
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL):
+        super().__init__(directory, max_bytes)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(source: str, bbox: tuple[float, ...]) -> str:
+        normalized = ",".join(f"{value:.7f}" for value in bbox)
+        return hashlib.sha1(f"{source.rstrip('/')}|{normalized}".encode()).hexdigest()
+
+    def get(self, key: str) -> CacheEntry | None:
+        """
+        Cached entry, marked fresh when it is younger than ttl
+        """
+        with self._lock:
+            record = self._lookup(key)
+        if record is None:
+            return None
+
+        return CacheEntry(
+            path=self._body_path(key),
+            etag=record.get('etag'),
+            last_modified=record.get('last_modified'),
+            fetched_at=record['fetched_at'],
+            fresh=time.time() - record['fetched_at'] < self.ttl,
+        )
+
+    def digest(self, key: str) -> str | None:
+        """
+        Digest of the body of a fresh entry, None when the entry is missing or stale. It
+        identifies the data a fresh entry serves, the ETag of a server isn't always sent.
+        """
+        with self._lock:
+            record = self._read_record(key)
+            if record is None or time.time() - record['fetched_at'] >= self.ttl:
+                return None
+            if 'digest' not in record:
+                # Entries stored before bodies had digests
+                try:
+                    with open(self._body_path(key), 'rb') as f:
+                        record['digest'] = hashlib.sha1(f.read()).hexdigest()
+                except OSError:
+                    return None
+                self._write_record(key, record)
+            return record['digest']
+
+    def put(self, key: str, compressed: bytes, headers: dict[str, str]) -> None:
+        """
+        Store a gzip-compressed body with the validators from the response headers
+        """
+        now = time.time()
+        with self._lock:
+            self._store(key, lambda f: f.write(compressed), {
+                'etag': headers.get('etag'),
+                'last_modified': headers.get('last-modified'),
+                'digest': hashlib.sha1(compressed).hexdigest(),
+                'fetched_at': now,
+                'accessed_at': now,
+                'size': len(compressed),
+            })
+
+    def revalidated(self, key: str, headers: dict[str, str]) -> None:
+        """
+        Restart the ttl of an entry the server confirmed as unchanged (304)
+        """
+        with self._lock:
+            record = self._read_record(key)
+            if record is None:
+                return
+            record['fetched_at'] = time.time()
+            record['etag'] = headers.get('etag', record.get('etag'))
+            record['last_modified'] = headers.get(
+                'last-modified', record.get('last_modified'))
+            self._write_record(key, record)
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+import uuid
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .nodes import NodeTable
+from .polylines import offsets_from_lengths
+from .reader import OsmData, OsmWay
+from .store import FileStore
+
+
+DEFAULT_DATASET_DIR = os.path.join(os.path.expanduser("~"), ".map-bridge", "datasets")
+DEFAULT_DATASET_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DATASET_VERSION = 1
+
+
+class Dataset(NamedTuple):
+    """
+    Parsed OSM data of an import kept on disk, so later changes can be applied to it
+    """
+    data: OsmData
+    bbox: BBox  # area the data was loaded for
+
+
+class DatasetStore(FileStore):
+    """
+    Kept datasets, one .npz file per import referenced by its path from the objects built
+    from it.
+
+    Datasets are written by save_dataset, from the import worker or an osmChange update, and
+    recorded by added() afterwards. The least recently saved ones are removed once the folder
+    grows beyond max_bytes, except the datasets the open file still references.
+    """
+    body_suffix = ".npz"
+    created_field = 'saved_at'
+
+    def __init__(self, directory: str = DEFAULT_DATASET_DIR, max_bytes: int = DEFAULT_DATASET_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+        self._referenced: set[str] = set()
+
+    def new_path(self) -> str:
+        return self._body_path(uuid.uuid4().hex)
+
+    def added(self, path: str, referenced: Iterable[str] = ()) -> None:
+        """
+        Record a dataset saved at path, making room for it without removing any of the
+        referenced dataset paths
+        """
+        key = os.path.basename(path)[:-len(self.body_suffix)]
+        if not path.endswith(self.body_suffix) or not os.path.exists(path) \
+                or not os.path.samefile(os.path.dirname(path), self.directory):
+            return
+        now = time.time()
+        with self._lock:
+            self._referenced = {os.path.normcase(os.path.abspath(p)) for p in (*referenced, path)}
+            # A rewritten dataset replaces the size it was counted with
+            record = self._read_record(key)
+            if record is not None and self._total is not None:
+                self._total -= record['size']
+            size = os.path.getsize(path)
+            self._write_record(key, {'saved_at': now, 'accessed_at': now, 'size': size})
+            self._added(size)
+
+    def _evictable(self, key: str) -> bool:
+        return os.path.normcase(os.path.abspath(self._body_path(key))) not in self._referenced
+
+
+def save_dataset(path: str, dataset: Dataset) -> None:
+    """
+    Write the node table and ways as flat arrays, replacing the file atomically
+    """
+    data = dataset.data
+    refs = [way.refs for way in data.ways]
+    tags = json.dumps([way.tags for way in data.ways]).encode()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        version=np.array([DATASET_VERSION]),
+        bbox=np.array(dataset.bbox, dtype=np.float64),
+        node_ids=data.nodes.ids,
+        node_lat=data.nodes.lat,
+        node_lon=data.nodes.lon,
+        way_ids=np.array([way.id for way in data.ways], dtype=np.int64),
+        way_offsets=offsets_from_lengths(np.array([len(r) for r in refs], dtype=np.int64)),
+        way_refs=np.concatenate(refs) if refs else np.zeros(0, dtype=np.int64),
+        way_tags=np.frombuffer(tags, dtype=np.uint8),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_dataset(path: str) -> Dataset:
+    with np.load(path) as arrays:
+        if int(arrays['version'][0]) != DATASET_VERSION:
+            raise ValueError(f"Unsupported OSM dataset version in {path}")
+
+        offsets = arrays['way_offsets']
+        refs = arrays['way_refs']
+        tags = json.loads(arrays['way_tags'].tobytes().decode())
+        ways = [OsmWay(int(way_id), refs[start:end], way_tags)
+                for way_id, start, end, way_tags
+                in zip(arrays['way_ids'], offsets[:-1], offsets[1:], tags)]
+        nodes = NodeTable(arrays['node_ids'], arrays['node_lat'], arrays['node_lon'])
+        return Dataset(OsmData(nodes, ways), BBox(*arrays['bbox'].tolist()))
@@ -0,0 +1,366 @@
+import gzip
+import http.client
+import math
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .bbox import BBox
+from .cache import OsmCache
+from .reader import OsmData, OsmStreamParser, merge_osm_data, parse_osm
+from .trace import Tracer
+
+
+OSM_API_BASE_URL = "https://api.openstreetmap.org/api/0.6"
+DEFAULT_TILE_SIZE = 0.01  # degrees, about 1 km
+DEFAULT_MAX_WORKERS = 4
+
+# Statuses answered with a back off and retry
+THROTTLE_STATUSES = (429, 509)
+RETRY_STATUSES = THROTTLE_STATUSES + (500, 502, 503, 504)
+MAX_TILE_SPLITS = 3
+RESPONSE_CHUNK_SIZE = 64 * 1024
+GRID_TOLERANCE = 1e-9  # in tiles
+
+
+class DownloadError(Exception):
+    """OSM download errors exception"""
+
+
+def tile_index(tile: BBox, tile_size: float) -> tuple[int, int]:
+    """
+    Row and column of a grid tile
+    """
+    return round(tile.min_lat / tile_size), round(tile.min_lon / tile_size)
+
+
+def split_bbox(bbox: BBox, tile_size: float = DEFAULT_TILE_SIZE) -> list[BBox]:
+    """
+    Cells of a global grid aligned to tile_size degrees that cover the bbox.
+
+    Aligning to a global grid keeps tiles identical between overlapping imports.
+    """
+    # Tolerance keeps a bbox lying exactly on grid lines, e.g. a tile itself, from picking up
+    # its neighbours through rounding
+    first_row = math.floor(bbox.min_lat / tile_size + GRID_TOLERANCE)
+    last_row = max(first_row, math.ceil(bbox.max_lat / tile_size - GRID_TOLERANCE) - 1)
+    first_col = math.floor(bbox.min_lon / tile_size + GRID_TOLERANCE)
+    last_col = max(first_col, math.ceil(bbox.max_lon / tile_size - GRID_TOLERANCE) - 1)
+
+    return [
+        BBox(round(row * tile_size, 7), round(col * tile_size, 7),
+             round((row + 1) * tile_size, 7), round((col + 1) * tile_size, 7))
+        for row in range(first_row, last_row + 1)
+        for col in range(first_col, last_col + 1)
+    ]
+
+
+class TileSink:
+    """
+    Consumer of one response body: decompresses chunks as they arrive and feeds them to the
+    parser, keeping the compressed bytes only when they are going to be cached
+    """
+
+    def __init__(self, headers: dict[str, str], parse: bool = True, keep_compressed: bool = False):
+        self.gzipped = headers.get('content-encoding', '').lower() == 'gzip'
+        self._decompressor = zlib.decompressobj(
+            16 + zlib.MAX_WBITS) if self.gzipped else None
+        self._parser = OsmStreamParser() if parse else None
+        self._chunks = [] if keep_compressed else None
+        self.size = 0  # bytes received
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+        if self._parser is not None:
+            if self._decompressor is not None:
+                chunk = self._decompressor.decompress(chunk)
+            self._parser.feed(chunk)
+
+    @property
+    def remarks(self) -> list[str]:
+        return self._parser.remarks if self._parser is not None else []
+
+    def finish(self) -> OsmData | None:
+        if self._parser is None:
+            return None
+        if self._decompressor is not None:
+            self._parser.feed(self._decompressor.flush())
+        return self._parser.close()
+
+    def compressed(self) -> bytes:
+        body = b"".join(self._chunks or [])
+        return body if self.gzipped else gzip.compress(body, compresslevel=5)
+
+
+class AdaptiveBackoff:
+    """
+    Delay shared by all download threads: grows on throttling responses, decays on success
+    """
+
+    def __init__(self, initial: float = 1.0, maximum: float = 60.0):
+        self.initial = initial
+        self.maximum = maximum
+        self._delay = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    def wait(self) -> None:
+        delay = self._delay
+        if delay > 0:
+            time.sleep(delay + random.uniform(0, delay / 4))
+
+    def penalize(self, retry_after: float | None = None) -> None:
+        with self._lock:
+            delay = min(self.maximum, max(self.initial, self._delay * 2))
+            self._delay = max(delay, retry_after or 0.0)
+
+    def relax(self) -> None:
+        with self._lock:
+            self._delay = self._delay / 2 if self._delay > self.initial else 0.0
+
+
+class OsmDownloader:
+    """
+    Download a bbox from an OSM API compatible server as concurrently fetched tiles
+    """
+    max_tile_splits = MAX_TILE_SPLITS
+
+    def __init__(self, base_url: str = OSM_API_BASE_URL, tile_size: float = DEFAULT_TILE_SIZE,
+                 max_workers: int = DEFAULT_MAX_WORKERS, max_retries: int = 5, timeout: float = 60.0,
+                 cache: OsmCache | None = None, tracer: Tracer | None = None):
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported OSM API URL: {base_url}")
+
+        self.base_url = base_url
+        self.tile_size = tile_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.cache = cache
+        self.tracer = tracer
+        self.backoff = AdaptiveBackoff()
+
+        self._scheme = parts.scheme
+        self._netloc = parts.netloc
+        self._path = parts.path.rstrip('/')
+        self._local = threading.local()
+        self._connections: list[http.client.HTTPConnection] = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """
+        Persistent connection of the current thread
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self._scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(self._netloc, timeout=self.timeout)
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _drop_connection(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def map_path(self, bbox: BBox) -> str:
+        return f"{self._path}/map?bbox={bbox.min_lon},{bbox.min_lat},{bbox.max_lon},{bbox.max_lat}"
+
+    def request(self, path: str, headers: dict[str, str] | None = None,
+                sink_factory=None) -> tuple[int, dict[str, str], bytes | TileSink]:
+        """
+        GET path on the persistent connection, retrying throttled and failed requests.
+
+        Returns status, headers and the body of the first non-retryable response. With a
+        sink_factory a 200 body is streamed chunk by chunk into sink_factory(headers), a fresh
+        sink per attempt, and the sink is returned in place of the body.
+        """
+        headers = {'User-Agent': 'map-bridge',
+                   'Accept-Encoding': 'gzip', **(headers or {})}
+        for attempt in range(self.max_retries + 1):
+            self.backoff.wait()
+            try:
+                connection = self._connection()
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response_headers = {key.lower(): value
+                                    for key, value in response.getheaders()}
+
+                if response.status == 200 and sink_factory is not None:
+                    body = sink_factory(response_headers)
+                    while chunk := response.read(RESPONSE_CHUNK_SIZE):
+                        body.feed(chunk)
+                else:
+                    body = response.read()
+                    if response_headers.get('content-encoding', '').lower() == 'gzip':
+                        body = gzip.decompress(body)
+            except (OSError, http.client.HTTPException, zlib.error) as e:
+                # Stale keep-alive connections are reopened on the next attempt
+                self._drop_connection()
+                if attempt == self.max_retries:
+                    raise DownloadError(f"Request {path} failed: {e}") from e
+                self.backoff.penalize()
+                continue
+
+            if response.will_close:
+                self._drop_connection()
+
+            if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response_headers.get('retry-after')
+                self.backoff.penalize(
+                    float(retry_after) if retry_after and retry_after.isdigit() else None)
+                continue
+
+            if response.status not in THROTTLE_STATUSES:
+                self.backoff.relax()
+            return response.status, response_headers, body
+
+        raise DownloadError(f"Request {path} failed after {self.max_retries} retries")
+
+    def fetch_tile(self, bbox: BBox, parse: bool = True, depth: int = 0) -> OsmData | None:
+        """
+        Download one tile, from the cache when possible, parsing it while it streams in.
+
+        Tiles the server rejects as too large are split into quadrants. Without parse the
+        tile only ends up in the cache.
+        """
+        if self.tracer is None:
+            return self._fetch_tile(bbox, parse, depth, {})
+        with self.tracer.span("download tile", "download") as args:
+            return self._fetch_tile(bbox, parse, depth, args)
+
+    def _fetch_tile(self, bbox: BBox, parse: bool, depth: int, args: dict) -> OsmData | None:
+        key = self.cache.key(self.base_url, bbox) if self.cache is not None else None
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None and entry.fresh:
+            args['cached'] = True
+            return self._parse_cached(entry, parse)
+
+        def sink_factory(headers):
+            return TileSink(headers, parse=parse, keep_compressed=key is not None)
+
+        headers = entry.conditional_headers() if entry is not None else {}
+        status, response_headers, body = self.request(
+            self.map_path(bbox), headers, sink_factory)
+
+        if status == 304 and entry is not None:
+            self.cache.revalidated(key, response_headers)
+            args['cached'] = True
+            return self._parse_cached(entry, parse)
+        if status == 400 and depth < self.max_tile_splits:
+            parts = [self.fetch_tile(quadrant, parse, depth + 1)
+                     for quadrant in bbox.split()]
+            return merge_osm_data(parts) if parse else None
+        if status != 200:
+            raise DownloadError(
+                f"OSM API answered {status} for {bbox}: {body[:200].decode(errors='replace')}")
+
+        args['bytes'] = body.size
+        data = body.finish()
+        if data is not None:
+            args['items'] = len(data.ways)
+        self.check_remarks(body.remarks)
+        if key is not None:
+            self.cache.put(key, body.compressed(), response_headers)
+        return data
+
+    def cached_digests(self, tiles: list[BBox]) -> list[str] | None:
+        """
+        Digests of the fresh cached bodies covering the tiles, the quadrants of split tiles
+        included. None when any of them would be downloaded.
+        """
+        if self.cache is None:
+            return None
+        digests = []
+        for tile in tiles:
+            tile_digests = self._tile_digests(tile, 0)
+            if tile_digests is None:
+                return None
+            digests += tile_digests
+        return digests
+
+    def _tile_digests(self, bbox: BBox, depth: int) -> list[str] | None:
+        digest = self.cache.digest(self.cache.key(self.base_url, bbox))
+        if digest is not None:
+            return [digest]
+        if depth == self.max_tile_splits:
+            return None
+        digests = []
+        for quadrant in bbox.split():
+            quadrant_digests = self._tile_digests(quadrant, depth + 1)
+            if quadrant_digests is None:
+                return None
+            digests += quadrant_digests
+        return digests
+
+    def check_remarks(self, remarks: list[str]) -> None:
+        """
+        Hook for servers reporting errors inside a 200 response
+        """
+
+    @staticmethod
+    def _parse_cached(entry, parse: bool) -> OsmData | None:
+        if not parse:
+            return None
+        with entry.open() as f:
+            return parse_osm(f)
+
+    def _map_tiles(self, func, tiles: list[BBox], on_tile=None) -> list:
+        """
+        Run func on every tile, calling on_tile(done, total) as tiles complete.
+
+        An exception from on_tile, e.g. a cancelled import, stops pending tiles from starting.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tiles))))
+        try:
+            futures = [executor.submit(func, tile) for tile in tiles]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                if on_tile is not None:
+                    on_tile(done, len(tiles))
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.close()
+
+    def download(self, bbox: BBox, on_tile=None) -> OsmData:
+        """
+        Download all tiles covering the bbox concurrently and merge them
+        """
+        return self.download_tiles(split_bbox(bbox, self.tile_size), on_tile)
+
+    def download_tiles(self, tiles: list[BBox], on_tile=None) -> OsmData:
+        """
+        Download the given grid tiles concurrently and merge them
+        """
+        return merge_osm_data(self._map_tiles(self.fetch_tile, tiles, on_tile))
+
+    def prefetch(self, bboxes: list[BBox]) -> int:
+        """
+        Fill the cache with every tile covering the given areas without parsing them.
+
+        Returns the number of tiles covered.
+        """
+        if self.cache is None:
+            raise ValueError("Prefetching requires a cache")
+        tiles = list(dict.fromkeys(
+            tile for bbox in bboxes for tile in split_bbox(bbox, self.tile_size)))
+        return len(self._map_tiles(lambda tile: self.fetch_tile(tile, parse=False), tiles))
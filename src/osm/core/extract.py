@@ -0,0 +1,24 @@
+import os
+
+from .bbox import BBox
+from .pbf import read_pbf
+from .reader import OsmData, parse_osm
+
+
+EXTRACT_EXTENSIONS = ('.osm', '.osm.pbf', '.pbf')
+
+
+def read_extract(path: str, bbox: BBox, max_workers: int | None = None) -> OsmData:
+    """
+    Imported ways touching bbox and their nodes from a local .osm or .osm.pbf extract
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"OSM extract not found: {path}")
+
+    name = path.lower()
+    if name.endswith('.pbf'):
+        return read_pbf(path, bbox, max_workers)
+    if name.endswith('.osm'):
+        return parse_osm(path, bbox)
+    raise ValueError(
+        f"Unsupported OSM extract {os.path.basename(path)}, expected one of {', '.join(EXTRACT_EXTENSIONS)}")
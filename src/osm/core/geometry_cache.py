@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from .shared import aligned_layout
+from .store import FileStore
+
+
+DEFAULT_GEOMETRY_DIR = os.path.join(os.path.expanduser("~"), ".map-bridge", "geometry-cache")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+GEOMETRY_CACHE_VERSION = 2
+
+
+class GeometryCache(FileStore):
+    """
+    On-disk cache of finished import geometry, so repeated imports skip loading and building.
+
+    Every entry is one raw binary file of aligned arrays, read back memory-mapped, next to a
+    JSON record with the array layout and whatever metadata was stored with them. Entries of
+    an older format are dropped on read, and the least recently used ones are evicted once the
+    cache grows beyond max_bytes.
+    """
+    body_suffix = ".bin"
+    created_field = 'built_at'
+
+    def __init__(self, directory: str = DEFAULT_GEOMETRY_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        super().__init__(directory, max_bytes)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """
+        Key of an entry from JSON serialisable parts, the format version included
+        """
+        text = json.dumps([GEOMETRY_CACHE_VERSION, *parts], sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _valid(self, record: dict) -> bool:
+        return record.get('version') == GEOMETRY_CACHE_VERSION
+
+    def get(self, key: str, max_age: float | None = None) -> tuple[dict[str, np.ndarray], dict] | None:
+        """
+        Read-only memory-mapped arrays and metadata of an entry, None when missing, of an
+        older format or built more than max_age seconds ago
+        """
+        with self._lock:
+            record = self._lookup(key, max_age)
+        if record is None:
+            return None
+
+        if record['size'] == 0:
+            buffer = np.zeros(0, dtype=np.uint8)
+        else:
+            buffer = np.memmap(self._body_path(key), dtype=np.uint8, mode='r')
+        arrays = {name: np.ndarray(tuple(shape), np.dtype(dtype), buffer=buffer, offset=start)
+                  for name, dtype, shape, start in record['layout']}
+        return arrays, record['meta']
+
+    def put(self, key: str, arrays: dict[str, np.ndarray], meta: dict) -> None:
+        """
+        Store arrays and JSON serialisable metadata, replacing an older entry of the key
+        """
+        layout, size = aligned_layout(arrays)
+
+        def write(f):
+            for (_, _, _, start), array in zip(layout, arrays.values()):
+                f.seek(start)
+                f.write(np.ascontiguousarray(array).data)
+            f.truncate(size)
+
+        now = time.time()
+        with self._lock:
+            self._store(key, write, {
+                'version': GEOMETRY_CACHE_VERSION,
+                'built_at': now,
+                'accessed_at': now,
+                'size': size,
+                'layout': layout,
+                'meta': meta,
+            })
@@ -0,0 +1,83 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from .buildings import extrude_footprints
+from .mesh_arrays import MeshArrays
+from .polylines import drop_repeated, filter_polylines, lengths, take_polylines
+from .simplify import simplify_rings
+from .spatial import polyline_centroids
+
+
+LOD_CELL_SIZE = 250.0  # metres
+
+
+class LodLevel(NamedTuple):
+    min_area: float  # corners cutting off less than this many square metres are removed
+    distance: float  # camera distance from which the level is shown
+
+
+LOD_LEVELS = (
+    LodLevel(0.0, 0.0),
+    LodLevel(4.0, 300.0),
+    LodLevel(25.0, 1200.0),
+)
+
+
+class LodMesh(NamedTuple):
+    level: int
+    center: tuple[float, float]  # local coordinates of the cell centre
+    near: float
+    far: float  # inf for the coarsest level
+    ground: float = 0.0  # height of the cell centre on the terrain
+
+
+def build_building_lods(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                        cell_size: float = LOD_CELL_SIZE,
+                        levels: tuple[LodLevel, ...] = LOD_LEVELS) -> tuple[dict[str, MeshArrays], dict[str, LodMesh]]:
+    """
+    Buildings grouped into square cells by footprint centroid, with one mesh per cell and
+    level named "OSM_Buildings_LOD{level}_{x}_{y}".
+
+    Every level is simplified from the full footprints in one pass over all rings, cells are
+    then contiguous slices of the rings sorted by cell.
+    """
+    coords, offsets = drop_repeated(coords, offsets, closed=True)
+    keep = lengths(offsets) >= 3
+    coords, offsets = filter_polylines(coords, offsets, keep)
+    way_ids = np.asarray(way_ids)[keep]
+    if len(way_ids) == 0:
+        return {}, {}
+
+    cells = np.floor(polyline_centroids(coords, offsets) / cell_size).astype(np.int64)
+    keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    coords, offsets = take_polylines(coords, offsets, order)
+    way_ids = way_ids[order]
+    cell_starts = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+    meshes = {}
+    lods = {}
+    for level, lod_level in enumerate(levels):
+        far = levels[level + 1].distance if level + 1 < len(levels) else np.inf
+        level_coords, level_offsets = simplify_rings(coords, offsets, lod_level.min_area)
+        for (x, y), first, last in zip(keys.tolist(), cell_starts[:-1], cell_starts[1:]):
+            cell_offsets = level_offsets[first:last + 1]
+            arrays = extrude_footprints(level_coords[cell_offsets[0]:cell_offsets[-1]],
+                                        cell_offsets - cell_offsets[0], way_ids[first:last])
+            name = f"OSM_Buildings_LOD{level}_{x}_{y}"
+            meshes[name] = arrays
+            lods[name] = LodMesh(level, ((x + 0.5) * cell_size, (y + 0.5) * cell_size),
+                                 lod_level.distance, far)
+    return meshes, lods
+
+
+def lod_vertex_counts(meshes: dict[str, MeshArrays], lods: dict[str, LodMesh]) -> list[int]:
+    """
+    Total vertex count of every level
+    """
+    counts = [0] * (max((lod.level for lod in lods.values()), default=-1) + 1)
+    for name, lod in lods.items():
+        counts[lod.level] += len(meshes[name].vertices)
+    return counts
@@ -0,0 +1,125 @@
+from typing import NamedTuple
+import numpy as np
+
+
+OSM_ID_MAX = np.iinfo(np.int32).max
+
+
+class MeshArrays(NamedTuple):
+    """
+    Flat mesh description ready for bulk upload into a Blender mesh
+    """
+    vertices: np.ndarray  # (N, 3) float32
+    loop_vertices: np.ndarray  # (L,) int32, vertex index of every face corner
+    loop_starts: np.ndarray  # (P,) int32, first corner of every face
+    face_attributes: dict[str, np.ndarray]  # name -> (P,) int32 or float32
+    feature_count: int
+    edges: np.ndarray | None = None  # (E, 2) int32 loose edges, for meshes made of lines
+    point_attributes: dict[str, np.ndarray] | None = None  # name -> (N,) int32 or float32
+
+    @property
+    def element_count(self) -> int:
+        """
+        Faces plus loose edges
+        """
+        return len(self.loop_starts) + (len(self.edges) if self.edges is not None else 0)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.element_count == 0
+
+
+def osm_id_attribute(ids: np.ndarray) -> np.ndarray:
+    """
+    OSM ids as values of the int32 "osm_id" attribute, Blender integer attributes have 32
+    bits. Ids that don't fit raise instead of wrapping, wrapped ids would make osmChange
+    updates and incremental imports match the faces of other features.
+    """
+    ids = np.asarray(ids)
+    if len(ids) and (ids.max() > OSM_ID_MAX or ids.min() < -OSM_ID_MAX - 1):
+        outside = ids.max() if ids.max() > OSM_ID_MAX else ids.min()
+        raise ValueError(f"OSM id {outside} does not fit the 32-bit osm_id attribute")
+    return ids.astype(np.int32)
+
+
+def empty_mesh_arrays(attribute_names: tuple[str, ...] = ()) -> MeshArrays:
+    return MeshArrays(
+        vertices=np.zeros((0, 3), dtype=np.float32),
+        loop_vertices=np.zeros(0, dtype=np.int32),
+        loop_starts=np.zeros(0, dtype=np.int32),
+        face_attributes={name: np.zeros(0, dtype=np.int32)
+                         for name in attribute_names},
+        feature_count=0,
+    )
+
+
+def concatenate(parts: list[MeshArrays]) -> MeshArrays:
+    """
+    Merge several meshes into one, shifting vertex and loop indices
+    """
+    parts = [part for part in parts if not part.is_empty]
+    if not parts:
+        return empty_mesh_arrays()
+
+    vertex_shift = np.cumsum([0] + [len(p.vertices) for p in parts[:-1]])
+    loop_shift = np.cumsum([0] + [len(p.loop_vertices) for p in parts[:-1]])
+    names = parts[0].face_attributes.keys()
+
+    edges = None
+    if any(p.edges is not None for p in parts):
+        edges = np.concatenate([p.edges + shift for p, shift in zip(parts, vertex_shift)
+                                if p.edges is not None]).astype(np.int32)
+    point_attributes = None
+    if parts[0].point_attributes is not None:
+        point_attributes = {name: np.concatenate([p.point_attributes[name] for p in parts])
+                            for name in parts[0].point_attributes}
+
+    return MeshArrays(
+        vertices=np.concatenate([p.vertices for p in parts]),
+        loop_vertices=np.concatenate(
+            [p.loop_vertices + shift for p, shift in zip(parts, vertex_shift)]).astype(np.int32),
+        loop_starts=np.concatenate(
+            [p.loop_starts + shift for p, shift in zip(parts, loop_shift)]).astype(np.int32),
+        face_attributes={name: np.concatenate([p.face_attributes[name] for p in parts])
+                         for name in names},
+        feature_count=sum(p.feature_count for p in parts),
+        edges=edges,
+        point_attributes=point_attributes,
+    )
+
+
+def feature_ids(arrays: MeshArrays) -> np.ndarray:
+    """
+    Unique OSM ids of a mesh, read from its face or, for line meshes, point attributes
+    """
+    if 'osm_id' in arrays.face_attributes and len(arrays.loop_starts):
+        return np.unique(arrays.face_attributes['osm_id'])
+    if arrays.point_attributes is not None and 'osm_id' in arrays.point_attributes:
+        return np.unique(arrays.point_attributes['osm_id'])
+    return np.zeros(0, dtype=np.int32)
+
+
+def select_faces(arrays: MeshArrays, keep: np.ndarray) -> MeshArrays:
+    """
+    Keep only the faces where keep is True, dropping vertices no face uses anymore
+    """
+    sizes = np.diff(np.append(arrays.loop_starts, len(arrays.loop_vertices)))
+    loops = arrays.loop_vertices[np.repeat(keep, sizes)]
+
+    used = np.unique(loops)
+    remap = np.full(len(arrays.vertices), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+
+    loop_starts = np.zeros(np.count_nonzero(keep), dtype=np.int64)
+    np.cumsum(sizes[keep][:-1], out=loop_starts[1:])
+    face_attributes = {name: values[keep] for name, values in arrays.face_attributes.items()}
+    feature_count = len(np.unique(face_attributes['osm_id'])) \
+        if 'osm_id' in face_attributes else arrays.feature_count
+
+    return MeshArrays(
+        arrays.vertices[used],
+        remap[loops].astype(np.int32),
+        loop_starts.astype(np.int32),
+        face_attributes,
+        feature_count,
+    )
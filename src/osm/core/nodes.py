@@ -0,0 +1,84 @@
+import numpy as np
+
+from .polylines import filter_vertices, offsets_from_lengths
+
+
+class NodeTable:
+    """
+    OSM nodes as a sorted int64 id array with parallel float64 lat/lon arrays
+    """
+    __slots__ = ('ids', 'lat', 'lon')
+
+    def __init__(self, ids: np.ndarray, lat: np.ndarray, lon: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+
+        # Keep the first occurrence of duplicated ids
+        unique = np.ones(len(ids), dtype=bool)
+        unique[1:] = ids[1:] != ids[:-1]
+        order = order[unique]
+
+        self.ids = ids[unique]
+        self.lat = np.asarray(lat, dtype=np.float64)[order]
+        self.lon = np.asarray(lon, dtype=np.float64)[order]
+
+    @classmethod
+    def empty(cls) -> 'NodeTable':
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def resolve(self, refs: np.ndarray) -> np.ndarray:
+        """
+        Row index of every referenced id, -1 for ids missing from the table
+        """
+        refs = np.asarray(refs, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(len(refs), -1, dtype=np.int64)
+
+        index = np.searchsorted(self.ids, refs)
+        index[index == len(self.ids)] = 0
+        return np.where(self.ids[index] == refs, index, -1)
+
+    def take(self, rows: np.ndarray) -> 'NodeTable':
+        """
+        Sub-table with the given rows (an index or boolean mask array)
+        """
+        return NodeTable(self.ids[rows], self.lat[rows], self.lon[rows])
+
+    def keep_ids(self, ids: np.ndarray) -> 'NodeTable':
+        """
+        Sub-table with only the nodes whose id is in ids
+        """
+        return self.take(np.isin(self.ids, ids))
+
+
+def merge_node_tables(tables: list[NodeTable]) -> NodeTable:
+    """
+    Union of several tables, duplicated ids are kept once
+    """
+    if not tables:
+        return NodeTable.empty()
+    return NodeTable(
+        np.concatenate([table.ids for table in tables]),
+        np.concatenate([table.lat for table in tables]),
+        np.concatenate([table.lon for table in tables]),
+    )
+
+
+def resolve_refs(nodes: NodeTable, refs: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Resolve node refs of many ways in one search.
+
+    Returns node row indices of all ways concatenated and their offsets, refs missing
+    from the table are dropped.
+    """
+    counts = np.array([len(way_refs) for way_refs in refs], dtype=np.int64)
+    offsets = offsets_from_lengths(counts)
+    if not refs:
+        return np.zeros(0, dtype=np.int64), offsets
+
+    index = nodes.resolve(np.concatenate(refs))
+    return filter_vertices(index, offsets, index >= 0)
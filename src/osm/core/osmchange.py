@@ -0,0 +1,116 @@
+import os
+import xml.etree.ElementTree as ET
+from array import array
+from typing import IO, NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .nodes import NodeTable, merge_node_tables
+from .reader import CONSUMED_TAGS, OsmData, OsmWay, referenced_ids, way_class, ways_touching
+
+
+class OsmChange(NamedTuple):
+    nodes: NodeTable  # created and modified nodes
+    deleted_nodes: np.ndarray
+    ways: list[OsmWay]  # created and modified ways of the imported classes
+    deleted_ways: np.ndarray  # deleted ways and ways whose new tags are no longer imported
+
+
+def parse_osc(source: str | os.PathLike | IO[bytes]) -> OsmChange:
+    """
+    Stream-parse an osmChange file, relations are ignored.
+
+    Elements are consumed in file order, a later action on the same element wins.
+    """
+    node_ids = array('q')
+    node_lat = array('d')
+    node_lon = array('d')
+    deleted_nodes = array('q')
+    ways: dict[int, OsmWay] = {}
+    deleted_ways = set()
+
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+    action = None
+    depth = 0
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                action = elem.tag
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+
+        element_id = int(elem.attrib['id'])
+        if elem.tag == 'node':
+            if action == 'delete':
+                deleted_nodes.append(element_id)
+            else:
+                node_ids.append(element_id)
+                node_lat.append(float(elem.attrib['lat']))
+                node_lon.append(float(elem.attrib['lon']))
+        elif elem.tag == 'way':
+            tags = {}
+            refs = array('q')
+            for child in elem:
+                if child.tag == 'nd':
+                    refs.append(int(child.attrib['ref']))
+                elif child.tag == 'tag' and child.attrib['k'] in CONSUMED_TAGS:
+                    tags[child.attrib['k']] = child.attrib['v']
+
+            ways.pop(element_id, None)
+            deleted_ways.discard(element_id)
+            if action == 'delete' or way_class(tags) is None:
+                deleted_ways.add(element_id)
+            else:
+                ways[element_id] = OsmWay(element_id, np.frombuffer(refs, dtype=np.int64), tags)
+        root.clear()
+
+    # Reversed, so the last version of a node is the one NodeTable keeps
+    nodes = NodeTable(np.frombuffer(node_ids, dtype=np.int64)[::-1],
+                      np.frombuffer(node_lat, dtype=np.float64)[::-1],
+                      np.frombuffer(node_lon, dtype=np.float64)[::-1])
+    return OsmChange(nodes, np.unique(np.frombuffer(deleted_nodes, dtype=np.int64)),
+                     list(ways.values()), np.array(sorted(deleted_ways), dtype=np.int64))
+
+
+def apply_change(data: OsmData, change: OsmChange, bbox: BBox) -> tuple[OsmData, np.ndarray]:
+    """
+    Apply a change to a dataset loaded for bbox.
+
+    New ways are only taken in when they have a node inside bbox, so planet-wide diffs can
+    be applied to a small area. Returns the updated data and the sorted ids of every way
+    whose geometry has to be rebuilt, including deleted ones.
+    """
+    existing = {way.id: way for way in data.ways}
+
+    # Latest coordinates: changed nodes first so they win over the stored ones
+    nodes = merge_node_tables([change.nodes, data.nodes])
+    nodes = nodes.take(~np.isin(nodes.ids, change.deleted_nodes))
+
+    accepted = []
+    for way in change.ways:
+        if way.id not in existing:
+            rows = nodes.resolve(way.refs)
+            rows = rows[rows >= 0]
+            if not np.any(bbox.contains(nodes.lat[rows], nodes.lon[rows])):
+                continue
+        accepted.append(way)
+
+    removed = [way_id for way_id in change.deleted_ways.tolist() if way_id in existing]
+    for way_id in removed:
+        del existing[way_id]
+    for way in accepted:
+        existing[way.id] = way
+    ways = list(existing.values())
+
+    moved = np.union1d(change.nodes.ids, change.deleted_nodes)
+    touched = [way.id for way in ways_touching(ways, moved)]
+    affected = np.unique(np.array(
+        touched + removed + [way.id for way in accepted], dtype=np.int64))
+
+    return OsmData(nodes.keep_ids(referenced_ids(ways)), ways), affected
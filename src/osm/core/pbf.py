@@ -0,0 +1,392 @@
+import lzma
+import os
+import struct
+import tempfile
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .nodes import NodeTable
+from .polylines import offsets_from_lengths, owners
+from .pool import map_in_processes
+from .reader import CONSUMED_TAGS, OsmData, OsmWay, referenced_ids, way_class
+
+
+SUPPORTED_FEATURES = {'OsmSchema-V0.6', 'DenseNodes'}
+
+
+class PbfError(Exception):
+    """OSM PBF decoding errors exception"""
+
+
+class BlobRef(NamedTuple):
+    offset: int
+    size: int
+
+
+class NodeBlock(NamedTuple):
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    min_id: int
+    max_id: int
+    has_ways: bool
+
+
+class WayBlock(NamedTuple):
+    ids: np.ndarray
+    offsets: np.ndarray
+    refs: np.ndarray
+    tags: list[dict[str, str]]
+
+
+# Minimal protobuf wire format decoding
+
+def _varint(buf: memoryview, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buf: memoryview):
+    """
+    Yield (field number, value) of a message, value is an int or a memoryview of the payload
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _varint(buf, pos)
+        elif wire_type == 2:
+            size, pos = _varint(buf, pos)
+            value = buf[pos:pos + size]
+            pos += size
+        elif wire_type == 1:
+            value = int.from_bytes(buf[pos:pos + 8], 'little')
+            pos += 8
+        elif wire_type == 5:
+            value = int.from_bytes(buf[pos:pos + 4], 'little')
+            pos += 4
+        else:
+            raise PbfError(f"Unsupported wire type {wire_type}")
+        yield field, value
+
+
+def _signed(value: int) -> int:
+    """
+    int64 stored as an unsigned varint
+    """
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _packed_list(buf: memoryview) -> list[int]:
+    values = []
+    pos = 0
+    while pos < len(buf):
+        value, pos = _varint(buf, pos)
+        values.append(value)
+    return values
+
+
+def _packed_array(buf: memoryview) -> np.ndarray:
+    """
+    Vectorized decoding of a packed varint field into uint64
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    sizes = ends - starts + 1
+
+    values = np.zeros(len(ends), dtype=np.uint64)
+    for byte in range(int(sizes.max())):
+        selected = sizes > byte
+        chunk = (data[starts[selected] + byte] & 0x7f).astype(np.uint64)
+        values[selected] |= chunk << np.uint64(7 * byte)
+    return values
+
+
+def _delta_sint64(buf: memoryview) -> np.ndarray:
+    values = _packed_array(buf)
+    signed = (values >> np.uint64(1)).astype(np.int64) ^ - \
+        (values & np.uint64(1)).astype(np.int64)
+    return np.cumsum(signed)
+
+
+# File layout
+
+def _read_blob(path: str, blob: BlobRef) -> memoryview:
+    with open(path, 'rb') as f:
+        f.seek(blob.offset)
+        raw = memoryview(f.read(blob.size))
+
+    for field, value in _fields(raw):
+        if field == 1:
+            return value
+        if field == 3:
+            return memoryview(zlib.decompress(value))
+        if field == 4:
+            return memoryview(lzma.decompress(value))
+    raise PbfError("Unsupported blob compression")
+
+
+def index_blobs(path: str) -> list[BlobRef]:
+    """
+    Locate all OSMData blobs, checking the file header on the way
+    """
+    blobs = []
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            size_bytes = f.read(4)
+            if not size_bytes:
+                break
+            (header_size,) = struct.unpack('>I', size_bytes)
+            header = memoryview(f.read(header_size))
+
+            blob_type = None
+            data_size = 0
+            for field, value in _fields(header):
+                if field == 1:
+                    blob_type = bytes(value).decode()
+                elif field == 3:
+                    data_size = value
+
+            blob = BlobRef(offset + 4 + header_size, data_size)
+            if blob_type == 'OSMHeader':
+                _check_header(path, blob)
+            elif blob_type == 'OSMData':
+                blobs.append(blob)
+
+            offset = blob.offset + data_size
+            f.seek(offset)
+    return blobs
+
+
+def _check_header(path: str, blob: BlobRef) -> None:
+    for field, value in _fields(_read_blob(path, blob)):
+        if field == 4:
+            feature = bytes(value).decode()
+            if feature not in SUPPORTED_FEATURES:
+                raise PbfError(f"Unsupported PBF feature: {feature}")
+
+
+class _Block(NamedTuple):
+    strings: list[str]
+    groups: list[memoryview]
+    granularity: int
+    lat_offset: int
+    lon_offset: int
+
+    def coords(self, lat: np.ndarray, lon: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return (1e-9 * (self.lat_offset + self.granularity * lat),
+                1e-9 * (self.lon_offset + self.granularity * lon))
+
+
+def _decode_block(data: memoryview) -> _Block:
+    strings = []
+    groups = []
+    granularity = 100
+    lat_offset = 0
+    lon_offset = 0
+    for field, value in _fields(data):
+        if field == 1:
+            strings = [bytes(s).decode('utf-8')
+                       for f, s in _fields(value) if f == 1]
+        elif field == 2:
+            groups.append(value)
+        elif field == 17:
+            granularity = value
+        elif field == 19:
+            lat_offset = _signed(value)
+        elif field == 20:
+            lon_offset = _signed(value)
+    return _Block(strings, groups, granularity, lat_offset, lon_offset)
+
+
+def _block_nodes(block: _Block) -> tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+    """
+    All nodes of a block as (ids, lat, lon) plus whether the block also holds ways
+    """
+    ids, lat, lon = [], [], []
+    has_ways = False
+    for group in block.groups:
+        for field, value in _fields(group):
+            if field == 2:
+                dense = {f: v for f, v in _fields(value) if f in (1, 8, 9)}
+                if 1 in dense:
+                    ids.append(_delta_sint64(dense[1]))
+                    lat.append(_delta_sint64(dense[8]))
+                    lon.append(_delta_sint64(dense[9]))
+            elif field == 1:
+                node = {f: v for f, v in _fields(value) if f in (1, 8, 9)}
+                ids.append(np.array([_unzigzag(node[1])], dtype=np.int64))
+                lat.append(np.array([_unzigzag(node[8])], dtype=np.int64))
+                lon.append(np.array([_unzigzag(node[9])], dtype=np.int64))
+            elif field == 3:
+                has_ways = True
+
+    if not ids:
+        empty = np.zeros(0)
+        return np.zeros(0, dtype=np.int64), empty, empty, has_ways
+    node_lat, node_lon = block.coords(np.concatenate(lat), np.concatenate(lon))
+    return np.concatenate(ids), node_lat, node_lon, has_ways
+
+
+def scan_nodes(path: str, offset: int, size: int, bbox: tuple[float, ...]) -> NodeBlock:
+    """
+    Worker: nodes of one blob that fall inside bbox, plus the id range of all its nodes
+    """
+    ids, lat, lon, has_ways = _block_nodes(
+        _decode_block(_read_blob(path, BlobRef(offset, size))))
+    inside = BBox(*bbox).contains(lat, lon)
+    min_id = int(ids.min()) if len(ids) else 0
+    max_id = int(ids.max()) if len(ids) else -1
+    return NodeBlock(ids[inside], lat[inside], lon[inside], min_id, max_id, has_ways)
+
+
+def read_nodes(path: str, offset: int, size: int, wanted_path: str) -> NodeBlock:
+    """
+    Worker: nodes of one blob whose id is listed in the memory-mapped sorted id file
+    """
+    ids, lat, lon, has_ways = _block_nodes(
+        _decode_block(_read_blob(path, BlobRef(offset, size))))
+    keep = _sorted_contains(np.load(wanted_path, mmap_mode='r'), ids)
+    return NodeBlock(ids[keep], lat[keep], lon[keep], 0, -1, has_ways)
+
+
+def scan_ways(path: str, offset: int, size: int, inside_path: str) -> WayBlock:
+    """
+    Worker: imported ways of one blob that reference a node from the memory-mapped sorted id file
+    """
+    block = _decode_block(_read_blob(path, BlobRef(offset, size)))
+    consumed = {index for index, string in enumerate(block.strings)
+                if string in CONSUMED_TAGS}
+
+    way_ids, counts, refs, tags = [], [], [], []
+    for group in block.groups:
+        for field, value in _fields(group):
+            if field != 3:
+                continue
+            way_id = 0
+            keys = values = way_refs = None
+            for way_field, way_value in _fields(value):
+                if way_field == 1:
+                    way_id = way_value
+                elif way_field == 2:
+                    keys = _packed_list(way_value)
+                elif way_field == 3:
+                    values = _packed_list(way_value)
+                elif way_field == 8:
+                    way_refs = way_value
+            if not keys or way_refs is None or not consumed.intersection(keys):
+                continue
+
+            way_tags = {block.strings[k]: block.strings[v]
+                        for k, v in zip(keys, values) if k in consumed}
+            if way_class(way_tags) is None:
+                continue
+            decoded = _delta_sint64(way_refs)
+            if len(decoded) == 0:
+                continue
+            way_ids.append(way_id)
+            counts.append(len(decoded))
+            refs.append(decoded)
+            tags.append(way_tags)
+
+    if not way_ids:
+        return WayBlock(np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                        np.zeros(0, dtype=np.int64), [])
+
+    refs = np.concatenate(refs)
+    offsets = offsets_from_lengths(np.array(counts, dtype=np.int64))
+    hits = _sorted_contains(np.load(inside_path, mmap_mode='r'), refs)
+    touching = np.bincount(owners(offsets), weights=hits, minlength=len(counts)) > 0
+
+    kept_counts = np.array(counts, dtype=np.int64)[touching]
+    return WayBlock(
+        np.array(way_ids, dtype=np.int64)[touching],
+        offsets_from_lengths(kept_counts),
+        refs[np.repeat(touching, counts)],
+        [way_tags for way_tags, keep in zip(tags, touching) if keep],
+    )
+
+
+def _sorted_contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    if len(sorted_ids) == 0:
+        return np.zeros(len(ids), dtype=bool)
+    index = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[index] == ids
+
+
+def read_pbf(path: str, bbox: BBox, max_workers: int | None = None) -> OsmData:
+    """
+    Cut imported ways touching bbox and all their nodes out of an .osm.pbf extract.
+
+    Blobs are decoded in parallel in three passes: nodes inside the bbox, ways referencing
+    them, then the referenced nodes lying outside the bbox. Only the kept data is held in memory.
+    """
+    blobs = index_blobs(path)
+    node_blocks = map_in_processes(
+        scan_nodes, [(path, blob.offset, blob.size, tuple(bbox)) for blob in blobs], max_workers)
+
+    inside = NodeTable(
+        np.concatenate([block.ids for block in node_blocks] or [np.zeros(0, dtype=np.int64)]),
+        np.concatenate([block.lat for block in node_blocks] or [np.zeros(0)]),
+        np.concatenate([block.lon for block in node_blocks] or [np.zeros(0)]),
+    )
+
+    with tempfile.TemporaryDirectory(prefix="map-bridge-pbf-") as tmp_dir:
+        # Id sets are handed to workers as memory-mapped files instead of pickled copies
+        inside_path = os.path.join(tmp_dir, "inside.npy")
+        np.save(inside_path, inside.ids)
+        way_blobs = [blob for blob, block in zip(blobs, node_blocks) if block.has_ways]
+        way_blocks = map_in_processes(
+            scan_ways, [(path, blob.offset, blob.size, inside_path) for blob in way_blobs], max_workers)
+
+        ways = []
+        for block in way_blocks:
+            for index, (way_id, way_tags) in enumerate(zip(block.ids, block.tags)):
+                ways.append(OsmWay(int(way_id), block.refs[block.offsets[index]:block.offsets[index + 1]],
+                                   way_tags))
+
+        needed = referenced_ids(ways)
+        missing = np.setdiff1d(needed, inside.ids, assume_unique=True)
+        outside = []
+        if len(missing):
+            wanted_path = os.path.join(tmp_dir, "wanted.npy")
+            np.save(wanted_path, missing)
+            node_blobs = [blob for blob, block in zip(blobs, node_blocks)
+                          if block.max_id >= block.min_id
+                          and _overlaps(missing, block.min_id, block.max_id)]
+            outside = map_in_processes(
+                read_nodes, [(path, blob.offset, blob.size, wanted_path) for blob in node_blobs], max_workers)
+
+    nodes = NodeTable(
+        np.concatenate([inside.ids] + [block.ids for block in outside]),
+        np.concatenate([inside.lat] + [block.lat for block in outside]),
+        np.concatenate([inside.lon] + [block.lon for block in outside]),
+    )
+    return OsmData(nodes.keep_ids(needed), ways)
+
+
+def _overlaps(sorted_ids: np.ndarray, min_id: int, max_id: int) -> bool:
+    start = np.searchsorted(sorted_ids, min_id)
+    return start < len(sorted_ids) and sorted_ids[start] <= max_id
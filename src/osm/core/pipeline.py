@@ -0,0 +1,792 @@
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .buildings import extrude_footprints
+from .cache import OsmCache
+from .dataset import Dataset, load_dataset, save_dataset
+from .downloader import OsmDownloader, split_bbox
+from .extract import read_extract
+from .geometry_cache import GeometryCache
+from .lod import LodMesh, build_building_lods
+from .mesh_arrays import MeshArrays, concatenate, feature_ids
+from .procedural import BUILDINGS, ROADS, SIDEWALKS, centerline_mesh, footprint_mesh, road_centerlines
+from .nodes import NodeTable, resolve_refs
+from .overpass import OverpassDownloader
+from .polylines import filter_polylines, offsets_from_lengths, take_polylines
+from .pool import map_in_processes
+from .projection import project, to_local, unproject
+from .reader import OsmData, OsmWay, merge_osm_data, way_class
+from .roads import HIGHWAY_WIDTHS, build_roads, build_sidewalks
+from .shared import SharedArrays, attach_shared
+from .terrain import DEFAULT_TERRAIN_SPACING, Terrain, drape_mesh, terrain_fingerprint, terrain_mesh
+from .trace import Tracer
+from .spatial import GridIndex, Rect, clip_to_rect, cull_to_rect, polyline_bounds, split_rect
+
+
+# Below this many way vertices starting worker processes costs more than it saves
+PARALLEL_MIN_VERTICES = 200_000
+
+# Feature classes shared with the worker processes, in Features order
+SHARED_CLASSES = ('buildings', 'roads', 'sidewalks')
+
+
+class ImportCancelled(Exception):
+    """OSM import cancelled by the user exception"""
+
+
+class ImportSettings(NamedTuple):
+    """
+    Everything an import reads from the addon properties, captured on the main thread
+    """
+    bbox: BBox
+    projection: str
+    source: str
+    file_path: str
+    api_url: str
+    overpass_url: str
+    tile_size: float
+    download_workers: int
+    use_cache: bool
+    cache_bytes: int
+    cache_ttl: float
+    clip: bool
+    sidewalks_as_curves: bool
+    raised_sidewalks: bool
+    dataset_path: str | None = None  # where the loaded data is kept for later changes
+    building_lods: bool = False
+    geometry_nodes: bool = False  # footprints and centrelines only, extruded by node groups
+    build_workers: int = 1  # processes decoding .osm.pbf blobs and building tiles of large areas
+    geometry_cache: bool = False  # reuse the finished geometry of an identical earlier import
+    terrain_path: str | None = None  # elevation raster, or a directory of them, to drape onto
+    terrain_mesh: bool = False
+    terrain_spacing: float = DEFAULT_TERRAIN_SPACING
+
+    @property
+    def center(self) -> tuple[float, float]:
+        return ((self.bbox.min_lat + self.bbox.max_lat) / 2,
+                (self.bbox.min_lon + self.bbox.max_lon) / 2)
+
+
+class ImportProgress:
+    """
+    Stage and completed fraction of a running import, shared between the worker and the UI,
+    and the tracer the stages are timed with
+    """
+
+    def __init__(self, tracer: Tracer | None = None):
+        self.stage = "Starting"
+        self.fraction = 0.0
+        self.tracer = tracer or Tracer()
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def update(self, stage: str, fraction: float) -> None:
+        """
+        Record progress, raising ImportCancelled once the import was cancelled
+        """
+        if self._cancelled.is_set():
+            raise ImportCancelled(f"OSM import cancelled while {self.stage.lower()}")
+        self.stage = stage
+        self.fraction = fraction
+
+
+class LocalFrame(NamedTuple):
+    """
+    Projection of an import, shared by everything added to it later
+    """
+    center: tuple[float, float]  # lat, lon
+    projection: str
+    origin: tuple[float, float]  # metres subtracted before the float32 cast
+
+
+class Polylines(NamedTuple):
+    coords: np.ndarray  # (N, 2) float32 local metres
+    offsets: np.ndarray
+    way_ids: np.ndarray  # one per polyline
+
+
+class Features(NamedTuple):
+    buildings: Polylines
+    roads: Polylines
+    road_types: list[str]  # highway tag of every road
+    sidewalks: Polylines
+
+
+class ImportResult(NamedTuple):
+    origin: tuple[float, float]  # metres of the local frame, the location of every object
+    meshes: dict[str, MeshArrays]  # object name -> mesh
+    sidewalk_curves: tuple[np.ndarray, np.ndarray] | None  # coords, offsets in curve mode
+    building_count: int
+    road_count: int
+    sidewalk_count: int
+    frame: LocalFrame | None = None
+    tile: BBox | None = None  # grid tile the result was clipped to
+    clip: Rect | None = None
+    lods: dict[str, LodMesh] | None = None  # level of detail of the building meshes by name
+    procedural: dict[str, str] | None = None  # Geometry Nodes kind of every procedural mesh
+
+
+def create_downloader(settings: ImportSettings, tracer: Tracer | None = None) -> OsmDownloader:
+    """
+    Downloader for the configured source, timing every tile with tracer
+    """
+    cache = None
+    if settings.use_cache:
+        cache = OsmCache(max_bytes=settings.cache_bytes, ttl=settings.cache_ttl)
+
+    if settings.source == 'OVERPASS':
+        return OverpassDownloader(
+            base_url=settings.overpass_url,
+            tile_size=settings.tile_size,
+            max_workers=settings.download_workers,
+            cache=cache,
+            tracer=tracer)
+    return OsmDownloader(
+        base_url=settings.api_url,
+        tile_size=settings.tile_size,
+        max_workers=settings.download_workers,
+        cache=cache,
+        tracer=tracer)
+
+
+def tiles_bbox(tiles: list[BBox]) -> BBox:
+    return BBox(min(tile.min_lat for tile in tiles), min(tile.min_lon for tile in tiles),
+                max(tile.max_lat for tile in tiles), max(tile.max_lon for tile in tiles))
+
+
+def load_osm_data(settings: ImportSettings, progress: ImportProgress,
+                  tiles: list[BBox] | None = None) -> OsmData:
+    """
+    Read the selected area, or only the given grid tiles, from the configured source
+    """
+    tracer = progress.tracer
+    if settings.source == 'FILE':
+        progress.update("Reading extract", 0.05)
+        with tracer.span("read extract") as args:
+            osm_data = read_extract(settings.file_path, tiles_bbox(tiles) if tiles else settings.bbox,
+                                    settings.build_workers)
+            args['items'] = len(osm_data.ways)
+            args['bytes'] = os.path.getsize(settings.file_path)
+        return osm_data
+
+    def on_tile(done: int, total: int) -> None:
+        progress.update(f"Downloading tile {done}/{total}", 0.6 * done / total)
+
+    progress.update("Downloading", 0.0)
+    downloader = create_downloader(settings, tracer)
+    with tracer.span("download") as args:
+        if tiles is not None:
+            osm_data = downloader.download_tiles(tiles, on_tile)
+        else:
+            osm_data = downloader.download(settings.bbox, on_tile)
+        args['items'] = len(osm_data.ways)
+    return osm_data
+
+
+def collect_polylines(ways: list[OsmWay], nodes: NodeTable,
+                      xy: np.ndarray) -> Polylines:
+    """
+    Resolve node refs of ways in bulk into concatenated coords/offsets arrays, skipping missing nodes
+    """
+    index, offsets = resolve_refs(nodes, [way.refs for way in ways])
+    way_ids = np.array([way.id for way in ways], dtype=np.int64)
+    return Polylines(xy[index], offsets, way_ids)
+
+
+def project_nodes(osm_data: OsmData, center: tuple[float, float], projection: str,
+                  origin: tuple[float, float] | None = None) -> tuple[LocalFrame, np.ndarray]:
+    """
+    Project the whole node table once, (N, 2) local metres in node table order
+    """
+    nodes = osm_data.nodes
+    x, y = project(nodes.lat, nodes.lon, *center, projection)
+    local = to_local(x, y, origin)
+    return LocalFrame(center, projection, local.origin), local.xy
+
+
+def classify_ways(ways: list[OsmWay]) -> tuple[list[OsmWay], list[OsmWay], list[str], list[OsmWay]]:
+    """
+    Buildings, roads, the highway tag of every road and sidewalks
+    """
+    buildings = []
+    roads = []
+    sidewalks = []
+    road_types = []
+
+    for way in ways:
+        kind = way_class(way.tags)
+        if kind == 'building':
+            buildings.append(way)
+        elif kind == 'road':
+            roads.append(way)
+            road_types.append(way.tags['highway'])
+        elif kind == 'sidewalk':
+            sidewalks.append(way)
+    return buildings, roads, road_types, sidewalks
+
+
+def collect_features(osm_data: OsmData, xy: np.ndarray) -> Features:
+    """
+    Polylines of every imported class from the projected node table
+    """
+    buildings, roads, road_types, sidewalks = classify_ways(osm_data.ways)
+    return Features(
+        collect_polylines(buildings, osm_data.nodes, xy),
+        collect_polylines(roads, osm_data.nodes, xy),
+        road_types,
+        collect_polylines(sidewalks, osm_data.nodes, xy),
+    )
+
+
+def project_features(osm_data: OsmData, center: tuple[float, float], projection: str,
+                     origin: tuple[float, float] | None = None) -> tuple[LocalFrame, Features]:
+    """
+    Project the node table once and gather the polylines of every imported class
+    """
+    frame, xy = project_nodes(osm_data, center, projection, origin)
+    return frame, collect_features(osm_data, xy)
+
+
+def clip_rect(bbox: BBox, frame: LocalFrame) -> Rect:
+    """
+    bbox in the local coordinates of the frame, bounds of its projected corners
+    """
+    x, y = project(np.array([bbox.min_lat, bbox.min_lat, bbox.max_lat, bbox.max_lat]),
+                   np.array([bbox.min_lon, bbox.max_lon, bbox.min_lon, bbox.max_lon]),
+                   *frame.center, frame.projection)
+    return Rect(x.min() - frame.origin[0], y.min() - frame.origin[1],
+                x.max() - frame.origin[0], y.max() - frame.origin[1])
+
+
+def rect_bbox(rect: Rect, frame: LocalFrame, margin: float = 1e-3) -> BBox:
+    """
+    Lat/lon bounds of a local rect with a margin in degrees, the inverse of clip_rect
+    """
+    lat, lon = unproject(np.array([rect.min_x, rect.max_x, rect.min_x, rect.max_x]) + frame.origin[0],
+                         np.array([rect.min_y, rect.min_y, rect.max_y, rect.max_y]) + frame.origin[1],
+                         *frame.center, frame.projection)
+    return BBox(lat.min() - margin, lon.min() - margin, lat.max() + margin, lon.max() + margin)
+
+
+def drape_result(result: ImportResult, terrain: Terrain, building_names: set[str]) -> ImportResult:
+    """
+    Set every mesh and sidewalk curve of a result on the terrain, buildings as rigid blocks
+    """
+    frame = result.frame
+    meshes = {}
+    for name, arrays in result.meshes.items():
+        heights = terrain.sample_local(arrays.vertices[:, :2], frame)
+        meshes[name] = drape_mesh(arrays, heights, rigid=name in building_names)
+
+    lods = result.lods
+    if lods is not None:
+        centers = np.array([lod.center for lod in lods.values()], dtype=np.float32).reshape(-1, 2)
+        grounds = terrain.sample_local(centers, frame).tolist()
+        lods = {name: lod._replace(ground=ground) for (name, lod), ground in zip(lods.items(), grounds)}
+
+    sidewalk_curves = result.sidewalk_curves
+    if sidewalk_curves is not None:
+        coords, offsets = sidewalk_curves
+        heights = terrain.sample_local(coords, frame)
+        sidewalk_curves = (np.column_stack([coords, heights]).astype(np.float32), offsets)
+    return result._replace(meshes=meshes, lods=lods, sidewalk_curves=sidewalk_curves)
+
+
+def _clip(polylines: Polylines, rect: Rect) -> tuple[Polylines, np.ndarray]:
+    coords, offsets, source = clip_to_rect(
+        polylines.coords, polylines.offsets, rect,
+        GridIndex.from_polylines(polylines.coords, polylines.offsets))
+    return Polylines(coords, offsets, polylines.way_ids[source]), source
+
+
+def build_features(features: Features, settings: ImportSettings, frame: LocalFrame,
+                   rect: Rect | None = None, skip_building_ids: np.ndarray | None = None,
+                   tile: BBox | None = None, tracer: Tracer | None = None) -> ImportResult:
+    """
+    Build meshes of every class, with a rect buildings centred outside it are dropped and
+    roads and sidewalks are cut at its border
+    """
+    tracer = tracer or Tracer()
+    meshes = {}
+    procedural = {} if settings.geometry_nodes else None
+    extent = rect
+    if extent is None and settings.terrain_path:
+        coords = np.concatenate([features.buildings.coords, features.roads.coords, features.sidewalks.coords])
+        extent = data_rect(coords) if len(coords) else None
+
+    # Buildings as one batched mesh, or one mesh per cell and level of detail
+    start = time.perf_counter()
+    buildings = features.buildings
+    keep = np.ones(len(buildings.way_ids), dtype=bool)
+    if rect is not None:
+        keep &= cull_to_rect(buildings.coords, buildings.offsets, rect,
+                             GridIndex.from_polylines(buildings.coords, buildings.offsets))
+    if skip_building_ids is not None:
+        keep &= ~np.isin(buildings.way_ids, skip_building_ids)
+    coords, offsets = filter_polylines(buildings.coords, buildings.offsets, keep)
+    lods = None
+    if settings.geometry_nodes:
+        building_arrays = footprint_mesh(coords, offsets, buildings.way_ids[keep])
+        building_count = building_arrays.feature_count
+        if not building_arrays.is_empty:
+            meshes["OSM_Buildings"] = building_arrays
+            procedural["OSM_Buildings"] = BUILDINGS
+    elif settings.building_lods:
+        building_meshes, lods = build_building_lods(coords, offsets, buildings.way_ids[keep])
+        meshes.update(building_meshes)
+        building_count = sum(building_meshes[name].feature_count
+                             for name, lod in lods.items() if lod.level == 0)
+    else:
+        building_arrays = extrude_footprints(coords, offsets, buildings.way_ids[keep])
+        building_count = building_arrays.feature_count
+        if not building_arrays.is_empty:
+            meshes["OSM_Buildings"] = building_arrays
+    building_names = set(meshes)
+    tracer.add("buildings", start, time.perf_counter(), "build", items=building_count)
+
+    # Roads, one merged mesh per highway class
+    start = time.perf_counter()
+    roads = features.roads
+    road_types = features.road_types
+    if rect is not None:
+        roads, source = _clip(roads, rect)
+        road_types = [road_types[i] for i in source]
+    road_count = 0
+    if settings.geometry_nodes:
+        road_meshes = road_centerlines(*roads, road_types)
+    else:
+        road_meshes = build_roads(*roads, road_types)
+    for htype, road_arrays in road_meshes.items():
+        meshes[f'OSM_Road_{htype}'] = road_arrays
+        road_count += road_arrays.feature_count
+        if procedural is not None:
+            procedural[f'OSM_Road_{htype}'] = ROADS
+    tracer.add("roads", start, time.perf_counter(), "build", items=road_count)
+
+    # Sidewalks, one merged ribbon mesh unless they are kept as editable curves
+    start = time.perf_counter()
+    sidewalks = features.sidewalks
+    if rect is not None:
+        sidewalks, _ = _clip(sidewalks, rect)
+    sidewalk_curves = None
+    if settings.sidewalks_as_curves:
+        keep = np.diff(sidewalks.offsets) >= 2
+        sidewalk_curves = filter_polylines(sidewalks.coords, sidewalks.offsets, keep)
+        sidewalk_count = int(np.count_nonzero(keep))
+    elif settings.geometry_nodes:
+        sidewalk_arrays = centerline_mesh(
+            sidewalks.coords, sidewalks.offsets,
+            np.full(len(sidewalks.way_ids), HIGHWAY_WIDTHS['sidewalk']),
+            np.repeat(sidewalks.way_ids, np.diff(sidewalks.offsets)), 'sidewalk')
+        sidewalk_count = sidewalk_arrays.feature_count
+        if not sidewalk_arrays.is_empty:
+            meshes["OSM_Sidewalks"] = sidewalk_arrays
+            procedural["OSM_Sidewalks"] = SIDEWALKS
+    else:
+        sidewalk_arrays = build_sidewalks(*sidewalks, raised=settings.raised_sidewalks)
+        sidewalk_count = sidewalk_arrays.feature_count
+        if not sidewalk_arrays.is_empty:
+            meshes["OSM_Sidewalks"] = sidewalk_arrays
+
+    tracer.add("sidewalks", start, time.perf_counter(), "build", items=sidewalk_count)
+
+    result = ImportResult(frame.origin, meshes, sidewalk_curves, building_count,
+                          road_count, sidewalk_count, frame, tile, rect, lods, procedural)
+    if settings.terrain_path and extent is not None:
+        with tracer.span("terrain", "build") as args:
+            terrain = Terrain.open(settings.terrain_path, rect_bbox(extent, frame))
+            result = drape_result(result, terrain, building_names)
+            if settings.terrain_mesh:
+                ground = terrain_mesh(terrain, frame, extent, settings.terrain_spacing)
+                if not ground.is_empty:
+                    result.meshes["OSM_Terrain"] = ground
+            args['items'] = sum(len(arrays.vertices) for arrays in result.meshes.values())
+    return result
+
+
+def share_features(osm_data: OsmData, xy: np.ndarray) -> tuple[SharedArrays, list[str]]:
+    """
+    Projected node table and the node indices of every imported class in one shared memory
+    block, plus the highway names the shared road type codes point into.
+
+    The bounds of every polyline are shared too, so a worker only touches the polylines
+    overlapping its own rect.
+    """
+    buildings, roads, road_types, sidewalks = classify_ways(osm_data.ways)
+    type_names, type_codes = np.unique(np.asarray(road_types, dtype=str), return_inverse=True)
+    arrays = {'xy': xy, 'road_types': type_codes.ravel().astype(np.int32)}
+    for name, ways in zip(SHARED_CLASSES, (buildings, roads, sidewalks)):
+        index, offsets = resolve_refs(osm_data.nodes, [way.refs for way in ways])
+        arrays[f'{name}_index'] = index
+        arrays[f'{name}_offsets'] = offsets
+        arrays[f'{name}_ids'] = np.array([way.id for way in ways], dtype=np.int64)
+        arrays[f'{name}_bounds'] = polyline_bounds(xy[index], offsets)
+    return SharedArrays(arrays), type_names.tolist()
+
+
+def _shared_features(arrays: dict[str, np.ndarray], road_type_names: list[str], rect: Rect) -> Features:
+    """
+    Copies of the shared polylines whose bounds overlap rect
+    """
+    xy = arrays['xy']
+    polylines = {}
+    road_types = []
+    for name in SHARED_CLASSES:
+        bounds = arrays[f'{name}_bounds']
+        selected = np.flatnonzero((bounds[:, 0] <= rect.max_x) & (bounds[:, 2] >= rect.min_x)
+                                  & (bounds[:, 1] <= rect.max_y) & (bounds[:, 3] >= rect.min_y))
+        index, offsets = take_polylines(arrays[f'{name}_index'], arrays[f'{name}_offsets'], selected)
+        polylines[name] = Polylines(xy[index], offsets, arrays[f'{name}_ids'][selected])
+        if name == 'roads':
+            road_types = [road_type_names[code] for code in arrays['road_types'][selected].tolist()]
+    return Features(polylines['buildings'], polylines['roads'], road_types, polylines['sidewalks'])
+
+
+def build_shared_tile(descriptor: tuple, road_type_names: list[str], settings: tuple, frame: tuple,
+                      rect: tuple, tile: tuple | None, skip_building_ids: np.ndarray | None) -> ImportResult:
+    """
+    Process pool job building one rect from the features of share_features.
+
+    Everything arrives as plain tuples, so it unpickles in a worker without the addon package.
+    """
+    rect = Rect(*rect)
+    with attach_shared(descriptor) as arrays:
+        features = _shared_features(arrays, road_type_names, rect)
+    settings = ImportSettings(BBox(*settings[0]), *settings[1:])
+    return build_features(features, settings, LocalFrame(*frame), rect, skip_building_ids,
+                          BBox(*tile) if tile is not None else None)
+
+
+def build_in_processes(osm_data: OsmData, xy: np.ndarray, settings: ImportSettings, frame: LocalFrame,
+                       rects: list[Rect], tiles: list[BBox] | None = None,
+                       skip_building_ids: np.ndarray | None = None) -> list[ImportResult]:
+    """
+    One result per rect, built across the worker processes from a shared copy of the data
+    """
+    shared, road_type_names = share_features(osm_data, xy)
+    plain_settings = (tuple(settings.bbox), *settings[1:])
+    with shared:
+        jobs = [(shared.descriptor, road_type_names, plain_settings, tuple(frame), tuple(rect),
+                 tuple(tile) if tile is not None else None, skip_building_ids)
+                for rect, tile in zip(rects, tiles or [None] * len(rects))]
+        return map_in_processes(build_shared_tile, jobs, settings.build_workers)
+
+
+def use_processes(settings: ImportSettings, osm_data: OsmData, job_count: int) -> bool:
+    return (settings.build_workers > 1 and job_count > 1
+            and sum(len(way.refs) for way in osm_data.ways) >= PARALLEL_MIN_VERTICES)
+
+
+def merge_results(results: list[ImportResult], frame: LocalFrame, clip: Rect | None) -> ImportResult:
+    """
+    Join the results of neighbouring rects into one, meshes of the same name are concatenated
+    """
+    meshes = {}
+    for name in dict.fromkeys(name for result in results for name in result.meshes):
+        arrays = concatenate([result.meshes[name] for result in results if name in result.meshes])
+        meshes[name] = arrays._replace(feature_count=len(feature_ids(arrays)))
+
+    sidewalk_curves = None
+    curves = [result.sidewalk_curves for result in results if result.sidewalk_curves is not None]
+    if curves:
+        sidewalk_curves = (np.concatenate([coords for coords, _ in curves]),
+                           offsets_from_lengths(np.concatenate([np.diff(offsets) for _, offsets in curves])))
+        sidewalk_count = sum(result.sidewalk_count for result in results)
+    else:
+        sidewalk_count = meshes["OSM_Sidewalks"].feature_count if "OSM_Sidewalks" in meshes else 0
+
+    # Roads cut at a shared edge appear in both rects, so they are counted from the merged meshes
+    road_count = sum(arrays.feature_count for name, arrays in meshes.items() if name.startswith('OSM_Road_'))
+    lods = procedural = None
+    if any(result.lods is not None for result in results):
+        lods = {name: lod for result in results for name, lod in (result.lods or {}).items()}
+    if any(result.procedural is not None for result in results):
+        procedural = {name: kind for result in results for name, kind in (result.procedural or {}).items()}
+
+    return ImportResult(frame.origin, meshes, sidewalk_curves, sum(result.building_count for result in results),
+                        road_count, sidewalk_count, frame, None, clip, lods, procedural)
+
+
+def data_rect(xy: np.ndarray) -> Rect:
+    """
+    Bounds of every projected node with a metre of margin
+    """
+    low = xy.min(axis=0) - 1.0
+    high = xy.max(axis=0) + 1.0
+    return Rect(float(low[0]), float(low[1]), float(high[0]), float(high[1]))
+
+
+def geometry_key(settings: ImportSettings) -> str | None:
+    """
+    Geometry cache key of the area, source data and every setting shaping the result, None
+    when the source data can't be identified without loading it.
+
+    Local extracts are identified by path, size and modification time, downloads by the
+    digests of the response cache entries of their tiles, so only while all of them are
+    fresh in the cache.
+    """
+    if settings.source == 'FILE':
+        try:
+            stat = os.stat(settings.file_path)
+        except OSError:
+            return None
+        source = [os.path.abspath(settings.file_path), stat.st_size, stat.st_mtime_ns]
+    else:
+        digests = create_downloader(settings).cached_digests(split_bbox(settings.bbox, settings.tile_size))
+        if digests is None:
+            return None
+        source = [settings.overpass_url if settings.source == 'OVERPASS' else settings.api_url, digests]
+    return GeometryCache.key(settings.source, source, list(settings.bbox), settings.projection,
+                             settings.clip, settings.sidewalks_as_curves, settings.raised_sidewalks,
+                             settings.building_lods, settings.geometry_nodes,
+                             terrain_fingerprint(settings.terrain_path) if settings.terrain_path else None,
+                             settings.terrain_mesh, settings.terrain_spacing)
+
+
+def result_to_arrays(result: ImportResult) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Flat arrays and JSON serialisable metadata of a result, as stored in the geometry cache
+    """
+    arrays = {}
+    meshes = {}
+    for name, mesh in result.meshes.items():
+        arrays[f'{name}:vertices'] = mesh.vertices
+        arrays[f'{name}:loop_vertices'] = mesh.loop_vertices
+        arrays[f'{name}:loop_starts'] = mesh.loop_starts
+        for attribute, values in mesh.face_attributes.items():
+            arrays[f'{name}:face:{attribute}'] = values
+        if mesh.edges is not None:
+            arrays[f'{name}:edges'] = mesh.edges
+        for attribute, values in (mesh.point_attributes or {}).items():
+            arrays[f'{name}:point:{attribute}'] = values
+        meshes[name] = {
+            'feature_count': int(mesh.feature_count),
+            'face_attributes': list(mesh.face_attributes),
+            'edges': mesh.edges is not None,
+            'point_attributes': None if mesh.point_attributes is None else list(mesh.point_attributes),
+        }
+    if result.sidewalk_curves is not None:
+        arrays['sidewalk_curves:coords'], arrays['sidewalk_curves:offsets'] = result.sidewalk_curves
+
+    frame = result.frame
+    meta = {
+        'origin': list(result.origin),
+        'meshes': meshes,
+        'counts': [int(result.building_count), int(result.road_count), int(result.sidewalk_count)],
+        'frame': None if frame is None else [list(frame.center), frame.projection, list(frame.origin)],
+        'clip': None if result.clip is None else [float(value) for value in result.clip],
+        'lods': None if result.lods is None else {
+            name: [int(lod.level), [float(value) for value in lod.center], float(lod.near), float(lod.far),
+                   float(lod.ground)]
+            for name, lod in result.lods.items()},
+        'procedural': result.procedural,
+    }
+    return arrays, meta
+
+
+def result_from_arrays(arrays: dict[str, np.ndarray], meta: dict) -> ImportResult:
+    """
+    Result stored by result_to_arrays, its meshes use the given arrays without copying
+    """
+    meshes = {}
+    for name, mesh in meta['meshes'].items():
+        point_attributes = None
+        if mesh['point_attributes'] is not None:
+            point_attributes = {attribute: arrays[f'{name}:point:{attribute}']
+                                for attribute in mesh['point_attributes']}
+        meshes[name] = MeshArrays(
+            arrays[f'{name}:vertices'],
+            arrays[f'{name}:loop_vertices'],
+            arrays[f'{name}:loop_starts'],
+            {attribute: arrays[f'{name}:face:{attribute}'] for attribute in mesh['face_attributes']},
+            mesh['feature_count'],
+            edges=arrays[f'{name}:edges'] if mesh['edges'] else None,
+            point_attributes=point_attributes,
+        )
+    sidewalk_curves = None
+    if 'sidewalk_curves:coords' in arrays:
+        sidewalk_curves = (arrays['sidewalk_curves:coords'], arrays['sidewalk_curves:offsets'])
+
+    frame = None
+    if meta['frame'] is not None:
+        center, projection, origin = meta['frame']
+        frame = LocalFrame(tuple(center), projection, tuple(origin))
+    lods = None
+    if meta['lods'] is not None:
+        lods = {name: LodMesh(level, tuple(center), near, far, ground)
+                for name, (level, center, near, far, ground) in meta['lods'].items()}
+    return ImportResult(tuple(meta['origin']), meshes, sidewalk_curves, *meta['counts'], frame, None,
+                        Rect(*meta['clip']) if meta['clip'] is not None else None, lods,
+                        meta['procedural'])
+
+
+def save_result(path: str, result: ImportResult) -> None:
+    """
+    Write a result to an .npz file, e.g. for a separate Blender process to build it
+    """
+    arrays, meta = result_to_arrays(result)
+    np.savez(path, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), **arrays)
+
+
+def load_result(path: str) -> ImportResult:
+    with np.load(path) as stored:
+        arrays = {name: stored[name] for name in stored.files if name != 'meta'}
+        meta = json.loads(stored['meta'].tobytes().decode())
+    return result_from_arrays(arrays, meta)
+
+
+def store_tiles(path: str, osm_data: OsmData, tiles: list[BBox]) -> None:
+    """
+    Add newly loaded tiles to the dataset of an incremental import, new data wins
+    """
+    bbox = tiles_bbox(tiles)
+    if os.path.exists(path):
+        stored = load_dataset(path)
+        osm_data = merge_osm_data([osm_data, stored.data])
+        bbox = tiles_bbox([bbox, stored.bbox])
+    save_dataset(path, Dataset(osm_data, bbox))
+
+
+def build_ways(data: OsmData, way_ids: np.ndarray, settings: ImportSettings, frame: LocalFrame,
+               rect: Rect | None = None) -> ImportResult:
+    """
+    Build only the given ways of a dataset in an existing frame
+    """
+    wanted = set(way_ids.tolist())
+    subset = OsmData(data.nodes, [way for way in data.ways if way.id in wanted])
+    _, features = project_features(subset, frame.center, frame.projection, frame.origin)
+    # The ground under changed ways is already in place
+    return build_features(features, settings._replace(terrain_mesh=False), frame, rect)
+
+
+def build_osm_import(settings: ImportSettings, progress: ImportProgress) -> ImportResult:
+    """
+    Load, project and build every imported feature as plain arrays, no Blender data is touched
+    """
+    cache = GeometryCache() if settings.geometry_cache else None
+    max_age = None if settings.source == 'FILE' else settings.cache_ttl
+
+    tracer = progress.tracer
+    # A kept dataset needs the parsed data, so it is loaded even when the geometry is cached
+    osm_data = None
+    if settings.dataset_path:
+        osm_data = load_osm_data(settings, progress)
+        with tracer.span("save dataset"):
+            save_dataset(settings.dataset_path, Dataset(osm_data, settings.bbox))
+    key = geometry_key(settings) if cache is not None else None
+    if key is not None:
+        progress.update("Reading cached geometry", progress.fraction)
+        with tracer.span("read geometry cache") as args:
+            cached = cache.get(key, max_age)
+            if cached is not None:
+                args['bytes'] = sum(array.nbytes for array in cached[0].values())
+        if cached is not None:
+            progress.update("Creating objects", 0.95)
+            return result_from_arrays(*cached)
+    if osm_data is None:
+        osm_data = load_osm_data(settings, progress)
+
+    progress.update("Projecting", 0.65)
+    with tracer.span("project", items=len(osm_data.nodes.lat)):
+        frame, xy = project_nodes(osm_data, settings.center, settings.projection)
+
+    progress.update("Building geometry", 0.75)
+    rect = clip_rect(settings.bbox, frame) if settings.clip else None
+    with tracer.span("build geometry") as args:
+        if use_processes(settings, osm_data, settings.build_workers):
+            # Twice as many rects as workers evens out dense and empty parts of the area
+            rects = split_rect(rect if rect is not None else data_rect(xy), 2 * settings.build_workers)
+            args['processes'] = settings.build_workers
+            result = merge_results(build_in_processes(osm_data, xy, settings, frame, rects), frame, rect)
+        else:
+            result = build_features(collect_features(osm_data, xy), settings, frame, rect, tracer=tracer)
+        args['items'] = sum(arrays.element_count for arrays in result.meshes.values())
+
+    # Downloaded tiles are in the response cache by now, their digests make the key
+    if cache is not None and key is None:
+        key = geometry_key(settings)
+    if key is not None:
+        progress.update("Caching geometry", 0.9)
+        with tracer.span("write geometry cache") as args:
+            arrays, meta = result_to_arrays(result)
+            args['bytes'] = sum(array.nbytes for array in arrays.values())
+            cache.put(key, arrays, meta)
+
+    progress.update("Creating objects", 0.95)
+    return result
+
+
+def build_tile_imports(settings: ImportSettings, progress: ImportProgress, tiles: list[BBox],
+                       frame: LocalFrame | None = None,
+                       skip_building_ids: np.ndarray | None = None) -> list[ImportResult]:
+    """
+    Load and build only the given grid tiles, one result per tile clipped to its border.
+
+    Reusing the frame of an earlier import keeps new tiles aligned with the objects already
+    in the scene, buildings whose id is in skip_building_ids are left out.
+    """
+    if not tiles:
+        return []
+    tracer = progress.tracer
+    osm_data = load_osm_data(settings, progress, tiles)
+    if settings.dataset_path:
+        with tracer.span("save dataset"):
+            store_tiles(settings.dataset_path, osm_data, tiles)
+
+    progress.update("Projecting", 0.65)
+    with tracer.span("project", items=len(osm_data.nodes.lat)):
+        if frame is None:
+            frame, xy = project_nodes(osm_data, settings.center, settings.projection)
+        else:
+            frame, xy = project_nodes(osm_data, frame.center, frame.projection, frame.origin)
+
+    if use_processes(settings, osm_data, len(tiles)):
+        progress.update(f"Building {len(tiles)} tiles", 0.7)
+        rects = [clip_rect(tile, frame) for tile in tiles]
+        with tracer.span("build geometry", items=len(tiles), processes=settings.build_workers):
+            return build_in_processes(osm_data, xy, settings, frame, rects, tiles, skip_building_ids)
+
+    features = collect_features(osm_data, xy)
+    results = []
+    for number, tile in enumerate(tiles, 1):
+        progress.update(f"Building tile {number}/{len(tiles)}",
+                        0.7 + 0.25 * number / len(tiles))
+        with tracer.span("build tile", items=1):
+            results.append(build_features(features, settings, frame, clip_rect(tile, frame),
+                                          skip_building_ids, tile, tracer))
+    return results
+
+
+class ImportWorker(threading.Thread):
+    """
+    Runs build(settings, progress) in the background, result or error are read once it has
+    finished
+    """
+
+    def __init__(self, settings: ImportSettings, build=build_osm_import, tracer: Tracer | None = None):
+        super().__init__(name="map-bridge-osm-import", daemon=True)
+        self.settings = settings
+        self.build = build
+        self.progress = ImportProgress(tracer)
+        self.result = None
+        self.error: Exception | None = None
+
+    def run(self) -> None:
+        tracer = self.progress.tracer
+        try:
+            with tracer.profiled(), tracer.span("worker", "worker"):
+                self.result = self.build(self.settings, self.progress)
+        except Exception as e:
+            self.error = e
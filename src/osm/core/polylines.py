@@ -0,0 +1,105 @@
+import numpy as np
+
+
+# Polylines are stored as one concatenated (N, 2) coordinate array plus an (M + 1,) offsets array,
+# polyline i owns coords[offsets[i]:offsets[i + 1]].
+
+
+def lengths(offsets: np.ndarray) -> np.ndarray:
+    return np.diff(offsets)
+
+
+def owners(offsets: np.ndarray) -> np.ndarray:
+    """
+    Index of the owning polyline for every vertex
+    """
+    return np.repeat(np.arange(len(offsets) - 1), lengths(offsets))
+
+
+def offsets_from_lengths(counts: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+def take_polylines(coords: np.ndarray, offsets: np.ndarray, order: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reorder (or select) whole polylines by index
+    """
+    counts = lengths(offsets)[order]
+    new_offsets = offsets_from_lengths(counts)
+    index = np.repeat(offsets[:-1][order] - new_offsets[:-1], counts) + np.arange(new_offsets[-1])
+    return coords[index], new_offsets
+
+
+def filter_vertices(coords: np.ndarray, offsets: np.ndarray, keep: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop vertices where keep is False, keeping every polyline (possibly empty)
+    """
+    counts = np.bincount(owners(offsets)[keep], minlength=len(offsets) - 1)
+    return coords[keep], offsets_from_lengths(counts)
+
+
+def filter_polylines(coords: np.ndarray, offsets: np.ndarray, keep: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop whole polylines where keep is False
+    """
+    counts = lengths(offsets)
+    vertex_keep = np.repeat(keep, counts)
+    return coords[vertex_keep], offsets_from_lengths(counts[keep])
+
+
+def drop_repeated(coords: np.ndarray, offsets: np.ndarray, closed: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Remove consecutive duplicate vertices, for closed rings also the vertex repeating the first one
+    """
+    return filter_vertices(coords, offsets, ~repeated_vertices(coords, offsets, closed))
+
+
+def repeated_vertices(coords: np.ndarray, offsets: np.ndarray, closed: bool = False) -> np.ndarray:
+    """
+    Mask of the vertices drop_repeated removes
+    """
+    owner = owners(offsets)
+    keep = np.ones(len(coords), dtype=bool)
+    same = np.all(coords[1:] == coords[:-1], axis=1) & (owner[1:] == owner[:-1])
+    keep[1:] &= ~same
+
+    if closed:
+        counts = lengths(offsets)
+        non_empty = counts > 1
+        first = offsets[:-1][non_empty]
+        last = offsets[1:][non_empty] - 1
+        closing = np.all(coords[first] == coords[last], axis=1)
+        keep[last[closing]] = False
+
+    return ~keep
+
+
+def next_in_ring(offsets: np.ndarray) -> np.ndarray:
+    """
+    Index of the following vertex for every vertex, wrapping around at the end of each ring
+    """
+    nxt = np.arange(1, offsets[-1] + 1)
+    ends = offsets[1:][lengths(offsets) > 0] - 1
+    nxt[ends] = offsets[:-1][lengths(offsets) > 0]
+    return nxt
+
+
+def previous_in_ring(offsets: np.ndarray) -> np.ndarray:
+    """
+    Index of the preceding vertex for every vertex, wrapping around at the start of each ring
+    """
+    prv = np.arange(-1, offsets[-1] - 1)
+    starts = offsets[:-1][lengths(offsets) > 0]
+    prv[starts] = offsets[1:][lengths(offsets) > 0] - 1
+    return prv
+
+
+def ring_areas(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Signed shoelace area of every ring, positive for counter-clockwise rings
+    """
+    nxt = next_in_ring(offsets)
+    cross = coords[:, 0] * coords[nxt, 1] - coords[nxt, 0] * coords[:, 1]
+    return np.bincount(owners(offsets), weights=cross, minlength=len(offsets) - 1) / 2.0
@@ -0,0 +1,41 @@
+import multiprocessing
+import os
+import pickle
+import runpy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+_CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+_CORE_PACKAGE = __package__
+_BOOTSTRAP = os.path.join(_CORE_DIR, "_bootstrap.py")
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def map_in_processes(func, args_list: list[tuple], max_workers: int | None = None) -> list:
+    """
+    Run func(*args) for every args tuple across a spawned process pool, results in order.
+
+    Workers unpickle func and its arguments by module name, so each first runs the
+    bootstrap script registering the core under the name it has here. The initializer is
+    runpy.run_path since a function of the core could not be unpickled before that.
+    Falls back to running in this process when a pool can't be used here.
+    """
+    if not args_list:
+        return []
+
+    max_workers = min(max_workers or default_workers(), len(args_list))
+    if max_workers > 1:
+        try:
+            context = multiprocessing.get_context('spawn')
+            bootstrap_globals = {'PACKAGE': _CORE_PACKAGE, 'CORE_DIR': _CORE_DIR}
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=runpy.run_path,
+                                     initargs=(_BOOTSTRAP, bootstrap_globals)) as executor:
+                return list(executor.map(func, *zip(*args_list)))
+        except (ImportError, BrokenProcessPool, pickle.PicklingError) as e:
+            print(f"MAP BRIDGE: process pool unavailable, running in-process: {e}")
+
+    return [func(*args) for args in args_list]
@@ -0,0 +1,105 @@
+import numpy as np
+
+from .buildings import DEFAULT_BUILDING_HEIGHT, orient_counter_clockwise
+from .mesh_arrays import MeshArrays, empty_mesh_arrays, osm_id_attribute
+from .polylines import drop_repeated, filter_polylines, lengths, owners
+from .road_graph import merge_chains
+from .roads import DEFAULT_ROAD_WIDTH, HIGHWAY_WIDTHS
+
+
+# Class codes stored in the "class" attribute of procedural meshes
+FEATURE_CLASSES = ('building', 'road', 'sidewalk')
+
+# Kinds of procedural meshes, each is given its own Geometry Nodes modifier
+BUILDINGS = 'BUILDINGS'
+ROADS = 'ROADS'
+SIDEWALKS = 'SIDEWALKS'
+
+
+def footprint_mesh(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                   heights: np.ndarray | None = None) -> MeshArrays:
+    """
+    One upward facing polygon per footprint with "height", "osm_id" and "class" face
+    attributes, walls and roof are left to the buildings node group
+    """
+    if heights is None:
+        heights = np.full(len(offsets) - 1, DEFAULT_BUILDING_HEIGHT)
+
+    coords, offsets = drop_repeated(coords, offsets, closed=True)
+    keep = lengths(offsets) >= 3
+    coords, offsets = filter_polylines(coords, offsets, keep)
+    way_ids = np.asarray(way_ids)[keep]
+    heights = np.asarray(heights, dtype=np.float32)[keep]
+    if len(coords) == 0:
+        return empty_mesh_arrays(('osm_id', 'height', 'class'))
+
+    coords = orient_counter_clockwise(coords, offsets)
+    vertices = np.zeros((len(coords), 3), dtype=np.float32)
+    vertices[:, :2] = coords
+
+    return MeshArrays(
+        vertices,
+        np.arange(len(coords), dtype=np.int32),
+        offsets[:-1].astype(np.int32),
+        {
+            'osm_id': osm_id_attribute(way_ids),
+            'height': heights,
+            'class': np.full(len(way_ids), FEATURE_CLASSES.index('building'), dtype=np.int32),
+        },
+        len(way_ids),
+    )
+
+
+def centerline_mesh(coords: np.ndarray, offsets: np.ndarray, widths: np.ndarray,
+                    segment_ids: np.ndarray, feature_class: str) -> MeshArrays:
+    """
+    Polylines as loose edges with "width", "osm_id" and "class" point attributes, swept into
+    ribbons by the roads node group.
+
+    segment_ids holds the way id of every vertex and widths one value per polyline.
+    """
+    keep = lengths(offsets) >= 2
+    segment_ids = np.asarray(segment_ids)[np.repeat(keep, lengths(offsets))]
+    coords, offsets = filter_polylines(coords, offsets, keep)
+    widths = np.asarray(widths, dtype=np.float32)[keep]
+    if len(coords) == 0:
+        return empty_mesh_arrays()._replace(edges=np.zeros((0, 2), dtype=np.int32))
+
+    vertices = np.zeros((len(coords), 3), dtype=np.float32)
+    vertices[:, :2] = coords
+    starts = np.setdiff1d(np.arange(len(coords)), offsets[1:] - 1, assume_unique=True)
+
+    return MeshArrays(
+        vertices,
+        np.zeros(0, dtype=np.int32),
+        np.zeros(0, dtype=np.int32),
+        {},
+        len(np.unique(segment_ids)),
+        edges=np.stack([starts, starts + 1], axis=1).astype(np.int32),
+        point_attributes={
+            'width': widths[owners(offsets)],
+            'osm_id': osm_id_attribute(segment_ids),
+            'class': np.full(len(coords), FEATURE_CLASSES.index(feature_class), dtype=np.int32),
+        },
+    )
+
+
+def road_centerlines(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                     highway_types: list[str]) -> dict[str, MeshArrays]:
+    """
+    One centreline mesh per highway class, ways continuing each other joined into one line
+    """
+    chains = merge_chains(coords, offsets, way_ids, highway_types)
+    highway_types = np.asarray(chains.classes, dtype=object)
+    widths = np.array([HIGHWAY_WIDTHS.get(htype, DEFAULT_ROAD_WIDTH)
+                       for htype in highway_types], dtype=np.float32)
+    chain_of_vertex = owners(chains.offsets)
+
+    meshes = {}
+    for htype in sorted(set(highway_types)):
+        mask = highway_types == htype
+        arrays = centerline_mesh(*filter_polylines(chains.coords, chains.offsets, mask),
+                                 widths[mask], chains.segment_ids[mask[chain_of_vertex]], 'road')
+        if not arrays.is_empty:
+            meshes[htype] = arrays
+    return meshes
@@ -0,0 +1,181 @@
+from typing import NamedTuple
+import numpy as np
+
+
+EARTH_RADIUS = 6378137.0
+
+# WGS84 ellipsoid
+_FLATTENING = 1 / 298.257223563
+_E2 = _FLATTENING * (2 - _FLATTENING)
+_EP2 = _E2 / (1 - _E2)
+
+PROJECTION_ITEMS = [
+    ('EQUIRECTANGULAR', "Equirectangular",
+     "Fast spherical approximation, good for boxes up to about a kilometre"),
+    ('TRANSVERSE_MERCATOR', "Transverse Mercator",
+     "Ellipsoidal local frame, accurate for boxes several kilometres wide"),
+]
+
+
+class LocalCoords(NamedTuple):
+    xy: np.ndarray  # (N, 2) float32 metres relative to origin
+    origin: tuple[float, float]  # float64 metres of the local frame subtracted before the cast
+
+
+def equirectangular(lat: np.ndarray, lon: np.ndarray, center_lat: float, center_lon: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project to metres around the center with a spherical equirectangular approximation
+    """
+    scale = np.pi / 180 * EARTH_RADIUS
+    x = (np.asarray(lon, dtype=np.float64) - center_lon) * \
+        scale * np.cos(np.radians(center_lat))
+    y = (np.asarray(lat, dtype=np.float64) - center_lat) * scale
+    return x, y
+
+
+def _meridian_arc(phi: np.ndarray, sin_phi: np.ndarray, cos_phi: np.ndarray) -> np.ndarray:
+    e4 = _E2 * _E2
+    e6 = e4 * _E2
+
+    # Multiple-angle sines from sin/cos of phi, cheaper than three more np.sin calls
+    sin_2 = 2 * sin_phi * cos_phi
+    cos_2 = cos_phi * cos_phi - sin_phi * sin_phi
+    sin_4 = 2 * sin_2 * cos_2
+    sin_6 = sin_4 * cos_2 + (cos_2 * cos_2 - sin_2 * sin_2) * sin_2
+
+    return EARTH_RADIUS * (
+        (1 - _E2 / 4 - 3 * e4 / 64 - 5 * e6 / 256) * phi
+        - (3 * _E2 / 8 + 3 * e4 / 32 + 45 * e6 / 1024) * sin_2
+        + (15 * e4 / 256 + 45 * e6 / 1024) * sin_4
+        - (35 * e6 / 3072) * sin_6
+    )
+
+
+def transverse_mercator(lat: np.ndarray, lon: np.ndarray, center_lat: float, center_lon: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project to metres with an ellipsoidal transverse Mercator centred on the given point (scale factor 1)
+    """
+    phi = np.radians(np.asarray(lat, dtype=np.float64))
+    sin_phi = np.sin(phi)
+    cos_phi = np.cos(phi)
+    tan_phi = sin_phi / cos_phi
+
+    n = EARTH_RADIUS / np.sqrt(1 - _E2 * sin_phi * sin_phi)
+    t = tan_phi * tan_phi
+    c = _EP2 * cos_phi * cos_phi
+    a = np.radians(np.asarray(lon, dtype=np.float64) - center_lon) * cos_phi
+    a2 = a * a
+
+    x = n * a * (1 + a2 / 6 * ((1 - t + c)
+                 + a2 / 20 * (5 - 18 * t + t * t + 72 * c - 58 * _EP2)))
+    center_phi = np.radians(center_lat)
+    arc = _meridian_arc(phi, sin_phi, cos_phi) - \
+        _meridian_arc(center_phi, np.sin(center_phi), np.cos(center_phi))
+    y = arc + n * tan_phi * a2 * (
+        0.5 + a2 / 24 * ((5 - t + 9 * c + 4 * c * c)
+                         + a2 / 30 * (61 - 58 * t + t * t + 600 * c - 330 * _EP2)))
+    return x, y
+
+
+def inverse_equirectangular(x: np.ndarray, y: np.ndarray, center_lat: float,
+                            center_lon: float) -> tuple[np.ndarray, np.ndarray]:
+    scale = np.pi / 180 * EARTH_RADIUS
+    lat = np.asarray(y, dtype=np.float64) / scale + center_lat
+    lon = np.asarray(x, dtype=np.float64) / (scale * np.cos(np.radians(center_lat))) + center_lon
+    return lat, lon
+
+
+def inverse_transverse_mercator(x: np.ndarray, y: np.ndarray, center_lat: float,
+                                center_lon: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lat/lon of transverse_mercator metres, through the footpoint latitude series
+    """
+    e4 = _E2 * _E2
+    e6 = e4 * _E2
+    center_phi = np.radians(center_lat)
+    arc = np.asarray(y, dtype=np.float64) + _meridian_arc(
+        center_phi, np.sin(center_phi), np.cos(center_phi))
+    mu = arc / (EARTH_RADIUS * (1 - _E2 / 4 - 3 * e4 / 64 - 5 * e6 / 256))
+    e1 = (1 - np.sqrt(1 - _E2)) / (1 + np.sqrt(1 - _E2))
+    # Multiple-angle sines from sin/cos of 2 mu, as in _meridian_arc
+    sin_2 = np.sin(2 * mu)
+    cos_2 = np.cos(2 * mu)
+    sin_4 = 2 * sin_2 * cos_2
+    cos_4 = cos_2 * cos_2 - sin_2 * sin_2
+    sin_6 = sin_4 * cos_2 + cos_4 * sin_2
+    sin_8 = 2 * sin_4 * cos_4
+    phi1 = (mu + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * sin_2
+            + (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * sin_4
+            + (151 * e1 ** 3 / 96) * sin_6
+            + (1097 * e1 ** 4 / 512) * sin_8)
+
+    sin_phi = np.sin(phi1)
+    cos_phi = np.cos(phi1)
+    tan_phi = sin_phi / cos_phi
+    w = 1 - _E2 * sin_phi * sin_phi
+    n = EARTH_RADIUS / np.sqrt(w)
+    r = EARTH_RADIUS * (1 - _E2) / (w * np.sqrt(w))
+    t = tan_phi * tan_phi
+    c = _EP2 * cos_phi * cos_phi
+    d = np.asarray(x, dtype=np.float64) / n
+    d2 = d * d
+
+    lat = phi1 - n * tan_phi / r * d2 * (
+        0.5 - d2 / 24 * ((5 + 3 * t + 10 * c - 4 * c * c - 9 * _EP2)
+                         - d2 / 30 * (61 + 90 * t + 298 * c + 45 * t * t - 252 * _EP2 - 3 * c * c)))
+    lon = d * (1 - d2 / 6 * ((1 + 2 * t + c)
+                             - d2 / 20 * (5 - 2 * c + 28 * t - 3 * c * c + 8 * _EP2 + 24 * t * t))) / cos_phi
+    return np.degrees(lat), center_lon + np.degrees(lon)
+
+
+_PROJECTIONS = {
+    'EQUIRECTANGULAR': equirectangular,
+    'TRANSVERSE_MERCATOR': transverse_mercator,
+}
+
+
+def project(lat: np.ndarray, lon: np.ndarray, center_lat: float, center_lon: float,
+            method: str = 'EQUIRECTANGULAR') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project lat/lon arrays to float64 metres around the center with the chosen method
+    """
+    try:
+        projection = _PROJECTIONS[method]
+    except KeyError:
+        raise ValueError(f"Unknown projection: {method}") from None
+    return projection(lat, lon, center_lat, center_lon)
+
+
+_INVERSE_PROJECTIONS = {
+    'EQUIRECTANGULAR': inverse_equirectangular,
+    'TRANSVERSE_MERCATOR': inverse_transverse_mercator,
+}
+
+
+def unproject(x: np.ndarray, y: np.ndarray, center_lat: float, center_lon: float,
+              method: str = 'EQUIRECTANGULAR') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lat/lon of metres projected around the center with the chosen method
+    """
+    try:
+        inverse = _INVERSE_PROJECTIONS[method]
+    except KeyError:
+        raise ValueError(f"Unknown projection: {method}") from None
+    return inverse(x, y, center_lat, center_lon)
+
+
+def to_local(x: np.ndarray, y: np.ndarray, origin: tuple[float, float] | None = None) -> LocalCoords:
+    """
+    Cast float64 metres to float32 relative to an origin (the rounded bounding box center by default)
+    """
+    if origin is None:
+        if len(x) == 0:
+            origin = (0.0, 0.0)
+        else:
+            origin = (float(np.round((x.min() + x.max()) / 2)),
+                      float(np.round((y.min() + y.max()) / 2)))
+
+    xy = np.empty((len(x), 2), dtype=np.float32)
+    xy[:, 0] = x - origin[0]
+    xy[:, 1] = y - origin[1]
+    return LocalCoords(xy, origin)
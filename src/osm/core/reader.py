@@ -0,0 +1,241 @@
+import os
+import xml.etree.ElementTree as ET
+from array import array
+from typing import IO, NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .nodes import NodeTable, merge_node_tables
+from .polylines import owners, offsets_from_lengths
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Only these tags are consulted when classifying ways, everything else is dropped while parsing
+CONSUMED_TAGS = ('building', 'highway', 'footway')
+
+
+class OsmWay(NamedTuple):
+    id: int
+    refs: np.ndarray  # int64 node ids
+    tags: dict[str, str]
+
+
+class OsmData(NamedTuple):
+    nodes: NodeTable
+    ways: list[OsmWay]
+
+
+def way_class(tags: dict[str, str]) -> str | None:
+    """
+    Classify way by its tags: "building", "road", "sidewalk" or None if the way is not imported
+    """
+    if 'building' in tags and tags['building'] != 'no':
+        return 'building'
+    if 'highway' in tags:
+        return 'road'
+    if tags.get('footway') == 'sidewalk':
+        return 'sidewalk'
+    return None
+
+
+def referenced_ids(ways: list[OsmWay]) -> np.ndarray:
+    """
+    Sorted unique node ids referenced by ways
+    """
+    if not ways:
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.concatenate([way.refs for way in ways]))
+
+
+def ways_touching(ways: list[OsmWay], node_ids: np.ndarray) -> list[OsmWay]:
+    """
+    Ways referencing at least one of the given node ids
+    """
+    if not ways:
+        return []
+    offsets = offsets_from_lengths(
+        np.array([len(way.refs) for way in ways], dtype=np.int64))
+    hits = np.isin(np.concatenate([way.refs for way in ways]), node_ids)
+    touching = np.bincount(owners(offsets), weights=hits, minlength=len(ways)) > 0
+    return [way for way, keep in zip(ways, touching) if keep]
+
+
+class _NodeColumns:
+    """
+    Growable typed columns for nodes, about 24 bytes per node instead of a dict entry
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.lat = array('d')
+        self.lon = array('d')
+
+    def append(self, elem: ET.Element) -> None:
+        self.ids.append(int(elem.attrib['id']))
+        self.lat.append(float(elem.attrib['lat']))
+        self.lon.append(float(elem.attrib['lon']))
+
+    def to_table(self) -> NodeTable:
+        return NodeTable(
+            np.frombuffer(self.ids, dtype=np.int64),
+            np.frombuffer(self.lat, dtype=np.float64),
+            np.frombuffer(self.lon, dtype=np.float64),
+        )
+
+
+def _iter_elements(source: str | os.PathLike | IO[bytes]):
+    """
+    Yield completed top-level elements and clear everything parsed so far after each one
+    """
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+    depth = 0
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield elem
+            root.clear()
+
+
+def _read_way(elem: ET.Element) -> OsmWay | None:
+    tags = {}
+    refs = array('q')
+    for child in elem:
+        if child.tag == 'nd':
+            refs.append(int(child.attrib['ref']))
+        elif child.tag == 'tag' and child.attrib['k'] in CONSUMED_TAGS:
+            tags[child.attrib['k']] = child.attrib['v']
+    if way_class(tags) is None:
+        return None
+    return OsmWay(int(elem.attrib['id']), np.frombuffer(refs, dtype=np.int64), tags)
+
+
+def _read_ways(source) -> list[OsmWay]:
+    ways = []
+    for elem in _iter_elements(source):
+        if elem.tag == 'way':
+            way = _read_way(elem)
+            if way is not None:
+                ways.append(way)
+    return ways
+
+
+def _read_nodes(source, referenced: np.ndarray) -> NodeTable:
+    wanted = set(referenced.tolist())
+    columns = _NodeColumns()
+    for elem in _iter_elements(source):
+        if elem.tag == 'node' and int(elem.attrib['id']) in wanted:
+            columns.append(elem)
+    return columns.to_table()
+
+
+def _scan(source, bbox: BBox) -> tuple[np.ndarray, list[OsmWay]]:
+    """
+    Ids of the nodes inside bbox and all imported ways
+    """
+    inside = array('q')
+    ways = []
+    for elem in _iter_elements(source):
+        if elem.tag == 'node':
+            lat = float(elem.attrib['lat'])
+            lon = float(elem.attrib['lon'])
+            if bbox.min_lat <= lat <= bbox.max_lat and bbox.min_lon <= lon <= bbox.max_lon:
+                inside.append(int(elem.attrib['id']))
+        elif elem.tag == 'way':
+            way = _read_way(elem)
+            if way is not None:
+                ways.append(way)
+    return np.frombuffer(inside, dtype=np.int64), ways
+
+
+class OsmStreamParser:
+    """
+    Push parser for OSM XML arriving in chunks, e.g. straight from a network response.
+
+    Elements are consumed and cleared as soon as they are complete, close() returns the
+    imported ways and the nodes they reference.
+    """
+
+    def __init__(self, bbox: BBox | None = None):
+        self.bbox = bbox
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._depth = 0
+        self._columns = _NodeColumns()
+        self._ways = []
+        self.remarks: list[str] = []
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.feed(chunk)
+        self._consume()
+
+    def _consume(self) -> None:
+        for event, elem in self._parser.read_events():
+            if self._root is None:
+                self._root = elem
+                continue
+            if event == 'start':
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth != 0:
+                continue
+
+            if elem.tag == 'node':
+                self._columns.append(elem)
+            elif elem.tag == 'way':
+                way = _read_way(elem)
+                if way is not None:
+                    self._ways.append(way)
+            elif elem.tag == 'remark':
+                self.remarks.append(elem.text or "")
+            self._root.clear()
+
+    def close(self) -> OsmData:
+        self._parser.close()
+        self._consume()
+
+        nodes = self._columns.to_table()
+        ways = self._ways
+        if self.bbox is not None:
+            ways = ways_touching(
+                ways, nodes.ids[self.bbox.contains(nodes.lat, nodes.lon)])
+        return OsmData(nodes.keep_ids(referenced_ids(ways)), ways)
+
+
+def parse_osm(source: str | os.PathLike | IO[bytes], bbox: BBox | None = None) -> OsmData:
+    """
+    Stream-parse OSM XML keeping only imported ways and the nodes they reference.
+
+    A file path is read twice: ways first, then only the referenced nodes, so peak memory
+    follows the kept geometry. A file object is read once and the nodes are pruned afterwards.
+    With a bbox only ways having at least one node inside it are kept.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if bbox is None:
+            ways = _read_ways(source)
+        else:
+            inside, ways = _scan(source, bbox)
+            ways = ways_touching(ways, inside)
+        return OsmData(_read_nodes(source, referenced_ids(ways)), ways)
+
+    parser = OsmStreamParser(bbox)
+    while chunk := source.read(READ_CHUNK_SIZE):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def merge_osm_data(datasets: list[OsmData]) -> OsmData:
+    """
+    Union of several datasets, nodes and ways repeated across tile borders are kept once
+    """
+    ways = {}
+    for data in datasets:
+        for way in data.ways:
+            ways.setdefault(way.id, way)
+    return OsmData(merge_node_tables([data.nodes for data in datasets]), list(ways.values()))
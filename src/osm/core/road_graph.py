@@ -0,0 +1,143 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from .polylines import filter_polylines, filter_vertices, lengths, offsets_from_lengths, repeated_vertices
+from .simplify import simplify_polylines
+
+
+ROAD_SIMPLIFY_TOLERANCE = 0.05  # metres a dropped vertex may lie off the simplified road
+
+
+class RoadChains(NamedTuple):
+    coords: np.ndarray
+    offsets: np.ndarray
+    segment_ids: np.ndarray  # way id of the segment starting at every vertex
+    classes: list[str]  # highway class of every chain
+
+
+def _graph_nodes(coords: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Node number of every vertex, vertices projected from the same OSM node share one
+    """
+    # Complex keys sort far faster than rows and keep both coordinates exact
+    keys = coords[:, 0].astype(np.float64) + 1j * coords[:, 1].astype(np.float64)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return inverse.ravel(), len(unique)
+
+
+def _chain_order(link: np.ndarray, link_side: np.ndarray) -> list[list[tuple[int, bool]]]:
+    """
+    Walk the polylines into chains of (polyline, reversed) pieces.
+
+    link[line, side] is the polyline merged at the start (side 0) or end (side 1) of a
+    polyline, -1 when none, and link_side the side of that polyline it is merged at.
+    """
+    count = len(link)
+    link = link.ravel().tolist()
+    link_side = link_side.ravel().tolist()
+    visited = [False] * count
+
+    def walk(line: int, flipped: bool) -> list[tuple[int, bool]]:
+        chain = []
+        while line >= 0 and not visited[line]:
+            visited[line] = True
+            chain.append((line, flipped))
+            exit_end = 2 * line + (0 if flipped else 1)
+            line, flipped = link[exit_end], link_side[exit_end] == 1
+        return chain
+
+    chains = []
+    # Chains start at polylines with at least one end that can't be merged
+    for line in range(count):
+        if visited[line]:
+            continue
+        if link[2 * line] < 0:
+            chains.append(walk(line, False))
+        elif link[2 * line + 1] < 0:
+            chains.append(walk(line, True))
+    # Whatever is left forms closed loops
+    for line in range(count):
+        if not visited[line]:
+            chains.append(walk(line, False))
+    return chains
+
+
+def merge_chains(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray, classes: list[str],
+                 tolerance: float = ROAD_SIMPLIFY_TOLERANCE) -> RoadChains:
+    """
+    Join roads of the same class meeting end to end at a node no other road touches into
+    continuous polylines, then drop nearly collinear vertices inside every way.
+
+    The node degree counts every road passing through a node, so chains always stop at
+    junctions and at roads ending on the middle of another one.
+    """
+    way_ids = np.asarray(way_ids)
+    repeated = repeated_vertices(coords, offsets)
+    coords, offsets = filter_vertices(coords, offsets, ~repeated)
+    keep = lengths(offsets) >= 2
+    if not np.all(keep):
+        coords, offsets = filter_polylines(coords, offsets, keep)
+        way_ids = way_ids[keep]
+        classes = [htype for htype, kept in zip(classes, keep) if kept]
+    if len(way_ids) == 0:
+        return RoadChains(coords, offsets, np.zeros(0, dtype=np.int64), [])
+
+    node, node_count = _graph_nodes(coords)
+    starts = node[offsets[:-1]]
+    ends = node[offsets[1:] - 1]
+
+    # Ends count once towards the degree, interior vertices twice
+    weight = np.full(len(coords), 2)
+    weight[offsets[:-1]] -= 1
+    weight[offsets[1:] - 1] -= 1
+    degree = np.bincount(node, weights=weight, minlength=node_count)
+
+    # Mergeable nodes are the ends of exactly two different polylines of the same class,
+    # sorting the ends by node puts both next to each other
+    end_nodes = np.concatenate([starts, ends])
+    end_lines = np.tile(np.arange(len(starts)), 2)
+    end_sides = np.repeat([0, 1], len(starts))
+    class_numbers = {htype: number for number, htype in enumerate(set(classes))}
+    class_ids = np.array([class_numbers[htype] for htype in classes])
+    candidates = np.flatnonzero(degree[end_nodes] == 2)
+    order = candidates[np.argsort(end_nodes[candidates], kind='stable')]
+    first, second = order[0::2], order[1::2]
+    line_a, line_b = end_lines[first], end_lines[second]
+    merge = ((end_nodes[first] == end_nodes[second]) & (line_a != line_b)
+             & (class_ids[line_a] == class_ids[line_b]))
+    first, second, line_a, line_b = first[merge], second[merge], line_a[merge], line_b[merge]
+
+    link = np.full((len(starts), 2), -1, dtype=np.int64)
+    link_side = np.zeros((len(starts), 2), dtype=np.int64)
+    link[line_a, end_sides[first]] = line_b
+    link_side[line_a, end_sides[first]] = end_sides[second]
+    link[line_b, end_sides[second]] = line_a
+    link_side[line_b, end_sides[second]] = end_sides[first]
+
+    # Every piece contributes its vertices but the last, which starts the next piece
+    chains = _chain_order(link, link_side)
+    pieces = np.array([piece for chain in chains for piece in chain], dtype=np.int64).reshape(-1, 2)
+    lines, flipped = pieces[:, 0], pieces[:, 1].astype(bool)
+    chain_sizes = np.array([len(chain) for chain in chains])
+    last = np.zeros(len(pieces), dtype=bool)
+    last[np.cumsum(chain_sizes) - 1] = True
+
+    counts = lengths(offsets)[lines] - 1 + last
+    first = np.where(flipped, offsets[lines + 1] - 1, offsets[lines])
+    step = np.where(flipped, -1, 1)
+    piece_offsets = offsets_from_lengths(counts)
+    position = np.arange(piece_offsets[-1]) - np.repeat(piece_offsets[:-1], counts)
+    index = np.repeat(first, counts) + np.repeat(step, counts) * position
+    segment_ids = np.repeat(way_ids[lines], counts)
+
+    chain_of_piece = np.repeat(np.arange(len(chains)), chain_sizes)
+    chain_lengths = np.bincount(chain_of_piece, weights=counts, minlength=len(chains)).astype(np.int64)
+    chain_classes = [classes[chain[0][0]] for chain in chains]
+
+    # Vertices where one way hands over to the next stay, so every way keeps its own faces
+    fixed = np.zeros(len(index), dtype=bool)
+    fixed[1:] = segment_ids[1:] != segment_ids[:-1]
+    merged, merged_offsets, kept = simplify_polylines(
+        coords[index], offsets_from_lengths(chain_lengths), tolerance, fixed)
+    return RoadChains(merged, merged_offsets, segment_ids[kept], chain_classes)
@@ -0,0 +1,168 @@
+import numpy as np
+
+from .mesh_arrays import MeshArrays, empty_mesh_arrays, osm_id_attribute
+from .polylines import filter_polylines, filter_vertices, lengths, owners, repeated_vertices
+from .road_graph import merge_chains
+
+
+# Highway type to width mapping
+HIGHWAY_WIDTHS = {
+    'motorway': 10.0,
+    'motorway_link': 10.0,
+    'trunk': 8.0,
+    'trunk_link': 8.0,
+    'primary': 7.0,
+    'primary_link': 7.0,
+    'secondary': 6.0,
+    'secondary_link': 6.0,
+    'tertiary': 5.0,
+    'tertiary_link': 5.0,
+    'unclassified': 4.0,
+    'residential': 4.0,
+    'living_street': 4.0,
+    'service': 3.0,
+    'pedestrian': 3.0,
+    'track': 3.0,
+    'footway': 1.5,
+    'path': 1.5,
+    'sidewalk': 1.5
+}
+DEFAULT_ROAD_WIDTH = 2.0
+ROAD_HEIGHT = 0.1
+SIDEWALK_HEIGHT = 0.15  # kerb height, just above the road surface
+
+
+def _vertex_normals(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Unit left-hand normal at every vertex from the central difference of its neighbours
+    """
+    owner = owners(offsets)
+    index = np.arange(len(coords))
+    prev = np.maximum(index - 1, offsets[:-1][owner])
+    nxt = np.minimum(index + 1, offsets[1:][owner] - 1)
+
+    direction = coords[nxt] - coords[prev]
+    norm = np.hypot(direction[:, 0], direction[:, 1])
+
+    # A polyline doubling back on itself has a zero central difference, use the incoming segment
+    folded = norm == 0
+    direction[folded] = coords[index[folded]] - coords[prev[folded]]
+    norm[folded] = np.hypot(direction[folded, 0], direction[folded, 1])
+
+    direction /= np.where(norm > 0, norm, 1.0)[:, None]
+    return np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+
+
+def ribbon(coords: np.ndarray, offsets: np.ndarray, widths: np.ndarray, way_ids: np.ndarray,
+           height: float = ROAD_HEIGHT, segment_ids: np.ndarray | None = None) -> MeshArrays:
+    """
+    Turn every polyline into a flat ribbon of quads, all polylines in one pass.
+
+    widths and way_ids hold one value per polyline, the way id is kept as the "osm_id" face attribute.
+    Polylines merged from several ways pass segment_ids instead, the way id of the segment
+    starting at every vertex.
+    """
+    way_ids = np.asarray(way_ids)
+    merged = segment_ids is not None
+    if not merged:
+        segment_ids = np.repeat(way_ids, lengths(offsets))
+    repeated = repeated_vertices(coords, offsets)
+    coords, offsets = filter_vertices(coords, offsets, ~repeated)
+    segment_ids = np.asarray(segment_ids)[~repeated]
+
+    keep = lengths(offsets) >= 2
+    segment_ids = segment_ids[np.repeat(keep, lengths(offsets))]
+    coords, offsets = filter_polylines(coords, offsets, keep)
+    widths = np.asarray(widths, dtype=np.float64)[keep]
+    way_ids = way_ids[keep]
+    if len(coords) == 0:
+        return empty_mesh_arrays(('osm_id',))
+
+    owner = owners(offsets)
+    count = len(coords)
+    offset = _vertex_normals(coords, offsets) * (widths[owner] / 2.0)[:, None]
+
+    # Left edge first, right edge second
+    vertices = np.empty((2 * count, 3), dtype=np.float32)
+    vertices[:count, :2] = coords + offset
+    vertices[count:, :2] = coords - offset
+    vertices[:, 2] = height
+
+    # One quad per segment, wound counter-clockwise so faces point up
+    starts = np.setdiff1d(np.arange(count), offsets[1:] - 1, assume_unique=True)
+    loop_vertices = np.stack(
+        [starts, count + starts, count + starts + 1, starts + 1], axis=1).ravel()
+    loop_starts = 4 * np.arange(len(starts))
+
+    return MeshArrays(
+        vertices,
+        loop_vertices.astype(np.int32),
+        loop_starts.astype(np.int32),
+        {'osm_id': osm_id_attribute(segment_ids[starts])},
+        len(np.unique(segment_ids[starts])) if merged else len(way_ids),
+    )
+
+
+def build_roads(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                highway_types: list[str]) -> dict[str, MeshArrays]:
+    """
+    Build one merged ribbon mesh per highway class.
+
+    Ways continuing each other are first joined into chains, so a street split into many
+    ways becomes one ribbon without overlapping ends.
+    """
+    chains = merge_chains(coords, offsets, way_ids, highway_types)
+    highway_types = np.asarray(chains.classes, dtype=object)
+    widths = np.array([HIGHWAY_WIDTHS.get(htype, DEFAULT_ROAD_WIDTH)
+                       for htype in highway_types], dtype=np.float64)
+    chain_of_vertex = owners(chains.offsets)
+
+    meshes = {}
+    for htype in sorted(set(highway_types)):
+        mask = highway_types == htype
+        class_coords, class_offsets = filter_polylines(chains.coords, chains.offsets, mask)
+        segment_ids = chains.segment_ids[mask[chain_of_vertex]]
+        arrays = ribbon(class_coords, class_offsets, widths[mask],
+                        segment_ids[class_offsets[:-1]], segment_ids=segment_ids)
+        if not arrays.is_empty:
+            meshes[htype] = arrays
+    return meshes
+
+
+def add_kerbs(arrays: MeshArrays) -> MeshArrays:
+    """
+    Raise a ribbon into a slab: outward facing walls from both edges of every quad down to z=0
+    """
+    if arrays.is_empty:
+        return arrays
+
+    count = len(arrays.vertices)
+    bottom = arrays.vertices.copy()
+    bottom[:, 2] = 0.0
+
+    # Ribbon quads are left start, right start, right end, left end
+    quads = arrays.loop_vertices.reshape(-1, 4)
+    left_start, right_start, right_end, left_end = quads.T
+    left_walls = np.stack(
+        [left_start, left_end, left_end + count, left_start + count], axis=1)
+    right_walls = np.stack(
+        [right_end, right_start, right_start + count, right_end + count], axis=1)
+
+    loop_vertices = np.concatenate([quads, left_walls, right_walls]).ravel()
+    return MeshArrays(
+        np.concatenate([arrays.vertices, bottom]),
+        loop_vertices.astype(np.int32),
+        (4 * np.arange(3 * len(quads))).astype(np.int32),
+        {name: np.tile(values, 3) for name, values in arrays.face_attributes.items()},
+        arrays.feature_count,
+    )
+
+
+def build_sidewalks(coords: np.ndarray, offsets: np.ndarray, way_ids: np.ndarray,
+                    height: float = SIDEWALK_HEIGHT, raised: bool = False) -> MeshArrays:
+    """
+    Build all sidewalks as one ribbon mesh, optionally raised into slabs with kerb walls
+    """
+    widths = np.full(len(offsets) - 1, HIGHWAY_WIDTHS['sidewalk'])
+    arrays = ribbon(coords, offsets, widths, way_ids, height)
+    return add_kerbs(arrays) if raised else arrays
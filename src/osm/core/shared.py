@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+ALIGNMENT = 64
+
+
+def aligned_layout(arrays: dict[str, np.ndarray]) -> tuple[list[tuple], int]:
+    """
+    (name, dtype, shape, offset) of every array packed into one buffer, starting at
+    ALIGNMENT byte boundaries, and the total size
+    """
+    layout = []
+    size = 0
+    for name, array in arrays.items():
+        size = -(-size // ALIGNMENT) * ALIGNMENT
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += array.nbytes
+    return layout, size
+
+
+class SharedArrays:
+    """
+    Named arrays copied once into a single shared memory block.
+
+    Workers attach through the plain descriptor tuple and read the arrays without copying.
+    The creating process owns the block and frees it on close.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        layout, size = aligned_layout(arrays)
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape, start), array in zip(layout, arrays.values()):
+            np.ndarray(shape, dtype, buffer=self._memory.buf, offset=start)[...] = array
+        self.descriptor = (self._memory.name, tuple(layout))
+
+    @property
+    def nbytes(self) -> int:
+        return self._memory.size
+
+    def close(self) -> None:
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@contextmanager
+def attach_shared(descriptor: tuple):
+    """
+    Arrays of a SharedArrays block by name, valid inside the with block only.
+
+    Views must not outlive it, copy whatever is kept.
+    """
+    name, layout = descriptor
+    memory = shared_memory.SharedMemory(name=name)
+    arrays = {key: np.ndarray(shape, np.dtype(dtype), buffer=memory.buf, offset=start)
+              for key, dtype, shape, start in layout}
+    try:
+        yield arrays
+    finally:
+        arrays.clear()
+        memory.close()
@@ -0,0 +1,117 @@
+import numpy as np
+
+from .polylines import filter_vertices, lengths, next_in_ring, owners, previous_in_ring, ring_areas
+from .spatial import polyline_centroids
+
+
+def corner_areas(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Area of the triangle every ring vertex forms with its two neighbours, the area lost when
+    the vertex is removed
+    """
+    a = coords[previous_in_ring(offsets)]
+    c = coords[next_in_ring(offsets)]
+    ab = coords - a
+    ac = c - a
+    return 0.5 * np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0])
+
+
+def _removal_round(coords: np.ndarray, offsets: np.ndarray, min_area: float) -> np.ndarray:
+    """
+    Mask of the vertices removed in one Visvalingam round over all rings at once
+    """
+    areas = corner_areas(coords, offsets)
+    owner = owners(offsets)
+    counts = lengths(offsets)
+    candidate = (areas < min_area) & (counts[owner] > 3)
+    if not np.any(candidate):
+        return candidate
+
+    # Only corners smaller than both candidate neighbours go, so no two neighbouring corners
+    # are removed in the same round and every area stays valid for the round
+    index = np.arange(len(coords))
+    remove = candidate.copy()
+    for neighbour in (next_in_ring(offsets), previous_in_ring(offsets)):
+        smaller = (areas[neighbour] < areas) | ((areas[neighbour] == areas) & (neighbour < index))
+        remove &= ~(candidate[neighbour] & smaller)
+
+    # Every ring keeps at least a triangle
+    removed = np.cumsum(remove)
+    rank = removed - np.concatenate([[0], removed])[offsets[:-1]][owner]
+    return remove & (rank <= counts[owner] - 3)
+
+
+def simplify_rings(coords: np.ndarray, offsets: np.ndarray, min_area: float,
+                   preserve_area: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Visvalingam-Whyatt simplification of closed rings (without a repeated closing vertex).
+
+    Corners cutting off less than min_area square metres are removed, smallest first, until
+    none is left. With preserve_area every simplified ring is scaled about its centroid back
+    to its original area, so footprints don't visibly shrink at a distance.
+    """
+    if min_area <= 0.0 or len(coords) == 0:
+        return coords, offsets
+
+    original = ring_areas(coords, offsets)
+    while True:
+        remove = _removal_round(coords, offsets, min_area)
+        if not np.any(remove):
+            break
+        coords, offsets = filter_vertices(coords, offsets, ~remove)
+
+    if preserve_area:
+        simplified = ring_areas(coords, offsets)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.sqrt(original / simplified)
+        scale[~np.isfinite(scale)] = 1.0
+        owner = owners(offsets)
+        centroids = polyline_centroids(coords, offsets)
+        coords = centroids[owner] + (coords - centroids[owner]) * scale[owner, None]
+    return coords, offsets
+
+
+def simplify_polylines(coords: np.ndarray, offsets: np.ndarray, tolerance: float,
+                       fixed: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Remove nearly collinear interior vertices of open polylines, all polylines at once.
+
+    A vertex goes when it lies between its current neighbours and closer than tolerance to
+    the chord joining them. End points and vertices marked in fixed are always kept. Returns
+    the coords, offsets and the input index of every kept vertex.
+    """
+    kept = np.arange(len(coords))
+    if tolerance <= 0.0 or len(coords) == 0:
+        return coords, offsets, kept
+    movable = np.ones(len(coords), dtype=bool) if fixed is None else ~fixed
+
+    while True:
+        index = np.arange(len(coords))
+        interior = np.ones(len(coords), dtype=bool)
+        interior[offsets[:-1][lengths(offsets) > 0]] = False
+        interior[offsets[1:][lengths(offsets) > 0] - 1] = False
+        prv = np.where(interior, index - 1, index)
+        nxt = np.where(interior, index + 1, index)
+
+        chord = coords[nxt] - coords[prv]
+        length = np.hypot(chord[:, 0], chord[:, 1])
+        to_vertex = coords - coords[prv]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation = np.abs(chord[:, 0] * to_vertex[:, 1] - chord[:, 1] * to_vertex[:, 0]) / length
+            along = np.sum(chord * to_vertex, axis=1) / (length * length)
+        # A vertex beyond its neighbours is a spike doubling back, not a collinear one
+        candidate = (interior & movable & (length > 0) & (deviation < tolerance)
+                     & (along >= 0) & (along <= 1))
+        if not np.any(candidate):
+            break
+
+        # Local minima only, as for rings, so neighbours are never removed in the same round
+        remove = candidate.copy()
+        for neighbour in (nxt, prv):
+            smaller = (deviation[neighbour] < deviation) | (
+                (deviation[neighbour] == deviation) & (neighbour < index))
+            remove &= ~(candidate[neighbour] & smaller & (neighbour != index))
+        coords, offsets = filter_vertices(coords, offsets, ~remove)
+        kept = kept[~remove]
+        movable = movable[~remove]
+    return coords, offsets, kept
@@ -0,0 +1,265 @@
+import math
+from typing import NamedTuple
+import numpy as np
+
+from .polylines import filter_polylines, lengths, offsets_from_lengths, owners
+
+
+class Rect(NamedTuple):
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+
+    def contains(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Mask of the points inside the rectangle, borders included
+        """
+        return (x >= self.min_x) & (x <= self.max_x) & (y >= self.min_y) & (y <= self.max_y)
+
+
+def split_rect(rect: Rect, count: int) -> list[Rect]:
+    """
+    rect cut into a grid of at least count cells of similar shape, neighbouring cells share
+    their edges exactly
+    """
+    width = rect.max_x - rect.min_x
+    height = rect.max_y - rect.min_y
+    columns = max(1, round(math.sqrt(count * width / height))) if height > 0 else max(1, count)
+    rows = max(1, math.ceil(count / columns))
+    xs = np.linspace(rect.min_x, rect.max_x, columns + 1).tolist()
+    ys = np.linspace(rect.min_y, rect.max_y, rows + 1).tolist()
+    return [Rect(xs[col], ys[row], xs[col + 1], ys[row + 1])
+            for row in range(rows) for col in range(columns)]
+
+
+def polyline_bounds(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    (M, 4) min_x, min_y, max_x, max_y of every polyline, empty polylines get inverted
+    infinite bounds so they never overlap anything
+    """
+    bounds = np.empty((len(offsets) - 1, 4), dtype=np.float64)
+    bounds[:, :2] = np.inf
+    bounds[:, 2:] = -np.inf
+    non_empty = lengths(offsets) > 0
+    if np.any(non_empty):
+        starts = offsets[:-1][non_empty]
+        bounds[non_empty, :2] = np.minimum.reduceat(coords, starts, axis=0)
+        bounds[non_empty, 2:] = np.maximum.reduceat(coords, starts, axis=0)
+    return bounds
+
+
+def polyline_centroids(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    (M, 2) vertex mean of every polyline, NaN for empty ones
+    """
+    owner = owners(offsets)
+    count = lengths(offsets)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.stack([
+            np.bincount(owner, weights=coords[:, 0], minlength=len(count)) / count,
+            np.bincount(owner, weights=coords[:, 1], minlength=len(count)) / count,
+        ], axis=1)
+
+
+class GridIndex:
+    """
+    Uniform grid over feature bounding boxes.
+
+    Every feature is registered in all cells its bounds overlap, cell contents are stored
+    as one feature array sorted by cell with per-cell offsets.
+    """
+
+    def __init__(self, bounds: np.ndarray, cell_size: float | None = None):
+        self.bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        valid = np.all(np.isfinite(self.bounds), axis=1)
+
+        if np.any(valid):
+            self.origin = self.bounds[valid, :2].min(axis=0)
+            extent = self.bounds[valid, 2:].max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.zeros(2)
+
+        if cell_size is None:
+            # About one feature per cell for evenly spread features
+            cell_size = max(float(extent.max()) /
+                            max(1.0, np.ceil(np.sqrt(np.count_nonzero(valid)))), 1.0)
+        self.cell_size = float(cell_size)
+        self.shape = (np.floor(extent / self.cell_size).astype(np.int64) + 1)
+
+        first = self._cell(self.bounds[valid, :2])
+        last = self._cell(self.bounds[valid, 2:])
+        span = last - first + 1
+        counts = span[:, 0] * span[:, 1]
+
+        # Expand every feature into the cells it covers in one pass
+        features = np.repeat(np.flatnonzero(valid), counts)
+        local = np.arange(counts.sum()) - np.repeat(offsets_from_lengths(counts)[:-1], counts)
+        width = np.repeat(span[:, 0], counts)
+        cell_x = np.repeat(first[:, 0], counts) + local % width
+        cell_y = np.repeat(first[:, 1], counts) + local // width
+        cells = cell_y * self.shape[0] + cell_x
+
+        order = np.argsort(cells, kind='stable')
+        self.features = features[order]
+        self.cell_offsets = offsets_from_lengths(
+            np.bincount(cells, minlength=int(self.shape[0] * self.shape[1])))
+
+    @classmethod
+    def from_polylines(cls, coords: np.ndarray, offsets: np.ndarray,
+                       cell_size: float | None = None) -> 'GridIndex':
+        return cls(polyline_bounds(coords, offsets), cell_size)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def _cell(self, points: np.ndarray) -> np.ndarray:
+        cell = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cell, 0, self.shape - 1)
+
+    def query(self, rect: Rect) -> np.ndarray:
+        """
+        Sorted indices of the features whose bounds overlap the rectangle
+        """
+        if len(self.features) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        first = self._cell(np.array([rect.min_x, rect.min_y]))
+        last = self._cell(np.array([rect.max_x, rect.max_y]))
+        rows = np.arange(first[1], last[1] + 1) * self.shape[0]
+        cells = (rows[:, None] + np.arange(first[0], last[0] + 1)[None, :]).ravel()
+
+        starts = self.cell_offsets[cells]
+        counts = self.cell_offsets[cells + 1] - starts
+        slots = np.repeat(starts - offsets_from_lengths(counts)[:-1], counts) + \
+            np.arange(counts.sum())
+        candidates = np.unique(self.features[slots])
+
+        bounds = self.bounds[candidates]
+        overlap = (bounds[:, 0] <= rect.max_x) & (bounds[:, 2] >= rect.min_x) & \
+            (bounds[:, 1] <= rect.max_y) & (bounds[:, 3] >= rect.min_y)
+        return candidates[overlap]
+
+    def within(self, rect: Rect) -> np.ndarray:
+        """
+        Mask of the features whose bounds lie entirely inside the rectangle
+        """
+        return (self.bounds[:, 0] >= rect.min_x) & (self.bounds[:, 2] <= rect.max_x) & \
+            (self.bounds[:, 1] >= rect.min_y) & (self.bounds[:, 3] <= rect.max_y)
+
+
+def clip_polylines(coords: np.ndarray, offsets: np.ndarray,
+                   rect: Rect) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip all polylines to the rectangle with a vectorized Liang-Barsky pass over every segment.
+
+    A polyline leaving and re-entering the rectangle is split into several pieces. Returns the
+    clipped coords, offsets and the source polyline index of every piece.
+    """
+    owner = owners(offsets)
+    first = np.zeros(len(coords), dtype=bool)
+    first[offsets[:-1][lengths(offsets) > 0]] = True
+
+    # Segment i runs from vertex i to vertex i + 1 of the same polyline
+    segment = np.flatnonzero(~first[1:]) if len(coords) else np.zeros(0, dtype=np.int64)
+    start = coords[segment].astype(np.float64)
+    delta = coords[segment + 1] - start
+
+    t0 = np.zeros(len(segment))
+    t1 = np.ones(len(segment))
+    visible = np.ones(len(segment), dtype=bool)
+    edges = (
+        (-delta[:, 0], start[:, 0] - rect.min_x),
+        (delta[:, 0], rect.max_x - start[:, 0]),
+        (-delta[:, 1], start[:, 1] - rect.min_y),
+        (delta[:, 1], rect.max_y - start[:, 1]),
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in edges:
+            ratio = q / p
+            t0 = np.where(p < 0, np.maximum(t0, ratio), t0)
+            t1 = np.where(p > 0, np.minimum(t1, ratio), t1)
+            visible &= (p != 0) | (q >= 0)
+    visible &= (t0 < t1) | ((t0 == 0) & (t1 == 1))
+
+    segment, start, delta = segment[visible], start[visible], delta[visible]
+    t0, t1 = t0[visible], t1[visible]
+
+    # A segment continues the previous piece when both are visible, consecutive and
+    # unclipped at the shared vertex
+    continues = np.zeros(len(segment), dtype=bool)
+    continues[1:] = (segment[1:] == segment[:-1] + 1) & (t1[:-1] == 1) & (t0[1:] == 0)
+    opens = ~continues
+
+    # Every segment emits its end point, segments opening a piece also their start point
+    emitted = np.ones(len(segment), dtype=np.int64) + opens
+    position = offsets_from_lengths(emitted)
+    clipped = np.empty((position[-1], 2), dtype=coords.dtype)
+    clipped[position[:-1][opens]] = (start + delta * t0[:, None])[opens]
+    clipped[position[1:] - 1] = start + delta * t1[:, None]
+
+    piece_offsets = np.append(position[:-1][opens], position[-1])
+    return clipped, piece_offsets, owner[segment[opens]]
+
+
+def cull_polylines(coords: np.ndarray, offsets: np.ndarray, rect: Rect) -> np.ndarray:
+    """
+    Mask of the polylines whose centroid lies inside the rectangle.
+
+    Used for footprints, which are kept or dropped whole rather than cut at the border.
+    """
+    centroid = polyline_centroids(coords, offsets)
+    return rect.contains(centroid[:, 0], centroid[:, 1])
+
+
+def rect_like(rect: Rect, coords: np.ndarray) -> Rect:
+    """
+    The rect rounded to the dtype of the coordinates. A float32 point on a float64 border
+    could otherwise round to just outside it and be dropped.
+    """
+    return Rect(*np.asarray(rect, dtype=coords.dtype).tolist())
+
+
+def clip_to_rect(coords: np.ndarray, offsets: np.ndarray, rect: Rect,
+                 index: GridIndex | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip polylines to the rectangle, using the index to skip the ones entirely inside or outside.
+
+    Returns coords, offsets and the source polyline index of every piece.
+    """
+    rect = rect_like(rect, coords)
+    if index is None:
+        index = GridIndex.from_polylines(coords, offsets)
+    candidates = index.query(rect)
+    inside = candidates[index.within(rect)[candidates]]
+    crossing = np.setdiff1d(candidates, inside, assume_unique=True)
+
+    keep = np.zeros(len(offsets) - 1, dtype=bool)
+    keep[inside] = True
+    inside_coords, inside_offsets = filter_polylines(coords, offsets, keep)
+
+    keep[:] = False
+    keep[crossing] = True
+    clipped, clipped_offsets, source = clip_polylines(
+        *filter_polylines(coords, offsets, keep), rect)
+
+    return (np.concatenate([inside_coords, clipped]),
+            np.append(inside_offsets[:-1], clipped_offsets + inside_offsets[-1]),
+            np.concatenate([inside, crossing[source]]))
+
+
+def cull_to_rect(coords: np.ndarray, offsets: np.ndarray, rect: Rect,
+                 index: GridIndex | None = None) -> np.ndarray:
+    """
+    Mask of the polylines whose centroid lies inside the rectangle, only index hits are tested
+    """
+    rect = rect_like(rect, coords)
+    if index is None:
+        index = GridIndex.from_polylines(coords, offsets)
+    candidates = index.query(rect)
+    keep_coords, keep_offsets = filter_polylines(
+        coords, offsets, np.isin(np.arange(len(offsets) - 1), candidates))
+    keep = np.zeros(len(offsets) - 1, dtype=bool)
+    keep[candidates[cull_polylines(keep_coords, keep_offsets, rect)]] = True
+    return keep
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from typing import BinaryIO, Callable
+
+
+class FileStore:
+    """
+    Directory of entries, each a body file next to a small JSON record, shared by the on-disk
+    caches.
+
+    The size of all bodies is counted once, on the first write, and kept up to date after
+    that, so writes only look at the other entries once the store grows beyond max_bytes.
+    The least recently used entries are evicted then, the last access of an entry being the
+    modification time of its record, which every read rewrites.
+
+    Subclasses set body_suffix and created_field, the record field the age of an entry is
+    measured from, and call the underscore methods holding _lock.
+    """
+    body_suffix = ".bin"
+    created_field = 'created_at'
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: int | None = None  # body bytes, None until first counted
+        os.makedirs(directory, exist_ok=True)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.body_suffix}")
+
+    def _record_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_record(self, key: str) -> dict | None:
+        try:
+            with open(self._record_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_record(self, key: str, record: dict) -> None:
+        path = self._record_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def _valid(self, record: dict) -> bool:
+        """
+        False for records of an entry that can't be read any more, e.g. of an older format
+        """
+        return True
+
+    def _evictable(self, key: str) -> bool:
+        """
+        False for entries still in use, they are skipped by eviction
+        """
+        return True
+
+    def _lookup(self, key: str, max_age: float | None = None) -> dict | None:
+        """
+        Record of a complete entry created less than max_age seconds ago, marked as accessed.
+        Incomplete and invalid entries are removed.
+        """
+        record = self._read_record(key)
+        if record is None:
+            return None
+        path = self._body_path(key)
+        if not self._valid(record) or not os.path.exists(path) or os.path.getsize(path) != record.get('size'):
+            self._remove(key)
+            return None
+        if max_age is not None and time.time() - record[self.created_field] > max_age:
+            return None
+
+        record['accessed_at'] = time.time()
+        self._write_record(key, record)
+        return record
+
+    def _store(self, key: str, write: Callable[[BinaryIO], None], record: dict) -> None:
+        """
+        Write the body through write(file) and then its record, replacing an older entry of
+        the key. record holds the body size.
+        """
+        path = self._body_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        # The record is written last, an entry without one is never read
+        self._remove(key)
+        os.replace(tmp_path, path)
+        self._write_record(key, record)
+        self._added(record['size'])
+
+    def _added(self, size: int) -> None:
+        """
+        Count a new body, evicting once the store is over its size
+        """
+        if self._total is None:
+            self._evict()
+            return
+        self._total += size
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _remove(self, key: str) -> None:
+        for path in (self._record_path(key), self._body_path(key)):
+            try:
+                size = os.path.getsize(path) if path.endswith(self.body_suffix) else 0
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                # A body still open in the current session can't be removed on Windows
+                print(f"MAP BRIDGE: failed to remove cache entry {path}: {e}")
+                continue
+            if self._total is not None:
+                self._total -= size
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used entries until the bodies fit max_bytes, from one scan
+        of the directory. Bodies left without a record go first.
+        """
+        accessed = {}
+        sizes = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if '.tmp' in name:
+                    continue
+                if name.endswith('.json'):
+                    accessed[name[:-len('.json')]] = entry.stat().st_mtime
+                elif name.endswith(self.body_suffix):
+                    sizes[name[:-len(self.body_suffix)]] = entry.stat().st_size
+
+        total = sum(sizes.values())
+        for key in sorted(sizes, key=lambda key: accessed.get(key, 0.0)):
+            if total <= self.max_bytes:
+                break
+            if not self._evictable(key):
+                continue
+            self._remove(key)
+            total -= sizes[key]
+        self._total = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    self._remove(name[:-len('.json')])
@@ -0,0 +1,319 @@
+import glob
+import math
+import os
+import re
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+from .bbox import BBox
+from .mesh_arrays import MeshArrays, empty_mesh_arrays
+from .projection import unproject
+from .spatial import Rect
+
+
+DEFAULT_TERRAIN_SPACING = 10.0  # metres between the vertices of the terrain mesh
+RASTER_PATTERNS = ('*.hgt', '*.HGT', '*.tif', '*.tiff', '*.TIF', '*.TIFF')
+
+_HGT_NAME = re.compile(r'([NS])(\d{2})([EW])(\d{3})', re.IGNORECASE)
+
+# TIFF tags read from GeoTIFF rasters
+_WIDTH, _HEIGHT, _BITS, _COMPRESSION = 256, 257, 258, 259
+_STRIP_OFFSETS, _SAMPLES, _STRIP_BYTES, _PLANAR = 273, 277, 279, 284
+_TILE_WIDTH, _SAMPLE_FORMAT = 322, 339
+_PIXEL_SCALE, _TIEPOINT, _GEO_KEYS, _NODATA = 33550, 33922, 34735, 42113
+_RASTER_TYPE_KEY, _PIXEL_IS_POINT = 1025, 2
+
+# TIFF field type -> struct format
+_FIELD_FORMATS = {1: 'B', 2: 's', 3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 11: 'f', 12: 'd', 16: 'Q'}
+_SAMPLE_KINDS = {1: 'u', 2: 'i', 3: 'f'}
+
+
+class Raster(NamedTuple):
+    """
+    Elevation samples of one tile on a regular lat/lon grid, memory-mapped from disk
+    """
+    values: np.ndarray  # (rows, cols), row 0 is the northmost
+    north: float  # latitude of row 0
+    west: float  # longitude of column 0
+    dlat: float  # degrees between rows
+    dlon: float  # degrees between columns
+    nodata: float | None  # value of void samples
+
+    @property
+    def bbox(self) -> BBox:
+        rows, cols = self.values.shape
+        return BBox(self.north - (rows - 1) * self.dlat, self.west,
+                    self.north, self.west + (cols - 1) * self.dlon)
+
+
+def read_hgt(path: str) -> Raster:
+    """
+    SRTM .hgt tile: a square grid of big-endian int16 metres, named after its south-west
+    corner, with samples on the whole degree lines
+    """
+    match = _HGT_NAME.match(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"Not an SRTM tile name: {path}")
+    lat = int(match[2]) * (1 if match[1].upper() == 'N' else -1)
+    lon = int(match[4]) * (1 if match[3].upper() == 'E' else -1)
+    size = math.isqrt(os.path.getsize(path) // 2)
+    if size < 2 or size * size * 2 != os.path.getsize(path):
+        raise ValueError(f"SRTM tile is not a square int16 grid: {path}")
+
+    values = np.memmap(path, dtype='>i2', mode='r', shape=(size, size))
+    step = 1.0 / (size - 1)
+    return Raster(values, lat + 1.0, float(lon), step, step, -32768)
+
+
+def _tiff_fields(file, order: str) -> dict[int, tuple]:
+    """
+    Values of every field of the first image directory
+    """
+    file.seek(4)
+    (offset,) = struct.unpack(order + 'I', file.read(4))
+    file.seek(offset)
+    (count,) = struct.unpack(order + 'H', file.read(2))
+    entries = [struct.unpack(order + 'HHI4s', file.read(12)) for _ in range(count)]
+
+    fields = {}
+    for tag, field_type, length, value in entries:
+        code = _FIELD_FORMATS.get(field_type)
+        if code is None:
+            continue
+        size = struct.calcsize(code) * length
+        if size > 4:
+            (offset,) = struct.unpack(order + 'I', value)
+            file.seek(offset)
+            value = file.read(size)
+        if code == 's':
+            fields[tag] = (value[:length].rstrip(b'\0').decode('ascii', 'replace'),)
+        else:
+            fields[tag] = struct.unpack(f"{order}{length}{code}", value[:size])
+    return fields
+
+
+def read_geotiff(path: str) -> Raster:
+    """
+    Single band, uncompressed, strip organised GeoTIFF in lat/lon degrees, mapped in place.
+
+    Compressed or tiled files can't be mapped and are refused.
+    """
+    with open(path, 'rb') as file:
+        header = file.read(4)
+        if header[:2] not in (b'II', b'MM') or header[2:4] not in (b'*\0', b'\0*'):
+            raise ValueError(f"Not a classic TIFF file: {path}")
+        order = '<' if header[:2] == b'II' else '>'
+        fields = _tiff_fields(file, order)
+
+    if fields.get(_COMPRESSION, (1,))[0] != 1 or _TILE_WIDTH in fields:
+        raise ValueError(f"Only uncompressed strip GeoTIFFs can be memory-mapped: {path}")
+    if fields.get(_SAMPLES, (1,))[0] != 1 or fields.get(_PLANAR, (1,))[0] != 1:
+        raise ValueError(f"GeoTIFF has more than one band: {path}")
+    if _PIXEL_SCALE not in fields or _TIEPOINT not in fields:
+        raise ValueError(f"TIFF has no georeferencing: {path}")
+
+    width, height = fields[_WIDTH][0], fields[_HEIGHT][0]
+    kind = _SAMPLE_KINDS[fields.get(_SAMPLE_FORMAT, (1,))[0]]
+    dtype = np.dtype(f"{order}{kind}{fields[_BITS][0] // 8}")
+    offsets = np.array(fields[_STRIP_OFFSETS], dtype=np.int64)
+    counts = np.array(fields[_STRIP_BYTES], dtype=np.int64)
+    if np.any(offsets[1:] != offsets[:-1] + counts[:-1]) or counts.sum() < width * height * dtype.itemsize:
+        raise ValueError(f"GeoTIFF strips are not stored contiguously: {path}")
+    values = np.memmap(path, dtype=dtype, mode='r', offset=int(offsets[0]), shape=(height, width))
+
+    scale_x, scale_y = fields[_PIXEL_SCALE][:2]
+    column, row, _, lon, lat = fields[_TIEPOINT][:5]
+    geo_keys = fields.get(_GEO_KEYS, ())
+    keys = {geo_keys[i]: geo_keys[i + 3] for i in range(4, len(geo_keys) - 3, 4)}
+    # Pixel-is-area rasters are georeferenced at the corner of a pixel, not its centre
+    half = 0.0 if keys.get(_RASTER_TYPE_KEY) == _PIXEL_IS_POINT else 0.5
+    nodata = float(fields[_NODATA][0]) if _NODATA in fields else None
+    return Raster(values, lat - (half - row) * scale_y, lon + (half - column) * scale_x,
+                  scale_y, scale_x, nodata)
+
+
+def read_raster(path: str) -> Raster:
+    if path.lower().endswith('.hgt'):
+        return read_hgt(path)
+    return read_geotiff(path)
+
+
+def _overlaps(a: BBox, b: BBox) -> bool:
+    return (a.min_lat <= b.max_lat and a.max_lat >= b.min_lat
+            and a.min_lon <= b.max_lon and a.max_lon >= b.min_lon)
+
+
+def terrain_files(path: str) -> list[str]:
+    """
+    Elevation rasters of a directory, or the single raster path
+    """
+    if os.path.isdir(path):
+        return sorted({file for pattern in RASTER_PATTERNS
+                       for file in glob.glob(os.path.join(path, pattern))})
+    return [path]
+
+
+def sample_raster(raster: Raster, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """
+    Bilinear heights at the points, NaN outside the raster and where every surrounding
+    sample is void. Only the samples around the points are read from disk.
+    """
+    rows, cols = raster.values.shape
+    row = (raster.north - lat) / raster.dlat
+    col = (lon - raster.west) / raster.dlon
+    heights = np.full(len(lat), np.nan, dtype=np.float32)
+    inside = np.flatnonzero((row >= 0) & (row <= rows - 1) & (col >= 0) & (col <= cols - 1))
+    if len(inside) == 0:
+        return heights
+
+    row = row[inside]
+    col = col[inside]
+    r0 = np.minimum(row.astype(np.int64), rows - 2)
+    c0 = np.minimum(col.astype(np.int64), cols - 2)
+    fr = (row - r0).astype(np.float32)
+    fc = (col - c0).astype(np.float32)
+
+    # Gather through flat indices of the mapped samples, one lookup per corner
+    flat = raster.values.reshape(-1)
+    corner = r0 * cols + c0
+    total = np.zeros(len(inside), dtype=np.float32)
+    weight_sum = np.zeros(len(inside), dtype=np.float32)
+    for offset, weight in ((0, (1 - fr) * (1 - fc)), (1, (1 - fr) * fc),
+                           (cols, fr * (1 - fc)), (cols + 1, fr * fc)):
+        values = flat[corner + offset].astype(np.float32)
+        # Void samples drop out and the others are weighted up
+        void = np.isnan(values)
+        if raster.nodata is not None:
+            void |= values == raster.nodata
+        weight[void] = 0.0
+        values[void] = 0.0
+        total += weight * values
+        weight_sum += weight
+    with np.errstate(invalid='ignore', divide='ignore'):
+        heights[inside] = total / weight_sum
+    return heights
+
+
+class Terrain:
+    """
+    Elevation rasters covering an area, sampled by lat/lon or in the local frame of an import
+    """
+
+    def __init__(self, rasters: list[Raster]):
+        self.rasters = rasters
+
+    @classmethod
+    def open(cls, path: str, bbox: BBox) -> 'Terrain':
+        """
+        Map the rasters of a directory (or a single raster file) that overlap bbox
+        """
+        rasters = []
+        for file in terrain_files(path):
+            match = _HGT_NAME.match(os.path.basename(file))
+            if match is not None and file.lower().endswith('.hgt'):
+                # SRTM tiles are known by name, files far away are never opened
+                lat = int(match[2]) * (1 if match[1].upper() == 'N' else -1)
+                lon = int(match[4]) * (1 if match[3].upper() == 'E' else -1)
+                if not _overlaps(BBox(lat, lon, lat + 1, lon + 1), bbox):
+                    continue
+            raster = read_raster(file)
+            if _overlaps(raster.bbox, bbox):
+                rasters.append(raster)
+        if not rasters:
+            raise ValueError(f"No elevation data covers the area in {path}")
+        return cls(rasters)
+
+    def sample(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """
+        Heights in metres at the points, the first raster covering a point wins. Points no
+        raster covers get the mean height of the others, so they stay near the ground.
+        """
+        heights = np.full(len(lat), np.nan, dtype=np.float32)
+        for raster in self.rasters:
+            missing = np.flatnonzero(np.isnan(heights))
+            if len(missing) == 0:
+                break
+            heights[missing] = sample_raster(raster, lat[missing], lon[missing])
+
+        missing = np.isnan(heights)
+        if np.any(missing):
+            heights[missing] = 0.0 if np.all(missing) else np.mean(heights[~missing])
+        return heights
+
+    def sample_local(self, xy: np.ndarray, frame) -> np.ndarray:
+        """
+        Heights at (N, 2) local coordinates of a LocalFrame
+        """
+        if len(xy) == 0:
+            return np.zeros(0, dtype=np.float32)
+        x = xy[:, 0].astype(np.float64) + frame.origin[0]
+        y = xy[:, 1].astype(np.float64) + frame.origin[1]
+        return self.sample(*unproject(x, y, *frame.center, frame.projection))
+
+
+def terrain_fingerprint(path: str) -> list:
+    """
+    Name, size and modification time of every raster, for cache keys
+    """
+    fingerprint = []
+    for file in terrain_files(path):
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        fingerprint.append([os.path.abspath(file), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def drape_mesh(arrays: MeshArrays, heights: np.ndarray, rigid: bool = False) -> MeshArrays:
+    """
+    Lift a mesh by the ground heights under its vertices.
+
+    With rigid every feature, told apart by its "osm_id" face attribute, moves as one by the
+    lowest ground under it, so buildings keep flat roofs and vertical walls and never float.
+    """
+    if rigid and 'osm_id' in arrays.face_attributes and len(arrays.loop_starts):
+        face_sizes = np.diff(np.append(arrays.loop_starts, len(arrays.loop_vertices)))
+        feature = np.zeros(len(arrays.vertices), dtype=np.int64)
+        feature[arrays.loop_vertices] = np.repeat(arrays.face_attributes['osm_id'], face_sizes)
+        _, inverse = np.unique(feature, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        starts = np.flatnonzero(np.r_[True, inverse[order][1:] != inverse[order][:-1]])
+        lowest = np.minimum.reduceat(heights[order], starts)
+        heights = lowest[inverse]
+
+    vertices = np.array(arrays.vertices, dtype=np.float32)
+    vertices[:, 2] += heights
+    return arrays._replace(vertices=vertices)
+
+
+def terrain_mesh(terrain: Terrain, frame, rect: Rect, spacing: float = DEFAULT_TERRAIN_SPACING) -> MeshArrays:
+    """
+    Grid of quads with a vertex every spacing metres over rect.
+
+    The grid is aligned to multiples of spacing and takes the cells whose centre lies in
+    rect, so meshes of neighbouring rects meet without overlapping.
+    """
+    first_x = math.ceil(rect.min_x / spacing - 0.5)
+    first_y = math.ceil(rect.min_y / spacing - 0.5)
+    columns = math.ceil(rect.max_x / spacing - 0.5) - first_x
+    rows = math.ceil(rect.max_y / spacing - 0.5) - first_y
+    if columns <= 0 or rows <= 0:
+        return empty_mesh_arrays()
+
+    xs = (first_x + np.arange(columns + 1)) * spacing
+    ys = (first_y + np.arange(rows + 1)) * spacing
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    vertices = np.zeros((grid_x.size, 3), dtype=np.float32)
+    vertices[:, 0] = grid_x.ravel()
+    vertices[:, 1] = grid_y.ravel()
+    vertices[:, 2] = terrain.sample_local(vertices[:, :2], frame)
+
+    # Counter-clockwise quads seen from above
+    corner = (np.arange(rows)[:, None] * (columns + 1) + np.arange(columns)[None, :]).ravel()
+    loops = np.stack([corner, corner + 1, corner + columns + 2, corner + columns + 1], axis=1)
+    return MeshArrays(vertices, loops.ravel().astype(np.int32),
+                      np.arange(0, loops.size, 4, dtype=np.int32), {}, 0)
@@ -0,0 +1,199 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+
+DEFAULT_TRACE_DIR = os.path.join(os.path.expanduser("~"), ".map-bridge", "traces")
+PROFILE_ENV = "MAP_BRIDGE_PROFILE"  # set to 1 to capture cProfile stats of every import
+
+
+class Span(NamedTuple):
+    name: str
+    category: str
+    start: float  # perf_counter seconds
+    end: float
+    thread: str  # thread, or outside process, the span ran on
+    args: dict  # items, bytes and whatever else the stage counted
+
+
+class StageSummary(NamedTuple):
+    name: str
+    seconds: float
+    calls: int
+    items: int
+    bytes: int
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _json_value(value):
+    # Counts may come as numpy scalars
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class Tracer:
+    """
+    Spans of wall time of the stages of one import, recorded from any thread.
+
+    Spans carry the items and bytes a stage handled in their args, summary() adds them up
+    by name and chrome_trace() lays them out on a timeline per thread. With profile the
+    code run inside profiled() is captured by cProfile as well.
+    """
+
+    def __init__(self, name: str = "import", profile: bool = False):
+        self.name = name
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self._profile = cProfile.Profile() if profile else None
+        self._profile_depth = threading.local()
+
+    @property
+    def profiling(self) -> bool:
+        return self._profile is not None
+
+    def add(self, name: str, start: float, end: float, category: str = "import",
+            thread: str | None = None, **args) -> None:
+        span = Span(name, category, start, end, thread or threading.current_thread().name, args)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str = "import", **args):
+        """
+        Record the wall time of the block, it may fill in the yielded args dict, e.g. with
+        the items and bytes it handled. Failed blocks are recorded too.
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, start, time.perf_counter(), category, **args)
+
+    @contextmanager
+    def profiled(self):
+        """
+        Run the block under cProfile when profiling, nested blocks of a thread share the
+        outermost one
+        """
+        if self._profile is None:
+            yield
+            return
+        depth = getattr(self._profile_depth, 'value', 0)
+        if depth == 0:
+            self._profile.enable()
+        self._profile_depth.value = depth + 1
+        try:
+            yield
+        finally:
+            self._profile_depth.value = depth
+            if depth == 0:
+                self._profile.disable()
+
+    def snapshot(self) -> list[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    @property
+    def duration(self) -> float:
+        """
+        Seconds from the first span start to the last span end
+        """
+        spans = self.snapshot()
+        if not spans:
+            return 0.0
+        return max(span.end for span in spans) - min(span.start for span in spans)
+
+    def summary(self) -> list[StageSummary]:
+        """
+        Time, calls, items and bytes of every stage, in the order the stages started
+        """
+        stages = {}
+        for span in sorted(self.snapshot(), key=lambda span: span.start):
+            seconds, calls, items, size = stages.get(span.name, (0.0, 0, 0, 0))
+            stages[span.name] = (seconds + span.end - span.start, calls + 1,
+                                 items + int(span.args.get('items', 0)), size + int(span.args.get('bytes', 0)))
+        return [StageSummary(name, *totals) for name, totals in stages.items()]
+
+    def summary_lines(self) -> list[str]:
+        lines = []
+        for stage in self.summary():
+            line = f"{stage.name}: {stage.seconds:.2f} s"
+            if stage.calls > 1:
+                line += f" in {stage.calls} calls"
+            if stage.items:
+                line += f", {stage.items:,} items"
+            if stage.bytes:
+                line += f", {format_bytes(stage.bytes)}"
+            lines.append(line)
+        return lines
+
+    def chrome_trace(self) -> dict:
+        """
+        Spans as Chrome trace events, loadable in chrome://tracing or Perfetto
+        """
+        spans = self.snapshot()
+        origin = min((span.start for span in spans), default=0.0)
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for span in spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': (span.start - origin) * 1e6,
+                'dur': (span.end - span.start) * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': span.args,
+            })
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}}
+                      for thread, tid in threads.items())
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': self.name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, default=_json_value)
+
+    def write_profile(self, path: str) -> None:
+        """
+        cProfile stats of the profiled blocks, readable with pstats or snakeviz
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._profile.dump_stats(path)
+
+
+def traced_steps(tracer: Tracer, name: str, steps, category: str = "scene", **args):
+    """
+    Pass scheduler steps through, recording the time spent inside every step as a span of
+    name with the items it created, args go to the first span only so they add up once.
+    Time between steps, when the scheduler hands control back to Blender, is left out.
+    Returns the return value of steps.
+    """
+    while True:
+        start = time.perf_counter()
+        try:
+            with tracer.profiled():
+                created = next(steps)
+        except StopIteration as done:
+            tracer.add(name, start, time.perf_counter(), category, **args)
+            return done.value
+        except Exception:
+            tracer.add(name, start, time.perf_counter(), category, failed=True, **args)
+            raise
+        tracer.add(name, start, time.perf_counter(), category, items=created or 0, **args)
+        args = {}
+        yield created
@@ -0,0 +1,151 @@
+import bpy
+
+from bpy.types import GeometryNodeTree, Object, NodesModifier
+from .core.procedural import BUILDINGS, SIDEWALKS
+from .core.roads import ROAD_HEIGHT, SIDEWALK_HEIGHT
+
+
+BUILDINGS_GROUP_NAME = "MapBridge Buildings"
+ROADS_GROUP_NAME = "MapBridge Roads"
+MODIFIER_NAME = "MapBridge"
+
+
+def _new_group(name: str) -> GeometryNodeTree:
+    group = bpy.data.node_groups.new(name, 'GeometryNodeTree')
+    group.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+    group.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+    return group
+
+
+def _float_input(group: GeometryNodeTree, name: str, default: float) -> None:
+    socket = group.interface.new_socket(name, in_out='INPUT', socket_type='NodeSocketFloat')
+    socket.default_value = default
+    socket.min_value = 0.0
+
+
+def _input_identifier(group: GeometryNodeTree, name: str) -> str:
+    for item in group.interface.items_tree:
+        if item.item_type == 'SOCKET' and item.in_out == 'INPUT' and item.name == name:
+            return item.identifier
+    raise KeyError(name)
+
+
+def _scaled_attribute(group: GeometryNodeTree, attribute: str, scale, location: tuple[float, float]):
+    """
+    Output socket of a float attribute multiplied by scale
+    """
+    nodes, links = group.nodes, group.links
+    named = nodes.new('GeometryNodeInputNamedAttribute')
+    named.data_type = 'FLOAT'
+    named.inputs['Name'].default_value = attribute
+    named.location = location
+    multiply = nodes.new('ShaderNodeMath')
+    multiply.operation = 'MULTIPLY'
+    multiply.location = (location[0] + 200, location[1])
+    links.new(named.outputs['Attribute'], multiply.inputs[0])
+    links.new(scale, multiply.inputs[1])
+    return multiply.outputs[0]
+
+
+def buildings_node_group() -> GeometryNodeTree:
+    """
+    Footprints extruded by their "height" face attribute, with a bottom cap
+    """
+    group = bpy.data.node_groups.get(BUILDINGS_GROUP_NAME)
+    if group is not None and group.bl_idname == 'GeometryNodeTree':
+        return group
+
+    group = _new_group(BUILDINGS_GROUP_NAME)
+    _float_input(group, "Height Scale", 1.0)
+    nodes, links = group.nodes, group.links
+    group_input = nodes.new('NodeGroupInput')
+    group_input.location = (-600, 0)
+    group_output = nodes.new('NodeGroupOutput')
+    group_output.location = (600, 0)
+
+    # Footprints face up, so the default normal offset extrudes straight up
+    extrude = nodes.new('GeometryNodeExtrudeMesh')
+    extrude.mode = 'FACES'
+    extrude.location = (200, 100)
+    extrude.inputs['Individual'].default_value = False
+    links.new(group_input.outputs['Geometry'], extrude.inputs['Mesh'])
+    links.new(_scaled_attribute(group, 'height', group_input.outputs['Height Scale'], (-200, -100)),
+              extrude.inputs['Offset Scale'])
+
+    bottom = nodes.new('GeometryNodeFlipFaces')
+    bottom.location = (200, -200)
+    links.new(group_input.outputs['Geometry'], bottom.inputs['Mesh'])
+
+    join = nodes.new('GeometryNodeJoinGeometry')
+    join.location = (400, 0)
+    links.new(extrude.outputs['Mesh'], join.inputs['Geometry'])
+    links.new(bottom.outputs['Mesh'], join.inputs['Geometry'])
+    links.new(join.outputs['Geometry'], group_output.inputs['Geometry'])
+    return group
+
+
+def roads_node_group() -> GeometryNodeTree:
+    """
+    Centrelines swept into flat ribbons as wide as their "width" point attribute
+    """
+    group = bpy.data.node_groups.get(ROADS_GROUP_NAME)
+    if group is not None and group.bl_idname == 'GeometryNodeTree':
+        return group
+
+    group = _new_group(ROADS_GROUP_NAME)
+    _float_input(group, "Width Scale", 1.0)
+    _float_input(group, "Height", ROAD_HEIGHT)
+    nodes, links = group.nodes, group.links
+    group_input = nodes.new('NodeGroupInput')
+    group_input.location = (-800, 0)
+    group_output = nodes.new('NodeGroupOutput')
+    group_output.location = (1000, 0)
+
+    to_curve = nodes.new('GeometryNodeMeshToCurve')
+    to_curve.location = (-400, 100)
+    links.new(group_input.outputs['Geometry'], to_curve.inputs['Mesh'])
+
+    # Horizontal normals keep the swept profile flat on the ground
+    normal = nodes.new('GeometryNodeSetCurveNormal')
+    normal.mode = 'Z_UP'
+    normal.location = (-200, 100)
+    links.new(to_curve.outputs['Curve'], normal.inputs['Curve'])
+
+    radius = nodes.new('GeometryNodeSetCurveRadius')
+    radius.location = (200, 100)
+    links.new(normal.outputs['Curve'], radius.inputs['Curve'])
+    links.new(_scaled_attribute(group, 'width', group_input.outputs['Width Scale'], (-200, -100)),
+              radius.inputs['Radius'])
+
+    # A unit wide profile, scaled to the road width by the curve radius
+    profile = nodes.new('GeometryNodeCurvePrimitiveLine')
+    profile.location = (200, -200)
+    profile.inputs['Start'].default_value = (-0.5, 0.0, 0.0)
+    profile.inputs['End'].default_value = (0.5, 0.0, 0.0)
+
+    sweep = nodes.new('GeometryNodeCurveToMesh')
+    sweep.location = (400, 0)
+    links.new(radius.outputs['Curve'], sweep.inputs['Curve'])
+    links.new(profile.outputs['Curve'], sweep.inputs['Profile Curve'])
+
+    lift = nodes.new('ShaderNodeCombineXYZ')
+    lift.location = (400, -200)
+    links.new(group_input.outputs['Height'], lift.inputs['Z'])
+    position = nodes.new('GeometryNodeSetPosition')
+    position.location = (700, 0)
+    links.new(sweep.outputs['Mesh'], position.inputs['Geometry'])
+    links.new(lift.outputs['Vector'], position.inputs['Offset'])
+    links.new(position.outputs['Geometry'], group_output.inputs['Geometry'])
+    return group
+
+
+def add_procedural_modifier(obj: Object, kind: str) -> NodesModifier:
+    """
+    Attach the shared node group of a procedural mesh kind to the object
+    """
+    group = buildings_node_group() if kind == BUILDINGS else roads_node_group()
+    modifier = obj.modifiers.new(MODIFIER_NAME, 'NODES')
+    modifier.node_group = group
+    if kind == SIDEWALKS:
+        modifier[_input_identifier(group, "Height")] = SIDEWALK_HEIGHT
+    return modifier
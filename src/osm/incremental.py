@@ -0,0 +1,139 @@
+import functools
+from typing import NamedTuple
+
+import bpy
+import numpy as np
+
+from bpy.types import Collection, Scene
+from .core.bbox import BBox
+from .core.downloader import split_bbox, tile_index
+from .core.pipeline import ImportSettings, LocalFrame, build_tile_imports
+from .objects import ObjectFactory
+
+
+# Custom properties the incremental import state is kept in, so it is saved with the file
+FRAME_KEY = "map_bridge_frame"  # center lat, center lon, origin x, origin y
+PROJECTION_KEY = "map_bridge_projection"
+TILE_SIZE_KEY = "map_bridge_tile_size"
+TILE_KEY = "map_bridge_tile"  # min lat, min lon, max lat, max lon
+
+ROOT_COLLECTION_NAME = "OSM Import"
+
+
+class IncrementalPlan(NamedTuple):
+    root: Collection | None
+    frame: LocalFrame | None
+    tile_size: float
+    new_tiles: list[BBox]
+    stale: list[Collection]  # tile collections to remove
+    building_ids: np.ndarray  # ids of the buildings already in the scene
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.new_tiles and not self.stale
+
+    def build(self):
+        """
+        Worker job loading and building only the new tiles
+        """
+        return functools.partial(build_tile_imports, tiles=self.new_tiles, frame=self.frame,
+                                 skip_building_ids=self.building_ids)
+
+
+def tracked_root(scene: Scene) -> Collection | None:
+    for collection in scene.collection.children_recursive:
+        if FRAME_KEY in collection:
+            return collection
+    return None
+
+
+def read_frame(root: Collection) -> LocalFrame:
+    center_lat, center_lon, origin_x, origin_y = root[FRAME_KEY]
+    return LocalFrame((center_lat, center_lon), root[PROJECTION_KEY], (origin_x, origin_y))
+
+
+def tile_collections(root: Collection, tile_size: float) -> dict[tuple[int, int], Collection]:
+    return {tile_index(BBox(*child[TILE_KEY]), tile_size): child
+            for child in root.children if TILE_KEY in child}
+
+
+def building_ids(collections: list[Collection]) -> np.ndarray:
+    """
+    OSM ids of the buildings already built, read back from the "osm_id" face attribute
+    """
+    ids = [np.zeros(0, dtype=np.int64)]
+    for collection in collections:
+        for obj in collection.all_objects:
+            mesh = obj.data
+            if obj.type != 'MESH' or not obj.name.startswith("OSM_Buildings"):
+                continue
+            attribute = mesh.attributes.get('osm_id')
+            if attribute is None:
+                continue
+            values = np.empty(len(attribute.data), dtype=np.int32)
+            attribute.data.foreach_get("value", values)
+            ids.append(values.astype(np.int64))
+    return np.unique(np.concatenate(ids))
+
+
+def plan_incremental(scene: Scene, settings: ImportSettings, drop_outside: bool) -> IncrementalPlan:
+    """
+    Compare the tiles covering the selection with the ones already in the scene
+    """
+    tiles = split_bbox(settings.bbox, settings.tile_size)
+    root = tracked_root(scene)
+    if root is not None and (root[PROJECTION_KEY] != settings.projection
+                             or abs(root[TILE_SIZE_KEY] - settings.tile_size) > 1e-12):
+        # A different projection or grid can't be continued, leave the old import untouched
+        # and start a new one next to it
+        for key in (FRAME_KEY, PROJECTION_KEY, TILE_SIZE_KEY):
+            del root[key]
+        root = None
+
+    if root is None:
+        return IncrementalPlan(None, None, settings.tile_size, tiles, [], np.zeros(0, dtype=np.int64))
+
+    existing = tile_collections(root, settings.tile_size)
+    wanted = {tile_index(tile, settings.tile_size) for tile in tiles}
+    new_tiles = [tile for tile in tiles if tile_index(tile, settings.tile_size) not in existing]
+    stale = [collection for key, collection in existing.items()
+             if key not in wanted] if drop_outside else []
+    kept = [collection for collection in existing.values() if collection not in stale]
+
+    return IncrementalPlan(root, read_frame(root), settings.tile_size, new_tiles, stale,
+                           building_ids(kept))
+
+
+def create_root(factory: ObjectFactory, parent: Collection, frame: LocalFrame, tile_size: float) -> Collection:
+    root = factory.new_collection(parent, ROOT_COLLECTION_NAME)
+    root[FRAME_KEY] = [*frame.center, *frame.origin]
+    root[PROJECTION_KEY] = frame.projection
+    root[TILE_SIZE_KEY] = tile_size
+    return root
+
+
+def create_tile_collection(factory: ObjectFactory, root: Collection, tile: BBox, tile_size: float) -> Collection:
+    row, col = tile_index(tile, tile_size)
+    collection = factory.new_collection(root, f"OSM Tile {row}_{col}")
+    collection[TILE_KEY] = list(tile)
+    return collection
+
+
+def remove_tile(collection: Collection) -> int:
+    """
+    Delete a tile collection with its class collections, objects and their data, returns the
+    number of objects
+    """
+    objects = list(collection.all_objects)
+    for obj in objects:
+        data = obj.data
+        bpy.data.objects.remove(obj)
+        if data is not None and data.users == 0:
+            if isinstance(data, bpy.types.Mesh):
+                bpy.data.meshes.remove(data)
+            elif isinstance(data, bpy.types.Curve):
+                bpy.data.curves.remove(data)
+    for child in collection.children_recursive:
+        bpy.data.collections.remove(child)
+    bpy.data.collections.remove(collection)
+    return len(objects)
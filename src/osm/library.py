@@ -0,0 +1,59 @@
+import os
+import tempfile
+from typing import NamedTuple
+
+import bpy
+
+from .core.pipeline import (ImportProgress, ImportSettings, build_osm_import, geometry_key, load_result,
+                            save_result)
+from .objects import ObjectFactory
+from .scene import result_steps
+from ..library import COUNTS_KEY, LIBRARY_COLLECTION_NAME, LibraryCache, write_library
+
+
+class LibraryJob(NamedTuple):
+    path: str  # library .blend file
+    result_path: str | None  # built arrays the headless pass writes the library from, None to reuse it
+    key: str  # of the library in its LibraryCache
+
+
+def prepare_library(settings: ImportSettings, progress: ImportProgress, libraries: LibraryCache,
+                    key: str | None) -> LibraryJob:
+    """
+    Worker job building the arrays of a library import, nothing to build when the library
+    file of identical data and settings exists. Libraries of downloads are rebuilt once
+    older than the response cache ttl, like the geometry cache.
+
+    key is the geometry_key of the import. Downloads without one get theirs once their tiles
+    are in the response cache, only imports that have no key then get a library of their own.
+    """
+    max_age = None if settings.source == 'FILE' else settings.cache_ttl
+    path = libraries.get(key, max_age) if key is not None else None
+    if path is not None:
+        progress.update("Reusing library", 0.95)
+        return LibraryJob(path, None, key)
+
+    result = build_osm_import(settings, progress)
+    if key is None:
+        key = geometry_key(settings) or LibraryCache.new_key()
+        path = libraries.get(key, max_age)
+        if path is not None:
+            progress.update("Reusing library", 0.95)
+            return LibraryJob(path, None, key)
+    progress.update("Writing arrays for the library", 0.95)
+    handle, result_path = tempfile.mkstemp(suffix=".npz", prefix="map-bridge-")
+    os.close(handle)
+    save_result(result_path, result)
+    return LibraryJob(libraries.path(key), result_path, key)
+
+
+def write_osm_library(result_path: str, path: str) -> None:
+    """
+    Headless pass: build the objects of a saved result and write them to a library file
+    """
+    result = load_result(result_path)
+    collection = bpy.data.collections.new(LIBRARY_COLLECTION_NAME)
+    collection[COUNTS_KEY] = [result.building_count, result.road_count, result.sidewalk_count]
+    for _ in result_steps(ObjectFactory(), collection, result):
+        pass
+    write_library(collection, path)
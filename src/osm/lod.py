@@ -0,0 +1,74 @@
+import bpy
+
+from bpy.app.handlers import persistent
+from bpy.types import Object, Scene
+from mathutils import Vector
+from .core.lod import LodMesh
+
+
+LOD_KEY = "map_bridge_lod"  # level, near distance, far distance, cell centre x, y, z
+
+# Camera position the visibility of every scene was last updated for
+_camera_positions: dict[str, tuple | None] = {}
+
+
+def tag_lod(obj: Object, lod: LodMesh) -> None:
+    obj[LOD_KEY] = [lod.level, lod.near, lod.far, *lod.center, lod.ground]
+
+
+def update_lods(scene: Scene, force: bool = False) -> int:
+    """
+    Show every building level whose distance range holds the distance from the scene camera
+    to its cell, returns the number of objects switched. Without a camera the full detail
+    level is shown.
+    """
+    camera = scene.camera
+    eye = camera.matrix_world.translation.copy() if camera is not None else None
+    position = tuple(eye) if eye is not None else None
+    if not force and scene.name in _camera_positions and _camera_positions[scene.name] == position:
+        return 0
+    _camera_positions[scene.name] = position
+
+    switched = 0
+    for obj in scene.objects:
+        lod = obj.get(LOD_KEY)
+        # Linked objects are read-only, only library overrides can be switched
+        if lod is None or obj.library is not None:
+            continue
+        # Objects tagged before terrain support have no centre height
+        level, near, far, x, y, *ground = lod
+        if eye is None:
+            hidden = level != 0
+        else:
+            distance = (obj.matrix_world @ Vector((x, y, ground[0] if ground else 0.0)) - eye).length
+            hidden = not near <= distance < far
+        if obj.hide_viewport != hidden or obj.hide_render != hidden:
+            obj.hide_viewport = hidden
+            obj.hide_render = hidden
+            switched += 1
+    return switched
+
+
+@persistent
+def _on_frame_change(scene: Scene, depsgraph=None) -> None:
+    update_lods(scene)
+
+
+@persistent
+def _on_depsgraph_update(scene: Scene, depsgraph=None) -> None:
+    update_lods(scene)
+
+
+def register_handlers() -> None:
+    if _on_frame_change not in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.append(_on_frame_change)
+    if _on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+
+
+def unregister_handlers() -> None:
+    if _on_frame_change in bpy.app.handlers.frame_change_pre:
+        bpy.app.handlers.frame_change_pre.remove(_on_frame_change)
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    _camera_positions.clear()
@@ -0,0 +1,101 @@
+import bpy
+
+from bpy.types import Collection, Object, Scene
+
+
+# Custom property marking the per-class collections of an import, e.g. "Buildings"
+CLASS_KEY = "map_bridge_class"
+
+# Mesh name prefix -> class collection the objects are linked into
+FEATURE_CLASSES = (
+    ("OSM_Buildings", "Buildings"),
+    ("OSM_Road_", "Roads"),
+    ("OSM_Sidewalks", "Sidewalks"),
+    ("OSM_Terrain", "Terrain"),
+)
+
+
+def feature_class(name: str) -> str:
+    """
+    Class collection of an imported mesh name
+    """
+    for prefix, class_name in FEATURE_CLASSES:
+        if name.startswith(prefix):
+            return class_name
+    return "Other"
+
+
+def parent_collection(scene: Scene, collection: Collection) -> Collection | None:
+    for candidate in [scene.collection, *scene.collection.children_recursive]:
+        if collection.name in candidate.children:
+            return candidate
+    return None
+
+
+def import_collection(scene: Scene, obj: Object) -> Collection:
+    """
+    Collection an imported object was created for, above its class collection if it has one
+    """
+    collection = obj.users_collection[0]
+    if CLASS_KEY in collection:
+        return parent_collection(scene, collection) or collection
+    return collection
+
+
+class ObjectFactory:
+    """
+    Creates the objects of one import under names that are unique from the start, linked into
+    one child collection per feature class.
+
+    Blender makes a taken name unique by probing ".001", ".002", ... against every datablock,
+    so creating many objects of the same name gets slower with every one. The factory reads
+    the taken names once and hands out free ones from a set.
+    """
+
+    def __init__(self):
+        self._taken = {*bpy.data.objects.keys(), *bpy.data.meshes.keys(), *bpy.data.curves.keys()}
+        self._collection_names = set(bpy.data.collections.keys())
+        self._next_number: dict[str, int] = {}
+        self._class_collections: dict[tuple[str, str], Collection] = {}
+
+    def _unique(self, base: str, taken: set[str]) -> str:
+        name = base
+        number = self._next_number.get(base, 0)
+        while name in taken:
+            number += 1
+            name = f"{base}.{number:03d}"
+        self._next_number[base] = number
+        taken.add(name)
+        return name
+
+    def unique_name(self, base: str) -> str:
+        """
+        Name free for both a new object and its data
+        """
+        return self._unique(base, self._taken)
+
+    def new_collection(self, parent: Collection, name: str) -> Collection:
+        collection = bpy.data.collections.new(self._unique(name, self._collection_names))
+        parent.children.link(collection)
+        return collection
+
+    def class_collection(self, parent: Collection, class_name: str) -> Collection:
+        """
+        Child collection of parent holding one feature class, created on first use
+        """
+        key = (parent.name, class_name)
+        collection = self._class_collections.get(key)
+        if collection is None:
+            collection = next((child for child in parent.children
+                               if child.get(CLASS_KEY) == class_name), None)
+            if collection is None:
+                collection = self.new_collection(parent, f"{parent.name} {class_name}")
+                collection[CLASS_KEY] = class_name
+            self._class_collections[key] = collection
+        return collection
+
+    def link(self, obj: Object, parent: Collection, name: str) -> None:
+        """
+        Link an object built for the mesh name into the class collection under parent
+        """
+        self.class_collection(parent, feature_class(name)).objects.link(obj)
@@ -1,224 +1,385 @@
-import xml.etree.ElementTree as ET
-import tempfile
-import bpy
+import functools
 import os
-import urllib.request
-import math
-import numpy as np
 
-from bpy.types import Context
+import bpy
+from xml.etree.ElementTree import ParseError
+
+from bpy.types import Context, Event
 from .._types import OperatorReturnItems
+from .core.bbox import BBox
+from .core.dataset import DatasetStore
+from .core.lod import lod_vertex_counts
+from .core.downloader import DownloadError
+from .core.pbf import PbfError
+from .core.trace import Tracer, traced_steps
+from .core.pipeline import (ImportCancelled, ImportResult, ImportSettings, ImportWorker, create_downloader,
+                            geometry_key)
+from .library import LibraryJob, prepare_library
+from .lod import update_lods
+from .incremental import (ROOT_COLLECTION_NAME, IncrementalPlan, create_root, create_tile_collection,
+                          plan_incremental, remove_tile)
+from .objects import ObjectFactory
+from .scene import result_steps
+from .updates import DATASET_KEY, apply_osm_change, referenced_datasets, tag_settings
+from ..library import COUNTS_KEY, LibraryCache, headless_steps, link_library
+from ..scheduler import BuilderOperator, SceneBuilder
+from ..tracing import finish_trace, start_trace
+
+
+def selected_bbox(map_bridge) -> BBox:
+    return BBox(map_bridge.minLat, map_bridge.minLng, map_bridge.maxLat, map_bridge.maxLng)
+
+
+def import_settings(map_bridge) -> ImportSettings:
+    """
+    Snapshot of the addon properties, safe to hand to a worker thread
+    """
+    return ImportSettings(
+        bbox=selected_bbox(map_bridge),
+        projection=map_bridge.projection,
+        source=map_bridge.osmSource,
+        file_path=bpy.path.abspath(map_bridge.osmFilePath),
+        api_url=map_bridge.osmApiUrl,
+        overpass_url=map_bridge.overpassUrl,
+        tile_size=map_bridge.overpassTileSize if map_bridge.osmSource == 'OVERPASS' else map_bridge.tileSize,
+        download_workers=map_bridge.downloadWorkers,
+        use_cache=map_bridge.useCache,
+        cache_bytes=map_bridge.cacheSizeMb * 1024 * 1024,
+        cache_ttl=map_bridge.cacheTtlHours * 3600,
+        clip=map_bridge.clipToBbox,
+        sidewalks_as_curves=map_bridge.sidewalksAsCurves,
+        raised_sidewalks=map_bridge.raisedSidewalks,
+        building_lods=map_bridge.buildingLods,
+        geometry_nodes=map_bridge.geometryNodes,
+        build_workers=map_bridge.buildWorkers,
+        geometry_cache=map_bridge.useGeometryCache,
+        terrain_path=bpy.path.abspath(map_bridge.terrainPath) if map_bridge.useTerrain else None,
+        terrain_mesh=map_bridge.terrainMesh,
+        terrain_spacing=map_bridge.terrainSpacing,
+    )
+
+
+def scene_item_count(results: list[ImportResult]) -> int:
+    """
+    Faces, loose edges and splines the scene steps of the results create
+    """
+    count = 0
+    for result in results:
+        count += sum(arrays.element_count for arrays in result.meshes.values())
+        if result.sidewalk_curves is not None:
+            count += len(result.sidewalk_curves[1]) - 1
+    return count
+
+
+def lod_vertex_counts_of(results: list[ImportResult]) -> list[int]:
+    totals = []
+    for result in results:
+        if result.lods is None:
+            continue
+        for level, count in enumerate(lod_vertex_counts(result.meshes, result.lods)):
+            if level == len(totals):
+                totals.append(0)
+            totals[level] += count
+    return totals
+
+
+class MAPBRIDGE_OT_PrefetchOsm(bpy.types.Operator):
+    bl_idname = "osm.prefetch"
+    bl_label = "Prefetch Area"
+    bl_description = "Download the selected area into the OSM cache without importing it"
+
+    def execute(self, context: Context) -> set[OperatorReturnItems]:
+        scene = context.scene
+        if not scene:
+            return {'CANCELLED'}
+
+        map_bridge = scene.map_bridge
+        if map_bridge.osmSource == 'FILE' or not map_bridge.useCache:
+            self.report({"ERROR"}, "Enable the OSM cache of a download source to prefetch areas")
+            return {'CANCELLED'}
+
+        try:
+            tile_count = create_downloader(import_settings(map_bridge)).prefetch(
+                [selected_bbox(map_bridge)])
+        except (DownloadError, ValueError, OSError) as e:
+            self.report({"ERROR"}, f"Failed to prefetch OSM data: {e}")
+            return {'CANCELLED'}
+
+        self.report({"INFO"}, f"Cached {tile_count} OSM tiles")
+        return {'FINISHED'}
+
+
+class OsmImport:
+    """
+    Scene steps and final report of one import. They run on the builder, which may be
+    resumed by another operator after the one that started the import has finished.
+    """
+
+    def __init__(self, tracer: Tracer, settings: ImportSettings, plan: IncrementalPlan | None = None,
+                 dataset_path: str | None = None):
+        self.tracer = tracer
+        self.settings = settings
+        self.plan = plan
+        self.dataset_path = dataset_path
+        self.factory: ObjectFactory | None = None
+        self.results: list[ImportResult] = []
+        self.libraries: LibraryCache | None = None
+        self.library = None  # collection linked by a library import
+        self.library_path: str | None = None
+
+    def incremental_steps(self, parent, plan: IncrementalPlan, results: list[ImportResult]):
+        """
+        Remove the tiles that left the selection, then add every new tile in its own collection
+        """
+        for collection in plan.stale:
+            with self.tracer.span("remove tiles", "scene", items=1):
+                remove_tile(collection)
+            yield 0
+
+        root = plan.root
+        for result in results:
+            if root is None:
+                root = create_root(self.factory, parent, result.frame, plan.tile_size)
+            if self.dataset_path:
+                root[DATASET_KEY] = self.dataset_path
+            collection = create_tile_collection(self.factory, root, result.tile, plan.tile_size)
+            if self.dataset_path:
+                # Per tile, later tiles of the same root may be built with other settings
+                tag_settings(collection, self.settings)
+            yield from result_steps(self.factory, collection, result, self.dataset_path, self.tracer)
+
+    def import_steps(self, parent, result: ImportResult):
+        """
+        A single import in its own collection
+        """
+        collection = self.factory.new_collection(parent, ROOT_COLLECTION_NAME)
+        if self.dataset_path:
+            tag_settings(collection, self.settings)
+        yield from result_steps(self.factory, collection, result, self.dataset_path, self.tracer)
+
+    def library_steps(self, parent, scene, view_layer, job: LibraryJob, override: bool):
+        """
+        Write the library in a headless Blender unless it already exists, then link it. The
+        objects never exist in the working file, which keeps its undo steps and saves small.
+        """
+        if job.result_path is not None:
+            try:
+                yield from headless_steps('osm.library', 'write_osm_library', job.result_path, job.path,
+                                          tracer=self.tracer)
+            finally:
+                os.remove(job.result_path)
+        with self.tracer.span("link library", "scene", bytes=os.path.getsize(job.path)):
+            self.library = link_library(job.path, parent, scene, view_layer, override)
+        self.library_path = job.path
+        if job.result_path is not None:
+            # Once linked, so making room for it never removes the library itself
+            self.libraries.added(job.key)
+        yield 1
+
+    def create_builder(self, context: Context,
+                       result: ImportResult | list[ImportResult] | LibraryJob) -> SceneBuilder:
+        self.factory = ObjectFactory()
+        self.library = None
+        if isinstance(result, LibraryJob):
+            self.results = []
+            steps = self.library_steps(context.collection, context.scene, context.view_layer, result,
+                                       context.scene.map_bridge.libraryOverride)
+        elif self.plan is not None:
+            self.results = result
+            steps = self.incremental_steps(context.collection, self.plan, result)
+        else:
+            self.results = [result]
+            steps = self.import_steps(context.collection, result)
+        return SceneBuilder("OSM import", traced_steps(self.tracer, "create objects", steps),
+                            total=scene_item_count(self.results),
+                            budget_ms=context.scene.map_bridge.tickBudgetMs, on_finish=self.finished)
 
+    def finished(self, context: Context, builder: SceneBuilder, report) -> set[OperatorReturnItems]:
+        finish_trace(self.tracer)
+        if self.dataset_path:
+            # Once its objects exist, so making room for it never removes the dataset itself
+            DatasetStore().added(self.dataset_path, referenced_datasets())
+        if builder.state == 'FAILED':
+            report({"ERROR"}, f"Failed to create OSM objects: {builder.error}")
+            return {'FINISHED'}
 
-OSM_API_URL = "https://api.openstreetmap.org/api/0.6/map?bbox={min_lon},{min_lat},{max_lon},{max_lat}"
+        if self.library is not None:
+            building_count, road_count, sidewalk_count = self.library.get(COUNTS_KEY, (0, 0, 0))
+            update_lods(context.scene, force=True)
+            report({"INFO"}, f"Linked {building_count} buildings, {road_count} roads and "
+                             f"{sidewalk_count} sidewalks from library {self.library_path}")
+            return {'FINISHED'}
 
+        results = self.results
+        message = (f"Imported {sum(r.building_count for r in results)} buildings, "
+                   f"{sum(r.road_count for r in results)} roads, "
+                   f"and {sum(r.sidewalk_count for r in results)} sidewalks")
+        if self.plan is not None:
+            message += (f" in {len(self.plan.new_tiles)} new tiles, "
+                        f"removed {len(self.plan.stale)} tiles outside the area")
+        vertex_counts = lod_vertex_counts_of(results)
+        if vertex_counts:
+            update_lods(context.scene, force=True)
+            message += ". Building vertices per LOD: " + ", ".join(
+                f"LOD{level} {count}" for level, count in enumerate(vertex_counts))
+        report({"INFO"}, f"{message} in {self.tracer.duration:.2f} s. Scene built: {builder.summary()}")
+        return {'FINISHED'}
 
-class MAPBRIDGE_OT_RunOsmImport(bpy.types.Operator):
+
+class MAPBRIDGE_OT_RunOsmImport(BuilderOperator, bpy.types.Operator):
     bl_idname = "osm.run"
     bl_label = "Import OSM Area"
     bl_description = "Import 3D buildings, roads and sidewalks from OpenStreetMap for the selected area"
     bl_options = {'REGISTER', 'UNDO'}
 
+    _worker: ImportWorker | None = None
+    _import: OsmImport | None = None
+
+    def report_source(self, settings: ImportSettings) -> None:
+        if settings.source == 'FILE':
+            self.report({"INFO"}, f"Reading OSM extract: {settings.file_path}")
+        elif settings.source == 'OVERPASS':
+            self.report({"INFO"}, f"Querying Overpass API: {settings.overpass_url}")
+        else:
+            self.report({"INFO"}, f"Downloading OSM data from: {settings.api_url}")
+
+    def start_import(self, context: Context) -> ImportWorker | None:
+        """
+        Plan the import and prepare its worker, None when there is nothing to do
+        """
+        map_bridge = context.scene.map_bridge
+        settings = import_settings(map_bridge)
+        self._import = state = OsmImport(start_trace("OSM import"), settings)
+        if map_bridge.incrementalImport:
+            state.plan = plan_incremental(context.scene, settings, map_bridge.dropOutsideTiles)
+            if state.plan.is_empty:
+                self.report({"INFO"}, "The selected area is already imported")
+                return None
+            if map_bridge.keepOsmData:
+                # Tiles added later go into the dataset the first ones were kept in
+                root = state.plan.root
+                state.dataset_path = root.get(DATASET_KEY) if root is not None else None
+                state.dataset_path = state.dataset_path or DatasetStore().new_path()
+                settings = settings._replace(dataset_path=state.dataset_path)
+            if state.plan.new_tiles:
+                self.report_source(settings)
+            return ImportWorker(settings, state.plan.build(), state.tracer)
+
+        if map_bridge.useLibrary:
+            # Linked meshes can't take osmChange updates, so no dataset is kept for them
+            state.libraries = LibraryCache(map_bridge.libraryDirectory)
+            self.report_source(settings)
+            return ImportWorker(settings, functools.partial(prepare_library, libraries=state.libraries,
+                                                            key=geometry_key(settings)),
+                                state.tracer)
+
+        if map_bridge.keepOsmData:
+            state.dataset_path = DatasetStore().new_path()
+            settings = settings._replace(dataset_path=state.dataset_path)
+        self.report_source(settings)
+        return ImportWorker(settings, tracer=state.tracer)
+
+    def fail(self, error: Exception) -> set[OperatorReturnItems]:
+        finish_trace(self._import.tracer)
+        if isinstance(error, ImportCancelled):
+            self.report({"WARNING"}, str(error))
+        elif isinstance(error, (DownloadError, PbfError, ValueError, OSError)):
+            self.report({"ERROR"}, f"Failed to load OSM data: {error}")
+        else:
+            self.report({"ERROR"}, f"Failed to import OSM data: {error}")
+        return {'CANCELLED'}
+
     def execute(self, context: Context) -> set[OperatorReturnItems]:
+        """
+        Blocking import, used when the operator is run from scripts or redone
+        """
         scene = context.scene
         if not scene:
             return {'CANCELLED'}
 
-        map_bridge = scene.map_bridge
-        min_lat = map_bridge.minLat
-        max_lat = map_bridge.maxLat
-        min_lon = map_bridge.minLng
-        max_lon = map_bridge.maxLng
+        worker = self.start_import(context)
+        if worker is None:
+            return {'FINISHED'}
+        # Run on this thread, errors are kept on the worker as in the background
+        worker.run()
+        if worker.error is not None:
+            return self.fail(worker.error)
+
+        builder = self._import.create_builder(context, worker.result)
+        builder.run()
+        return self.builder_finished(context, builder)
+
+    def invoke(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        """
+        Import in a worker thread while the UI stays responsive, then build the scene in
+        time-sliced ticks. Esc cancels the worker or pauses the scene construction.
+        """
+        scene = context.scene
+        if not scene:
+            return {'CANCELLED'}
 
-        # Calculate center point for coordinate conversion
-        center_lat = (min_lat + max_lat) / 2
-        center_lon = (min_lon + max_lon) / 2
+        self._worker = self.start_import(context)
+        if self._worker is None:
+            return {'FINISHED'}
+        self._worker.start()
+        self.begin_modal(context)
+        return {'RUNNING_MODAL'}
 
-        url = OSM_API_URL.format(
-            min_lon=min_lon, min_lat=min_lat, max_lon=max_lon, max_lat=max_lat)
-        self.report({"INFO"}, f"Downloading OSM data from: {url}")
+    def modal(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        if self._builder is not None:
+            return self.watch_builder(context, event)
+
+        worker = self._worker
+        if event.type == 'ESC' and event.value == 'PRESS':
+            # The worker stops at its next progress update, keep polling until it does
+            worker.progress.cancel()
+            return {'RUNNING_MODAL'}
+        if event.type != 'TIMER' or event.timer is not self._timer:
+            return {'PASS_THROUGH'}
+
+        progress = worker.progress
+        if worker.is_alive():
+            context.window_manager.progress_update(int(progress.fraction * 100))
+            context.workspace.status_text_set(
+                f"OSM import: {progress.stage} ({progress.fraction:.0%}), Esc to cancel")
+            return {'PASS_THROUGH'}
+
+        if progress.cancelled or worker.error is not None:
+            self.end_modal(context)
+            return self.fail(worker.error or ImportCancelled("OSM import cancelled"))
+
+        self._builder = self._import.create_builder(context, worker.result)
+        self._builder.start()
+        return {'PASS_THROUGH'}
+
+    def cancel(self, context: Context) -> None:
+        if self._worker is not None:
+            self._worker.progress.cancel()
+        super().cancel(context)
+
+
+class MAPBRIDGE_OT_ApplyOsmChange(bpy.types.Operator):
+    bl_idname = "osm.apply_change"
+    bl_label = "Apply OSM Change"
+    bl_description = "Apply an osmChange (.osc) file to the kept OSM data and rebuild only the changed features"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context: Context) -> set[OperatorReturnItems]:
+        scene = context.scene
+        if not scene:
+            return {'CANCELLED'}
+
+        map_bridge = scene.map_bridge
+        osc_path = bpy.path.abspath(map_bridge.osmChangePath)
+        if not osc_path:
+            self.report({"ERROR"}, "Choose an osmChange file to apply")
+            return {'CANCELLED'}
 
-        # Download OSM data
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".osm") as tmpfile:
-            try:
-                with urllib.request.urlopen(url) as response:
-                    tmpfile.write(response.read())
-                tmpfile_path = tmpfile.name
-            except Exception as e:
-                self.report({"ERROR"}, f"Failed to download OSM data: {e}")
-                return {'CANCELLED'}
-
-        # Parse OSM XML
         try:
-            tree = ET.parse(tmpfile_path)
-            root = tree.getroot()
-        except Exception as e:
-            self.report({"ERROR"}, f"Failed to parse OSM XML: {e}")
-            os.remove(tmpfile_path)
+            way_count, object_count = apply_osm_change(scene, osc_path, import_settings(map_bridge))
+        except (ParseError, ValueError, OSError) as e:
+            self.report({"ERROR"}, f"Failed to apply OSM change: {e}")
             return {'CANCELLED'}
 
-        # Extract nodes
-        nodes = {}
-        for node in root.findall('node'):
-            node_id = node.attrib['id']
-            lat = float(node.attrib['lat'])
-            lon = float(node.attrib['lon'])
-            nodes[node_id] = (lat, lon)
-
-        # Helper: lat/lon to local XY
-        earth_radius = 6378137
-
-        def latlon_to_xy(lat, lon):
-            x = (lon - center_lon) * (math.pi / 180) * \
-                earth_radius * math.cos(math.radians(center_lat))
-            y = (lat - center_lat) * (math.pi / 180) * earth_radius
-            return (x, y)
-
-        # Highway type to width mapping
-        highway_widths = {
-            'motorway': 10.0,
-            'motorway_link': 10.0,
-            'trunk': 8.0,
-            'trunk_link': 8.0,
-            'primary': 7.0,
-            'primary_link': 7.0,
-            'secondary': 6.0,
-            'secondary_link': 6.0,
-            'tertiary': 5.0,
-            'tertiary_link': 5.0,
-            'unclassified': 4.0,
-            'residential': 4.0,
-            'living_street': 4.0,
-            'service': 3.0,
-            'pedestrian': 3.0,
-            'track': 3.0,
-            'footway': 1.5,
-            'path': 1.5,
-            'sidewalk': 1.5
-        }
-        default_width = 2.0
-        road_height = 0.1
-
-        # Parse ways: buildings, roads and sidewalks
-        buildings = []
-        roads = []
-        sidewalks = []
-        road_types = []
-
-        for way in root.findall('way'):
-            tags = {tag.attrib['k']: tag.attrib['v']
-                    for tag in way.findall('tag')}
-            nds = [nd.attrib['ref'] for nd in way.findall('nd')]
-
-            if 'building' in tags and tags['building'] != 'no':
-                buildings.append(nds)
-            elif 'highway' in tags:
-                roads.append(nds)
-                road_types.append(tags['highway'])
-            elif tags.get('footway') == 'sidewalk':
-                sidewalks.append(nds)
-
-        # Create buildings
-        building_count = 0
-        for nds in buildings:
-            verts = []
-            for ref in nds:
-                if ref in nodes:
-                    lat, lon = nodes[ref]
-                    x, y = latlon_to_xy(lat, lon)
-                    verts.append((x, y, 0))
-            if len(verts) < 3:
-                continue
-
-            mesh = bpy.data.meshes.new("OSM_Building")
-            mesh.from_pydata(verts, [], [list(range(len(verts)))])
-            mesh.update()
-            obj = bpy.data.objects.new("OSM_Building", mesh)
-            context.collection.objects.link(obj)
-
-            # Extrude for 3D effect
-            bpy.context.view_layer.objects.active = obj
-            bpy.ops.object.select_all(action='DESELECT')
-            obj.select_set(True)
-            bpy.ops.object.mode_set(mode='EDIT')
-            bpy.ops.mesh.select_all(action='SELECT')
-            bpy.ops.mesh.extrude_region_move(
-                TRANSFORM_OT_translate={"value": (0, 0, 10)})
-            bpy.ops.object.mode_set(mode='OBJECT')
-            building_count += 1
-
-        # Create roads
-        road_count = 0
-        for nds, htype in zip(roads, road_types):
-            verts = []
-            for ref in nds:
-                if ref in nodes:
-                    lat, lon = nodes[ref]
-                    x, y = latlon_to_xy(lat, lon)
-                    verts.append((x, y))
-            if len(verts) < 2:
-                continue
-
-            width = highway_widths.get(htype, default_width)
-            half_w = width / 2.0
-
-            # Build offset points for left/right edge
-            left = []
-            right = []
-            for i in range(len(verts)):
-                if i == 0:
-                    dir_vec = np.array(verts[1]) - np.array(verts[0])
-                elif i == len(verts) - 1:
-                    dir_vec = np.array(verts[-1]) - np.array(verts[-2])
-                else:
-                    dir_vec = np.array(verts[i+1]) - np.array(verts[i-1])
-                dir_vec = dir_vec / np.linalg.norm(dir_vec)
-                normal = np.array([-dir_vec[1], dir_vec[0]])
-                lpt = np.array(verts[i]) + normal * half_w
-                rpt = np.array(verts[i]) - normal * half_w
-                left.append((lpt[0], lpt[1], road_height))
-                right.append((rpt[0], rpt[1], road_height))
-
-            mesh_verts = left + right
-            n = len(verts)
-            mesh_faces = []
-            # Create faces (quads)
-            for i in range(n-1):
-                mesh_faces.append([i, i+1, n+i+1, n+i])
-
-            mesh = bpy.data.meshes.new(f'OSM_Road_{htype}')
-            mesh.from_pydata(mesh_verts, [], mesh_faces)
-            mesh.update()
-            obj = bpy.data.objects.new(f'OSM_Road_{htype}', mesh)
-            context.collection.objects.link(obj)
-            road_count += 1
-
-        # Create sidewalks
-        sidewalk_count = 0
-        for nds in sidewalks:
-            verts = []
-            for ref in nds:
-                if ref in nodes:
-                    lat, lon = nodes[ref]
-                    x, y = latlon_to_xy(lat, lon)
-                    verts.append((x, y, 0.0))
-            if len(verts) < 2:
-                continue
-
-            width = highway_widths['sidewalk']
-            curve_data = bpy.data.curves.new('OSM_Sidewalk', type='CURVE')
-            curve_data.dimensions = '3D'
-            polyline = curve_data.splines.new('POLY')
-            polyline.points.add(len(verts)-1)
-            for i, v in enumerate(verts):
-                polyline.points[i].co = (v[0], v[1], v[2], 1)
-            curve_obj = bpy.data.objects.new('OSM_Sidewalk', curve_data)
-            context.collection.objects.link(curve_obj)
-            curve_data.bevel_depth = width / 2.0
-            curve_data.bevel_resolution = 1
-            sidewalk_count += 1
-
-        os.remove(tmpfile_path)
-        self.report({"INFO"},
-                    f"Imported {building_count} buildings, {road_count} roads, and {sidewalk_count} sidewalks.")
+        self.report({"INFO"}, f"Rebuilt {way_count} changed ways in {object_count} objects")
         return {'FINISHED'}
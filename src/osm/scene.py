@@ -0,0 +1,63 @@
+import bpy
+import numpy as np
+
+from bpy.types import Collection
+from .core.pipeline import ImportResult
+from .core.roads import HIGHWAY_WIDTHS
+from .core.trace import Tracer, traced_steps
+from .blender_mesh import create_mesh_steps, fill_curve_steps, new_curve
+from .geometry_nodes import add_procedural_modifier
+from .lod import tag_lod
+from .objects import ObjectFactory
+from .updates import tag_object
+
+
+def sidewalk_curve_steps(factory: ObjectFactory, coords: np.ndarray, offsets: np.ndarray,
+                         origin: tuple[float, float]):
+    """
+    Sidewalks as splines of one beveled curve object, slower to draw but editable. Returns
+    the object, not linked yet.
+    """
+    name = factory.unique_name('OSM_Sidewalks')
+    curve_data = new_curve(name, HIGHWAY_WIDTHS['sidewalk'] / 2.0)
+    yield from fill_curve_steps(curve_data, coords, offsets)
+
+    curve_obj = bpy.data.objects.new(name, curve_data)
+    curve_obj.location = (*origin, 0.0)
+    return curve_obj
+
+
+def result_steps(factory: ObjectFactory, collection: Collection, result: ImportResult,
+                 dataset_path: str | None = None, tracer: Tracer | None = None):
+    """
+    Turn the computed arrays into objects, the only part touching bpy.data.
+
+    Every object is linked once its data is complete, so pausing never leaves half-built
+    objects in the scene. Names come unique from the factory, the mesh name of the result
+    is kept in the tags.
+    """
+    tracer = tracer or Tracer()
+    for name, arrays in result.meshes.items():
+        unique_name = factory.unique_name(name)
+        mesh = yield from traced_steps(tracer, "mesh data", create_mesh_steps(unique_name, arrays),
+                                   bytes=arrays.vertices.nbytes + arrays.loop_vertices.nbytes)
+        with tracer.span("link objects", "scene", items=1):
+            obj = bpy.data.objects.new(unique_name, mesh)
+            obj.location = (*result.origin, 0.0)
+            if dataset_path:
+                tag_object(obj, dataset_path, result.frame, result.clip, name)
+            if result.lods is not None and name in result.lods:
+                tag_lod(obj, result.lods[name])
+            if result.procedural is not None and name in result.procedural:
+                add_procedural_modifier(obj, result.procedural[name])
+            factory.link(obj, collection, name)
+        yield 0
+
+    if result.sidewalk_curves is not None and len(result.sidewalk_curves[1]) > 1:
+        curve_obj = yield from traced_steps(tracer, "sidewalk curves", sidewalk_curve_steps(
+            factory, *result.sidewalk_curves, result.origin))
+        with tracer.span("link objects", "scene", items=1):
+            if dataset_path:
+                tag_object(curve_obj, dataset_path, result.frame, result.clip, 'OSM_Sidewalks')
+            factory.link(curve_obj, collection, 'OSM_Sidewalks')
+        yield 0
@@ -0,0 +1,192 @@
+import json
+import os
+from collections import defaultdict
+
+import bpy
+import numpy as np
+
+from bpy.types import Collection, Object, Scene
+from .core.dataset import Dataset, DatasetStore, load_dataset, save_dataset
+from .core.mesh_arrays import concatenate, select_faces
+from .core.osmchange import apply_change, parse_osc
+from .core.pipeline import ImportSettings, LocalFrame, build_ways, classify_ways
+from .core.reader import OsmData
+from .core.roads import HIGHWAY_WIDTHS
+from .core.spatial import Rect
+from .blender_mesh import create_mesh, new_curve, read_mesh, replace_curve, replace_mesh
+from .geometry_nodes import add_procedural_modifier
+from .lod import tag_lod
+from .incremental import FRAME_KEY, PROJECTION_KEY, read_frame
+from .objects import ObjectFactory, import_collection, parent_collection
+
+
+# Custom properties linking an object to the dataset its geometry was built from
+DATASET_KEY = "map_bridge_dataset"
+CLIP_KEY = "map_bridge_clip"  # min x, min y, max x, max y in local coordinates
+MESH_KEY = "map_bridge_mesh"  # feature class mesh name, e.g. "OSM_Road_primary"
+SETTINGS_KEY = "map_bridge_settings"  # JSON of the BUILD_SETTINGS of an import collection
+
+# Settings that change which objects an import creates and what is in them
+BUILD_SETTINGS = ('sidewalks_as_curves', 'raised_sidewalks', 'building_lods', 'geometry_nodes',
+                  'terrain_path', 'terrain_mesh', 'terrain_spacing')
+
+
+def referenced_datasets() -> set[str]:
+    """
+    Paths of the datasets the collections and objects of the open file were built from
+    """
+    return {item[DATASET_KEY] for items in (bpy.data.collections, bpy.data.objects)
+            for item in items if DATASET_KEY in item}
+
+
+def tag_object(obj: Object, dataset_path: str, frame: LocalFrame, clip: Rect | None, name: str) -> None:
+    obj[DATASET_KEY] = dataset_path
+    obj[FRAME_KEY] = [*frame.center, *frame.origin]
+    obj[PROJECTION_KEY] = frame.projection
+    if clip is not None:
+        obj[CLIP_KEY] = list(clip)
+    obj[MESH_KEY] = name
+
+
+def tag_settings(collection: Collection, settings: ImportSettings) -> None:
+    collection[SETTINGS_KEY] = json.dumps({name: getattr(settings, name) for name in BUILD_SETTINGS})
+
+
+def build_settings(scene: Scene, obj: Object, settings: ImportSettings) -> ImportSettings:
+    """
+    settings with the build settings of the nearest collection above obj that stored them.
+    Imports made before they were stored are rebuilt with settings as they are.
+    """
+    collection = import_collection(scene, obj)
+    while collection is not None:
+        if SETTINGS_KEY in collection:
+            return settings._replace(**json.loads(collection[SETTINGS_KEY]))
+        collection = parent_collection(scene, collection)
+    return settings
+
+
+def sidewalk_ids(data: OsmData) -> np.ndarray:
+    return np.array([way.id for way in classify_ways(data.ways)[3]], dtype=np.int64)
+
+
+def tracked_objects(scene: Scene) -> dict[str, dict[tuple | None, list[Object]]]:
+    """
+    Tagged mesh and sidewalk curve objects grouped by dataset, then by the rect they were
+    clipped to
+    """
+    groups = defaultdict(lambda: defaultdict(list))
+    for obj in scene.objects:
+        if obj.type in ('MESH', 'CURVE') and DATASET_KEY in obj:
+            clip = tuple(obj[CLIP_KEY]) if CLIP_KEY in obj else None
+            groups[obj[DATASET_KEY]][clip].append(obj)
+    return groups
+
+
+def update_sidewalk_curves(scene: Scene, factory: ObjectFactory, objects: list[Object], dataset: Dataset,
+                           settings: ImportSettings, frame: LocalFrame, rect: Rect | None) -> int:
+    """
+    Rebuild every spline of the sidewalk curve of a group, splines carry no way ids to swap
+    only the changed ones. Returns the number of objects changed or created.
+    """
+    curves = build_ways(dataset.data, sidewalk_ids(dataset.data), settings, frame, rect).sidewalk_curves
+    curve_obj = next((obj for obj in objects if obj.type == 'CURVE'), None)
+    if curve_obj is not None:
+        replace_curve(curve_obj.data, *curves)
+        return 1
+    if len(curves[1]) < 2:
+        return 0
+
+    # The first sidewalk of the group
+    name = factory.unique_name('OSM_Sidewalks')
+    curve_obj = bpy.data.objects.new(name, new_curve(name, HIGHWAY_WIDTHS['sidewalk'] / 2.0))
+    replace_curve(curve_obj.data, *curves)
+    curve_obj.location = (*frame.origin, 0.0)
+    tag_object(curve_obj, objects[0][DATASET_KEY], frame, rect, 'OSM_Sidewalks')
+    factory.link(curve_obj, import_collection(scene, objects[0]), 'OSM_Sidewalks')
+    return 1
+
+
+def update_group(scene: Scene, factory: ObjectFactory, objects: list[Object], dataset: Dataset,
+                 affected: np.ndarray, settings: ImportSettings, clip: tuple | None,
+                 sidewalks_changed: bool = False) -> int:
+    """
+    Swap the faces of the affected ways in one group of objects, returns the number of
+    objects changed or created. The group is rebuilt with the settings it was imported with.
+    """
+    frame = read_frame(objects[0])
+    rect = Rect(*clip) if clip is not None else None
+    settings = build_settings(scene, objects[0], settings)
+    result = build_ways(dataset.data, affected, settings, frame, rect)
+    rebuilt = dict(result.meshes)
+
+    changed = 0
+    if settings.sidewalks_as_curves and sidewalks_changed:
+        changed += update_sidewalk_curves(scene, factory, objects, dataset, settings, frame, rect)
+
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+        arrays = read_mesh(obj.data, None)
+        part = rebuilt.pop(obj[MESH_KEY], None)
+        if 'osm_id' not in arrays.face_attributes:
+            # Centreline meshes of the Geometry Nodes mode have no faces to swap
+            continue
+        if part is not None:
+            names = arrays.face_attributes.keys() & part.face_attributes.keys()
+            arrays = arrays._replace(face_attributes={name: arrays.face_attributes[name] for name in names})
+            part = part._replace(face_attributes={name: part.face_attributes[name] for name in names})
+        keep = ~np.isin(arrays.face_attributes['osm_id'], affected)
+        if keep.all() and part is None:
+            continue
+        parts = [select_faces(arrays, keep)]
+        if part is not None:
+            parts.append(part)
+        replace_mesh(obj.data, concatenate(parts))
+        changed += 1
+
+    # Classes the group had no object for yet, e.g. the first road of a new highway type
+    parent = import_collection(scene, objects[0])
+    for name, arrays in rebuilt.items():
+        unique_name = factory.unique_name(name)
+        obj = bpy.data.objects.new(unique_name, create_mesh(unique_name, arrays))
+        obj.location = (*frame.origin, 0.0)
+        tag_object(obj, objects[0][DATASET_KEY], frame, rect, name)
+        if result.lods is not None and name in result.lods:
+            tag_lod(obj, result.lods[name])
+        if result.procedural is not None and name in result.procedural:
+            add_procedural_modifier(obj, result.procedural[name])
+        factory.link(obj, parent, name)
+        changed += 1
+    return changed
+
+
+def apply_osm_change(scene: Scene, osc_path: str, settings: ImportSettings) -> tuple[int, int]:
+    """
+    Apply an osmChange file to every dataset kept by the imports in the scene and rebuild
+    only the faces of the ways it touches. Returns the number of changed ways and the
+    number of objects updated.
+    """
+    with open(osc_path, 'rb') as file:
+        change = parse_osc(file)
+
+    factory = ObjectFactory()
+    way_count = 0
+    object_count = 0
+    for dataset_path, groups in tracked_objects(scene).items():
+        if not os.path.exists(dataset_path):
+            raise FileNotFoundError(f"Kept OSM data is missing: {dataset_path}")
+        dataset = load_dataset(dataset_path)
+        data, affected = apply_change(dataset.data, change, dataset.bbox)
+        if len(affected) == 0:
+            continue
+        # Deleted sidewalks are only in the old data, new ones only in the new
+        sidewalks_changed = bool(np.isin(affected, np.union1d(sidewalk_ids(dataset.data), sidewalk_ids(data))).any())
+        dataset = Dataset(data, dataset.bbox)
+        save_dataset(dataset_path, dataset)
+        DatasetStore().added(dataset_path, referenced_datasets())
+
+        way_count += len(affected)
+        for clip, objects in groups.items():
+            object_count += update_group(scene, factory, objects, dataset, affected, settings, clip,
+                                         sidewalks_changed)
+    return way_count, object_count
@@ -1,6 +1,9 @@
 import bpy
 from bpy.types import Context
 
+from .scheduler import paused_builders
+from .tracing import last_traces
+
 
 class MAPBRIDGE_PT_MainPanel(bpy.types.Panel):
     bl_label = "Map Bridge"
@@ -38,7 +41,78 @@ class MAPBRIDGE_PT_MainPanel(bpy.types.Panel):
         split.label(text="")
         split.split(factor=0.67).prop(map_bridge, "minLat")
 
+        box = layout.box()
+        box.label(text="OSM Settings")
+        box.prop(map_bridge, "projection")
+        row = box.row()
+        row.prop(map_bridge, "incrementalImport")
+        if map_bridge.incrementalImport:
+            row.prop(map_bridge, "dropOutsideTiles")
+        else:
+            row.prop(map_bridge, "clipToBbox")
+        row = box.row()
+        row.prop(map_bridge, "sidewalksAsCurves")
+        if not map_bridge.sidewalksAsCurves:
+            row.prop(map_bridge, "raisedSidewalks")
+        row = box.row()
+        row.prop(map_bridge, "geometryNodes")
+        if not map_bridge.geometryNodes:
+            row.prop(map_bridge, "buildingLods")
+        box.prop(map_bridge, "useTerrain")
+        if map_bridge.useTerrain:
+            box.prop(map_bridge, "terrainPath")
+            row = box.row()
+            row.prop(map_bridge, "terrainMesh")
+            if map_bridge.terrainMesh:
+                row.prop(map_bridge, "terrainSpacing")
+        row = box.row()
+        row.prop(map_bridge, "buildWorkers")
+        row.prop(map_bridge, "useGeometryCache")
+        box.prop(map_bridge, "osmSource")
+        if map_bridge.osmSource == 'FILE':
+            box.prop(map_bridge, "osmFilePath")
+            if map_bridge.incrementalImport:
+                box.prop(map_bridge, "tileSize")
+        else:
+            if map_bridge.osmSource == 'OVERPASS':
+                box.prop(map_bridge, "overpassUrl")
+            else:
+                box.prop(map_bridge, "osmApiUrl")
+            row = box.row()
+            row.prop(map_bridge, "overpassTileSize" if map_bridge.osmSource == 'OVERPASS' else "tileSize")
+            row.prop(map_bridge, "downloadWorkers")
+            box.prop(map_bridge, "useCache")
+            if map_bridge.useCache:
+                row = box.row()
+                row.prop(map_bridge, "cacheSizeMb")
+                row.prop(map_bridge, "cacheTtlHours")
+                box.operator("osm.prefetch")
+        box.prop(map_bridge, "keepOsmData")
+        if map_bridge.keepOsmData:
+            row = box.row()
+            row.prop(map_bridge, "osmChangePath")
+            row.operator("osm.apply_change")
+
         col = layout.column(align=True)
         col.label(text="Choose import method")
+        col.prop(map_bridge, "tickBudgetMs")
+        col.prop(map_bridge, "useLibrary")
+        if map_bridge.useLibrary:
+            col.prop(map_bridge, "libraryDirectory")
+            col.prop(map_bridge, "libraryOverride")
         col.operator("osm.run")
         col.operator("google_earth.run")
+
+        for builder in paused_builders():
+            row = layout.row()
+            row.label(text=f"{builder.name} paused at {builder.fraction:.0%}")
+            row.operator("mapbridge.resume_build").builder_name = builder.name
+
+        for tracer in last_traces():
+            box = layout.box()
+            row = box.row()
+            row.label(text=f"{tracer.name}: {tracer.duration:.2f} s")
+            row.operator("mapbridge.save_trace", text="", icon='EXPORT').trace_name = tracer.name
+            col = box.column(align=True)
+            for line in tracer.summary_lines():
+                col.label(text=line)
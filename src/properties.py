@@ -1,6 +1,21 @@
-from bpy.props import FloatProperty
+from bpy.props import BoolProperty, EnumProperty, FloatProperty, IntProperty, StringProperty
 from bpy.types import PropertyGroup
 
+from .osm.core.projection import PROJECTION_ITEMS
+from .osm.core.downloader import DEFAULT_MAX_WORKERS, DEFAULT_TILE_SIZE, OSM_API_BASE_URL
+from .osm.core.cache import DEFAULT_MAX_BYTES, DEFAULT_TTL
+from .osm.core.overpass import DEFAULT_OVERPASS_TILE_SIZE, OVERPASS_BASE_URL
+from .osm.core.pool import default_workers
+from .osm.core.terrain import DEFAULT_TERRAIN_SPACING
+from .library import DEFAULT_LIBRARY_DIR
+from .scheduler import DEFAULT_TICK_BUDGET_MS
+
+OSM_SOURCE_ITEMS = [
+    ('API', "OSM API", "Download the area from the OSM API"),
+    ('OVERPASS', "Overpass", "Download only buildings, roads and sidewalks through an Overpass query"),
+    ('FILE', "Local Extract", "Cut the area out of a local .osm or .osm.pbf file"),
+]
+
 
 class MapBridgeProperties(PropertyGroup):
     name = "map_bridge"
@@ -37,3 +52,180 @@ class MapBridgeProperties(PropertyGroup):
         max=89.,
         default=43.723862
     )
+    projection: EnumProperty(
+        name="Projection",
+        description="How OSM coordinates are converted to local metres",
+        items=PROJECTION_ITEMS,
+        default='EQUIRECTANGULAR'
+    )
+    clipToBbox: BoolProperty(
+        name="Clip to Area",
+        description="Cut roads and sidewalks at the selected area and drop buildings centred outside it",
+        default=True
+    )
+    incrementalImport: BoolProperty(
+        name="Incremental",
+        description="Import the area as grid tiles and only add tiles not yet in the scene on re-import",
+        default=False
+    )
+    dropOutsideTiles: BoolProperty(
+        name="Drop Tiles Outside",
+        description="On incremental re-import remove tiles that are no longer in the selected area",
+        default=False
+    )
+    sidewalksAsCurves: BoolProperty(
+        name="Sidewalks as Curves",
+        description="Keep sidewalks as editable beveled curves instead of one mesh (slower viewport)",
+        default=False
+    )
+    raisedSidewalks: BoolProperty(
+        name="Raised Sidewalks",
+        description="Give sidewalk meshes kerb walls down to the ground",
+        default=False
+    )
+    buildingLods: BoolProperty(
+        name="Building LODs",
+        description="Build buildings as simplified levels of detail per area cell, switched by distance to the scene camera",
+        default=False
+    )
+    geometryNodes: BoolProperty(
+        name="Geometry Nodes",
+        description="Import footprints and centrelines only and extrude them with shared Geometry Nodes groups, heights and widths stay editable",
+        default=False
+    )
+    osmSource: EnumProperty(
+        name="Source",
+        description="Where OSM data is read from",
+        items=OSM_SOURCE_ITEMS,
+        default='API'
+    )
+    osmFilePath: StringProperty(
+        name="Extract",
+        description="Local .osm or .osm.pbf extract",
+        subtype='FILE_PATH',
+        default=""
+    )
+    osmApiUrl: StringProperty(
+        name="OSM API URL",
+        description="Base URL of the OSM API used for downloads",
+        default=OSM_API_BASE_URL
+    )
+    overpassUrl: StringProperty(
+        name="Overpass URL",
+        description="Base URL of the Overpass API used for filtered downloads",
+        default=OVERPASS_BASE_URL
+    )
+    keepOsmData: BoolProperty(
+        name="Keep OSM Data",
+        description="Keep the parsed OSM data of imports on disk so osmChange files can be applied later",
+        default=False
+    )
+    osmChangePath: StringProperty(
+        name="Change",
+        description="osmChange (.osc) file applied to the kept OSM data",
+        subtype='FILE_PATH',
+        default=""
+    )
+    tileSize: FloatProperty(
+        name="Tile Size",
+        description="Size in degrees of the tiles the area is downloaded in",
+        precision=4,
+        min=0.001,
+        max=0.25,
+        default=DEFAULT_TILE_SIZE
+    )
+    overpassTileSize: FloatProperty(
+        name="Tile Size",
+        description="Size in degrees of the tiles the area is queried from Overpass in, "
+                    "larger than OSM API tiles since Overpass only returns the imported features",
+        precision=4,
+        min=0.001,
+        max=1.,
+        default=DEFAULT_OVERPASS_TILE_SIZE
+    )
+    downloadWorkers: IntProperty(
+        name="Download Threads",
+        description="Number of tiles downloaded at the same time",
+        min=1,
+        max=16,
+        default=DEFAULT_MAX_WORKERS
+    )
+    useTerrain: BoolProperty(
+        name="Terrain",
+        description="Set buildings, roads and sidewalks on the ground heights of local elevation rasters",
+        default=False
+    )
+    terrainPath: StringProperty(
+        name="Elevation",
+        description="SRTM .hgt tile or uncompressed GeoTIFF in degrees, or a folder of them",
+        subtype='FILE_PATH',
+        default=""
+    )
+    terrainMesh: BoolProperty(
+        name="Terrain Mesh",
+        description="Also create a mesh of the ground under the imported area",
+        default=False
+    )
+    terrainSpacing: FloatProperty(
+        name="Spacing (m)",
+        description="Distance between the vertices of the terrain mesh",
+        min=1.,
+        default=DEFAULT_TERRAIN_SPACING
+    )
+    useGeometryCache: BoolProperty(
+        name="Cache Geometry",
+        description="Keep the finished geometry on disk and reuse it when the same area is imported "
+                    "again with the same data and settings",
+        default=True
+    )
+    buildWorkers: IntProperty(
+        name="Build Processes",
+        description="Number of processes decoding .osm.pbf extracts and building the geometry of large areas "
+                    "at the same time",
+        min=1,
+        max=64,
+        default=default_workers()
+    )
+    useCache: BoolProperty(
+        name="Use Cache",
+        description="Keep downloaded OSM tiles on disk and reuse them on repeated imports",
+        default=True
+    )
+    cacheSizeMb: IntProperty(
+        name="Cache Size (MB)",
+        description="Least recently used tiles are evicted above this size",
+        min=16,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024)
+    )
+    cacheTtlHours: FloatProperty(
+        name="Cache TTL (h)",
+        description="Cached tiles, and libraries of downloaded or Google Earth areas, younger than this are "
+                    "used without asking the server",
+        min=0.,
+        default=DEFAULT_TTL / 3600
+    )
+    useLibrary: BoolProperty(
+        name="Import as Library",
+        description="Build the geometry in a background Blender, save it to a library .blend and link it, "
+                    "keeping undo steps and saves of this file small",
+        default=False
+    )
+    libraryDirectory: StringProperty(
+        name="Libraries",
+        description="Folder the library files are written to and reused from. Beyond 2 GB the least recently "
+                    "used ones are removed, except those linked in the open file",
+        subtype='DIR_PATH',
+        default=DEFAULT_LIBRARY_DIR
+    )
+    libraryOverride: BoolProperty(
+        name="Editable Override",
+        description="Add the library as a library override instead of a read-only link",
+        default=False
+    )
+    tickBudgetMs: FloatProperty(
+        name="Tick Budget (ms)",
+        description="Main thread time spent creating objects per UI update, lower keeps Blender more responsive",
+        min=1.,
+        max=1000.,
+        default=DEFAULT_TICK_BUDGET_MS
+    )
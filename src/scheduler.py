@@ -0,0 +1,228 @@
+import time
+from typing import Callable, Iterator
+
+import bpy
+from bpy.types import Context, Event
+
+from ._types import OperatorReturnItems
+
+
+DEFAULT_TICK_BUDGET_MS = 20.0
+TICK_INTERVAL = 0.001  # seconds between ticks while there is work left
+IDLE_INTERVAL = 0.1  # seconds between ticks while a step waits on something outside Blender
+PROGRESS_POLL_INTERVAL = 0.1  # seconds
+
+# Yielded by a step that has nothing to do yet, ends the tick early
+WAIT = None
+
+_builders: dict[str, 'SceneBuilder'] = {}
+
+
+class SceneBuilder:
+    """
+    Run scene construction steps from bpy.app.timers, as many per tick as fit the time budget.
+
+    steps does one unit of work per next() and yields the number of items it created, or WAIT
+    while it waits on something outside Blender. Cancelling pauses between two steps, so
+    everything created so far stays valid and resume() continues where it stopped.
+
+    on_finish(context, builder, report) reports the finished build and returns the operator
+    result. It lives on the builder because the operator that completes a paused build is not
+    the one that started it.
+    """
+
+    def __init__(self, name: str, steps: Iterator[int | None], total: int = 0,
+                 budget_ms: float = DEFAULT_TICK_BUDGET_MS,
+                 on_finish: Callable[[Context, 'SceneBuilder', Callable], set[OperatorReturnItems]] | None = None):
+        self.name = name
+        self.steps = steps
+        self.total = total
+        self.budget_ms = budget_ms
+        self.on_finish = on_finish
+        self.state = 'PENDING'
+        self.error: Exception | None = None
+        self.items = 0
+        self.busy = 0.0
+        self.ticks = 0
+        # bpy.app.timers identifies timers by the function object
+        self._timer = self._tick
+
+    @property
+    def fraction(self) -> float:
+        if self.state == 'DONE':
+            return 1.0
+        return min(1.0, self.items / self.total) if self.total else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Items created per second of main thread time
+        """
+        return self.items / self.busy if self.busy > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.items} items in {self.busy:.2f} s over {self.ticks} ticks "
+                f"({self.throughput:,.0f} items/s)")
+
+    def start(self) -> None:
+        """
+        Start or resume ticking, a paused builder of the same name is replaced
+        """
+        current = _builders.get(self.name)
+        if current is not None and current is not self:
+            current.cancel()
+        _builders[self.name] = self
+
+        self.state = 'RUNNING'
+        if not bpy.app.timers.is_registered(self._timer):
+            bpy.app.timers.register(self._timer, first_interval=0.0)
+
+    resume = start
+
+    def cancel(self) -> None:
+        """
+        Pause after the current step, resume() picks up from there
+        """
+        if self.state == 'RUNNING':
+            self.state = 'PAUSED'
+        if bpy.app.timers.is_registered(self._timer):
+            bpy.app.timers.unregister(self._timer)
+
+    def _advance(self, deadline: float | None) -> bool:
+        """
+        Run steps until the deadline, returns True when a step asked to wait
+        """
+        start = time.perf_counter()
+        try:
+            while True:
+                created = next(self.steps)
+                if created is WAIT:
+                    return True
+                self.items += created
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+        except StopIteration:
+            self.state = 'DONE'
+        except Exception as e:
+            self.state = 'FAILED'
+            self.error = e
+        finally:
+            self.busy += time.perf_counter() - start
+        return False
+
+    def _tick(self) -> float | None:
+        if self.state != 'RUNNING':
+            return None
+
+        self.ticks += 1
+        waiting = self._advance(time.perf_counter() + self.budget_ms / 1000)
+        if self.state != 'RUNNING':
+            print(f"MAP BRIDGE: {self.name} {self.state.lower()}: {self.summary()}")
+            return None
+        return IDLE_INTERVAL if waiting else TICK_INTERVAL
+
+    def run(self) -> None:
+        """
+        Run every remaining step right away, blocking the UI
+        """
+        self.state = 'RUNNING'
+        while self.state == 'RUNNING':
+            self.ticks += 1
+            if self._advance(None):
+                time.sleep(IDLE_INTERVAL)
+
+
+def paused_builders() -> list[SceneBuilder]:
+    return [builder for builder in _builders.values() if builder.state == 'PAUSED']
+
+
+class BuilderOperator:
+    """
+    Operator mixin following a SceneBuilder from a modal timer with a progress cursor,
+    status text and Esc to pause it
+    """
+    _builder: SceneBuilder | None = None
+    _timer = None
+
+    def begin_modal(self, context: Context) -> None:
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(PROGRESS_POLL_INTERVAL, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+
+    def end_modal(self, context: Context) -> None:
+        wm = context.window_manager
+        if self._timer is not None:
+            wm.event_timer_remove(self._timer)
+            self._timer = None
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def watch_builder(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        builder = self._builder
+        if event.type == 'ESC' and event.value == 'PRESS':
+            builder.cancel()
+            self.end_modal(context)
+            self.report({"WARNING"},
+                        f"{builder.name} paused at {builder.fraction:.0%}, resume it from the Map Bridge panel")
+            return {'FINISHED'}
+        if event.type != 'TIMER' or event.timer is not self._timer:
+            return {'PASS_THROUGH'}
+
+        if builder.state == 'RUNNING':
+            context.window_manager.progress_update(int(builder.fraction * 100))
+            context.workspace.status_text_set(
+                f"{builder.name}: {builder.fraction:.0%} ({builder.throughput:,.0f} items/s), Esc to pause")
+            return {'PASS_THROUGH'}
+
+        self.end_modal(context)
+        return self.builder_finished(context, builder)
+
+    def builder_finished(self, context: Context, builder: SceneBuilder) -> set[OperatorReturnItems]:
+        """
+        Called once the builder is done or failed, objects already created stay in the scene
+        """
+        if builder.on_finish is not None:
+            return builder.on_finish(context, builder, self.report)
+        if builder.state == 'FAILED':
+            self.report({"ERROR"}, f"{builder.name} failed: {builder.error}")
+        else:
+            self.report({"INFO"}, f"{builder.name}: {builder.summary()}")
+        return {'FINISHED'}
+
+    def cancel(self, context: Context) -> None:
+        if self._builder is not None:
+            self._builder.cancel()
+        self.end_modal(context)
+
+
+class MAPBRIDGE_OT_ResumeBuild(BuilderOperator, bpy.types.Operator):
+    bl_idname = "mapbridge.resume_build"
+    bl_label = "Resume"
+    bl_description = "Continue creating the objects of a paused import"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    builder_name: bpy.props.StringProperty()
+
+    def invoke(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        builder = _builders.get(self.builder_name)
+        if builder is None or builder.state != 'PAUSED':
+            self.report({"ERROR"}, f"Nothing to resume for {self.builder_name}")
+            return {'CANCELLED'}
+
+        self._builder = builder
+        builder.resume()
+        self.begin_modal(context)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        return self.watch_builder(context, event)
+
+    def execute(self, context: Context) -> set[OperatorReturnItems]:
+        builder = _builders.get(self.builder_name)
+        if builder is None or builder.state != 'PAUSED':
+            self.report({"ERROR"}, f"Nothing to resume for {self.builder_name}")
+            return {'CANCELLED'}
+
+        builder.run()
+        return self.builder_finished(context, builder)
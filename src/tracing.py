@@ -0,0 +1,73 @@
+import os
+import time
+
+import bpy
+from bpy.props import StringProperty
+from bpy.types import Context, Event
+
+from ._types import OperatorReturnItems
+from .osm.core.trace import DEFAULT_TRACE_DIR, PROFILE_ENV, Tracer
+
+# Trace of the latest run of every import, shown in the panel until the next run replaces it
+_traces: dict[str, Tracer] = {}
+
+
+def start_trace(name: str) -> Tracer:
+    """
+    New tracer of an import, profiling when the PROFILE_ENV environment variable is set
+    """
+    tracer = Tracer(name, profile=os.environ.get(PROFILE_ENV, "") not in ("", "0"))
+    _traces[name] = tracer
+    return tracer
+
+
+def finish_trace(tracer: Tracer) -> None:
+    """
+    Print the stage summary of a finished import, and when profiling write its cProfile
+    stats and Chrome trace next to each other
+    """
+    print(f"MAP BRIDGE: {tracer.name} took {tracer.duration:.2f} s")
+    for line in tracer.summary_lines():
+        print(f"MAP BRIDGE:   {line}")
+    if tracer.profiling:
+        stem = os.path.join(DEFAULT_TRACE_DIR,
+                            f"{bpy.path.clean_name(tracer.name)}-{time.strftime('%Y%m%d-%H%M%S')}")
+        tracer.write_profile(f"{stem}.prof")
+        tracer.write_chrome_trace(f"{stem}.json")
+        print(f"MAP BRIDGE: profile written to {stem}.prof")
+
+
+def last_traces() -> list[Tracer]:
+    return [tracer for tracer in _traces.values() if tracer.spans]
+
+
+class MAPBRIDGE_OT_SaveTrace(bpy.types.Operator):
+    bl_idname = "mapbridge.save_trace"
+    bl_label = "Save Trace"
+    bl_description = "Save the stage timings of the last import as Chrome trace JSON, for chrome://tracing or Perfetto"
+
+    trace_name: StringProperty()
+    filepath: StringProperty(subtype='FILE_PATH')
+    filter_glob: StringProperty(default="*.json", options={'HIDDEN'})
+
+    def invoke(self, context: Context, event: Event) -> set[OperatorReturnItems]:
+        if not self.filepath:
+            self.filepath = os.path.join(DEFAULT_TRACE_DIR, f"{bpy.path.clean_name(self.trace_name)}.json")
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context: Context) -> set[OperatorReturnItems]:
+        tracer = _traces.get(self.trace_name)
+        if tracer is None:
+            self.report({"ERROR"}, f"No trace of {self.trace_name}")
+            return {'CANCELLED'}
+
+        path = bpy.path.ensure_ext(bpy.path.abspath(self.filepath), ".json")
+        try:
+            tracer.write_chrome_trace(path)
+        except OSError as e:
+            self.report({"ERROR"}, f"Failed to save trace: {e}")
+            return {'CANCELLED'}
+
+        self.report({"INFO"}, f"Saved {len(tracer.spans)} spans to {path}")
+        return {'FINISHED'}
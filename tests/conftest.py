@@ -0,0 +1,64 @@
+import http.server
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import threading
+
+import pytest
+
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "osm", "core")
+
+# The addon package imports bpy on import, its bpy-free core is loaded as a package of its own
+_spec = importlib.machinery.ModuleSpec("map_bridge_core", None, is_package=True)
+_spec.submodule_search_locations = [CORE_DIR]
+sys.modules.setdefault("map_bridge_core", importlib.util.module_from_spec(_spec))
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+
+    def do_GET(self):
+        status, headers, body = self.server.stub.answer(self.path)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """
+    Local HTTP server answering every GET with respond(path) -> (status, headers, body), set by
+    the test. paths lists the requested paths in order.
+    """
+
+    def __init__(self):
+        self.respond = lambda path: (404, {}, b"")
+        self.paths: list[str] = []
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def answer(self, path: str) -> tuple[int, dict[str, str], bytes]:
+        with self._lock:
+            self.paths.append(path)
+        return self.respond(path)
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    thread = threading.Thread(target=server._server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server._server.shutdown()
+    server._server.server_close()
+    thread.join()
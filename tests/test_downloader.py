@@ -0,0 +1,185 @@
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.cache import OsmCache
+from map_bridge_core.downloader import AdaptiveBackoff, DownloadError, OsmDownloader, split_bbox
+
+
+# A road crossing the border of the first two 0.01° tiles, and one inside a third tile
+NODES = {1: (0.005, 0.005), 2: (0.005, 0.015), 3: (0.015, 0.005), 4: (0.016, 0.006)}
+WAYS = {10: [1, 2], 11: [3, 4]}
+AREA = BBox(0.0, 0.0, 0.02, 0.02)
+TOO_MANY_NODES = b"You requested too many nodes (limit is 50000). Either request a smaller area, or use planet.osm"
+
+
+def requested_bbox(path: str) -> BBox:
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+    min_lon, min_lat, max_lon, max_lat = (float(value) for value in query['bbox'][0].split(','))
+    return BBox(min_lat, min_lon, max_lat, max_lon)
+
+
+def map_response(bbox: BBox) -> bytes:
+    """
+    Like the OSM API /map call: the ways with a node inside the bbox and all their nodes
+    """
+    inside = {node_id for node_id, (lat, lon) in NODES.items()
+              if bbox.min_lat <= lat <= bbox.max_lat and bbox.min_lon <= lon <= bbox.max_lon}
+    ways = {way_id: refs for way_id, refs in WAYS.items() if inside.intersection(refs)}
+    node_ids = sorted(inside.union(*ways.values()))
+
+    lines = ['<osm version="0.6">']
+    lines += [f'<node id="{node_id}" lat="{NODES[node_id][0]}" lon="{NODES[node_id][1]}"/>' for node_id in node_ids]
+    for way_id, refs in ways.items():
+        lines.append(f'<way id="{way_id}">')
+        lines += [f'<nd ref="{ref}"/>' for ref in refs]
+        lines.append('<tag k="highway" v="residential"/></way>')
+    lines.append('</osm>')
+    return "\n".join(lines).encode()
+
+
+def serve_map(path: str) -> tuple[int, dict[str, str], bytes]:
+    return 200, {'Content-Type': 'text/xml'}, map_response(requested_bbox(path))
+
+
+def downloader(server, **kwargs) -> OsmDownloader:
+    result = OsmDownloader(f"{server.url}/api/0.6", **kwargs)
+    # Retries back off by milliseconds instead of seconds
+    result.backoff = AdaptiveBackoff(initial=0.01, maximum=0.05)
+    return result
+
+
+def way_ids(data) -> list[int]:
+    return sorted(way.id for way in data.ways)
+
+
+def test_tiles_are_fetched_concurrently(stub_server):
+    lock = threading.Lock()
+    active = [0, 0]  # current, highest
+
+    def respond(path):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return serve_map(path)
+
+    stub_server.respond = respond
+    done = []
+    data = downloader(stub_server, max_workers=4).download(AREA, on_tile=lambda *progress: done.append(progress))
+
+    assert sorted(requested_bbox(path) for path in stub_server.paths) == sorted(split_bbox(AREA))
+    assert len(stub_server.paths) == 4
+    assert active[1] > 1
+    assert done[-1] == (4, 4)
+    assert way_ids(data) == [10, 11]
+
+
+def test_nodes_and_ways_on_tile_borders_are_kept_once(stub_server):
+    stub_server.respond = serve_map
+
+    data = downloader(stub_server).download(AREA)
+
+    # Both tiles around the border answered the crossing road and its nodes
+    served = [map_response(requested_bbox(path)).count(b'<way id="10">') for path in stub_server.paths]
+    assert sum(served) == 2
+    assert way_ids(data) == [10, 11]
+    assert sorted(data.nodes.ids.tolist()) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("status", [429, 509])
+def test_throttled_requests_back_off_and_retry(stub_server, status):
+    def respond(path):
+        if len(stub_server.paths) <= 2:
+            return status, {'Retry-After': '0'}, b"Too many requests"
+        return serve_map(path)
+
+    stub_server.respond = respond
+    osm = downloader(stub_server)
+    data = osm.download(BBox(0.0, 0.0, 0.01, 0.01))
+
+    assert len(stub_server.paths) == 3
+    assert way_ids(data) == [10]
+    # Raised twice, halved once by the successful request
+    assert osm.backoff.delay > 0
+
+
+def test_throttling_gives_up_after_the_retries(stub_server):
+    stub_server.respond = lambda path: (429, {}, b"Too many requests")
+
+    with pytest.raises(DownloadError, match="429"):
+        downloader(stub_server, max_retries=1).download(BBox(0.0, 0.0, 0.01, 0.01))
+    assert len(stub_server.paths) == 2
+
+
+def test_tiles_with_too_many_nodes_are_split(stub_server):
+    def respond(path):
+        bbox = requested_bbox(path)
+        if bbox.max_lat - bbox.min_lat > 0.006:
+            return 400, {}, TOO_MANY_NODES
+        return serve_map(path)
+
+    stub_server.respond = respond
+    data = downloader(stub_server).download(BBox(0.0, 0.0, 0.01, 0.02))
+
+    # Two tiles answered 400, each was fetched again as four quadrants
+    assert len(stub_server.paths) == 2 + 8
+    assert way_ids(data) == [10]
+    assert sorted(data.nodes.ids.tolist()) == [1, 2]
+
+
+def test_tile_splits_are_limited(stub_server):
+    stub_server.respond = lambda path: (400, {}, TOO_MANY_NODES)
+    osm = downloader(stub_server)
+    osm.max_tile_splits = 1
+
+    with pytest.raises(DownloadError, match="too many nodes"):
+        osm.download(BBox(0.0, 0.0, 0.01, 0.01))
+    # The first quadrant is not split again and its 400 ends the download
+    assert len(stub_server.paths) == 2
+
+
+def test_cached_digests_follow_the_cached_bodies(stub_server, tmp_path):
+    cache = OsmCache(str(tmp_path), ttl=60)
+    tiles = split_bbox(AREA)
+    stub_server.respond = serve_map
+    assert downloader(stub_server, cache=cache).cached_digests(tiles) is None
+
+    downloader(stub_server, cache=cache).download(AREA)
+    digests = downloader(stub_server, cache=cache).cached_digests(tiles)
+    assert len(digests) == 4
+
+    # Changed data on the server gives other digests once the tile is fetched again
+    NODES[5] = (0.006, 0.006)
+    WAYS[12] = [1, 5]
+    try:
+        cache.clear()
+        downloader(stub_server, cache=cache).download(AREA)
+    finally:
+        del NODES[5], WAYS[12]
+    changed = downloader(stub_server, cache=cache).cached_digests(tiles)
+    assert changed[0] != digests[0] and changed[1:] == digests[1:]
+
+    # Stale entries don't identify the data any more
+    cache.ttl = 0
+    assert downloader(stub_server, cache=cache).cached_digests(tiles) is None
+
+
+def test_cached_digests_of_split_tiles(stub_server, tmp_path):
+    cache = OsmCache(str(tmp_path), ttl=60)
+
+    def respond(path):
+        bbox = requested_bbox(path)
+        if bbox.max_lat - bbox.min_lat > 0.006:
+            return 400, {}, TOO_MANY_NODES
+        return serve_map(path)
+
+    stub_server.respond = respond
+    downloader(stub_server, cache=cache).download(AREA)
+
+    assert len(downloader(stub_server, cache=cache).cached_digests(split_bbox(AREA))) == 4 * 4
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from map_bridge_core.buildings import extrude_footprints
+from map_bridge_core.procedural import centerline_mesh, footprint_mesh
+from map_bridge_core.roads import ribbon
+
+
+SQUARE = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float32)
+LINE = np.array([[0, 0], [10, 0], [20, 5]], dtype=np.float32)
+
+
+def build(kind: str, way_id: int):
+    ids = np.array([way_id], dtype=np.int64)
+    if kind == 'building':
+        return extrude_footprints(SQUARE, np.array([0, 4]), ids).face_attributes['osm_id']
+    if kind == 'footprint':
+        return footprint_mesh(SQUARE, np.array([0, 4]), ids).face_attributes['osm_id']
+    if kind == 'road':
+        return ribbon(LINE, np.array([0, 3]), np.array([4.0]), ids).face_attributes['osm_id']
+    return centerline_mesh(LINE, np.array([0, 3]), np.array([4.0]), np.repeat(ids, 3),
+                           'road').point_attributes['osm_id']
+
+
+KINDS = ['building', 'footprint', 'road', 'centerline']
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_largest_osm_id_is_kept(kind):
+    osm_id = build(kind, 2 ** 31 - 1)
+
+    assert osm_id.dtype == np.int32
+    assert np.isin(osm_id, np.array([2 ** 31 - 1], dtype=np.int64)).all()
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_osm_id_beyond_32_bits_raises(kind):
+    with pytest.raises(ValueError, match="2147483648"):
+        build(kind, 2 ** 31)
@@ -0,0 +1,148 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.dataset import Dataset, load_dataset, save_dataset
+from map_bridge_core.osmchange import apply_change, parse_osc
+from map_bridge_core.pipeline import ImportSettings, build_ways, project_nodes
+from map_bridge_core.reader import parse_osm
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BBOX = BBox(43.7220, 10.3920, 43.7240, 10.3970)
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES_DIR, name)
+
+
+@pytest.fixture
+def base():
+    return parse_osm(fixture_path("base.osm"))
+
+
+def settings(**overrides) -> ImportSettings:
+    return ImportSettings(BBOX, 'EQUIRECTANGULAR', 'FILE', fixture_path("base.osm"), "", "", 0.01, 1,
+                          False, 0, 0, False, False, False)._replace(**overrides)
+
+
+def node_position(data, node_id: int) -> tuple[float, float]:
+    row = data.nodes.resolve(np.array([node_id]))[0]
+    assert row >= 0
+    return float(data.nodes.lat[row]), float(data.nodes.lon[row])
+
+
+def built_ids(result) -> set[int]:
+    return {int(osm_id) for arrays in result.meshes.values()
+            for osm_id in np.unique(arrays.face_attributes['osm_id'])}
+
+
+def test_parse_osc():
+    change = parse_osc(fixture_path("edits.osc"))
+
+    assert sorted(change.nodes.ids.tolist()) == [9, 10, 11, 12]
+    assert change.deleted_nodes.tolist() == [7, 8]
+    assert sorted(way.id for way in change.ways) == [100, 201, 202]
+    assert change.deleted_ways.tolist() == [300]
+
+    ways = {way.id: way for way in change.ways}
+    assert ways[201].refs.tolist() == [9, 10]
+    # Only the tags the import reads are kept
+    assert ways[201].tags == {'highway': 'service'}
+    assert ways[100].tags == {'building': 'house'}
+
+
+def test_parse_osc_later_action_wins():
+    change = parse_osc(io.BytesIO(b"""<osmChange version="0.6">
+        <create>
+          <node id="1" lat="1.0" lon="2.0"/>
+          <way id="5"><nd ref="1"/><nd ref="2"/><tag k="highway" v="service"/></way>
+        </create>
+        <modify><node id="1" lat="1.5" lon="2.5"/></modify>
+        <delete><way id="5"/></delete>
+        <modify><way id="6"><nd ref="1"/><nd ref="2"/><tag k="natural" v="tree_row"/></way></modify>
+      </osmChange>"""))
+
+    assert change.nodes.ids.tolist() == [1]
+    assert (change.nodes.lat[0], change.nodes.lon[0]) == (1.5, 2.5)
+    assert change.ways == []
+    # Ways whose tags are no longer imported are removed like deleted ones
+    assert change.deleted_ways.tolist() == [5, 6]
+
+
+def test_apply_change_moves_way_nodes(base):
+    data, affected = apply_change(base, parse_osc(fixture_path("move_node.osc")), BBOX)
+
+    assert affected.tolist() == [200]
+    assert node_position(data, 6) == (43.7235, 10.3955)
+    assert node_position(data, 5) == node_position(base, 5)
+    ways = {way.id: way for way in data.ways}
+    assert ways[200].refs.tolist() == [5, 6]
+    assert sorted(ways) == [100, 200, 300]
+
+
+def test_apply_change_creates_modifies_and_deletes(base):
+    data, affected = apply_change(base, parse_osc(fixture_path("edits.osc")), BBOX)
+
+    # The created way outside the area is not taken in, the deleted one is rebuilt away
+    assert affected.tolist() == [100, 201, 300]
+    ways = {way.id: way for way in data.ways}
+    assert sorted(ways) == [100, 200, 201]
+    assert ways[100].tags == {'building': 'house'}
+    assert node_position(data, 10) == (43.7236, 10.3950)
+    # Only nodes referenced by the kept ways stay in the dataset
+    assert sorted(data.nodes.ids.tolist()) == [1, 2, 3, 4, 5, 6, 9, 10]
+
+
+def test_apply_change_without_changes_in_area(base):
+    change = parse_osc(io.BytesIO(b"""<osmChange version="0.6"><create>
+        <node id="11" lat="45.0" lon="11.0"/><node id="12" lat="45.0001" lon="11.0"/>
+        <way id="202"><nd ref="11"/><nd ref="12"/><tag k="highway" v="track"/></way>
+      </create></osmChange>"""))
+    data, affected = apply_change(base, change, BBOX)
+
+    assert len(affected) == 0
+    assert sorted(way.id for way in data.ways) == [100, 200, 300]
+
+
+def test_changed_dataset_round_trip(base, tmp_path):
+    data, _ = apply_change(base, parse_osc(fixture_path("edits.osc")), BBOX)
+    path = str(tmp_path / "dataset.npz")
+    save_dataset(path, Dataset(data, BBOX))
+
+    dataset = load_dataset(path)
+    assert dataset.bbox == BBOX
+    assert [(way.id, way.refs.tolist(), way.tags) for way in dataset.data.ways] == \
+        [(way.id, way.refs.tolist(), way.tags) for way in data.ways]
+    np.testing.assert_array_equal(dataset.data.nodes.ids, data.nodes.ids)
+    np.testing.assert_array_equal(dataset.data.nodes.lat, data.nodes.lat)
+
+
+@pytest.mark.parametrize("osc, rebuilt", [
+    ("move_node.osc", {200}),
+    # Deleted ways have nothing left to build, their old faces are only removed
+    ("edits.osc", {100, 201}),
+])
+def test_rebuilt_features(base, osc, rebuilt):
+    frame, _ = project_nodes(base, settings().center, 'EQUIRECTANGULAR')
+    data, affected = apply_change(base, parse_osc(fixture_path(osc)), BBOX)
+
+    result = build_ways(data, affected, settings(), frame)
+    assert built_ids(result) == rebuilt
+
+
+def test_rebuilt_sidewalk_curves(base):
+    change = parse_osc(io.BytesIO(b"""<osmChange version="0.6"><modify>
+        <node id="8" lat="43.7233" lon="10.3955"/>
+      </modify></osmChange>"""))
+    frame, _ = project_nodes(base, settings().center, 'EQUIRECTANGULAR')
+    data, affected = apply_change(base, change, BBOX)
+
+    assert affected.tolist() == [300]
+    result = build_ways(data, affected, settings(sidewalks_as_curves=True), frame)
+    _, offsets = result.sidewalk_curves
+    assert offsets.tolist() == [0, 2]
+    assert built_ids(result) == set()
@@ -0,0 +1,107 @@
+import os
+import re
+import urllib.parse
+
+import pytest
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.downloader import DownloadError, split_bbox
+from map_bridge_core.overpass import (DEFAULT_OVERPASS_TILE_SIZE, WAY_CLASS_FILTERS, OverpassDownloader,
+                                      build_query)
+from map_bridge_core.reader import way_class
+
+
+OVERPASS_OSM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "overpass.osm")
+AREA = BBox(43.7220, 10.3920, 43.7240, 10.3970)
+TIMED_OUT = ' runtime error: Query timed out in "query" at line 1 after 180 seconds. '
+
+
+def matches(tag_filter: str, tags: dict[str, str]) -> bool:
+    """
+    Whether tags pass an Overpass tag filter made of ["k"], ["k"="v"] and ["k"!="v"] clauses
+    """
+    for key, operator, value in re.findall(r'\["([^"]+)"(?:(!?=)"([^"]*)")?\]', tag_filter):
+        if key not in tags:
+            return False
+        if operator == '=' and tags[key] != value or operator == '!=' and tags[key] == value:
+            return False
+    return True
+
+
+def requested_query(path: str) -> str:
+    return urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)['data'][0]
+
+
+def downloader(server, **kwargs) -> OverpassDownloader:
+    return OverpassDownloader(f"{server.url}/api", max_retries=0, **kwargs)
+
+
+def test_query_shape():
+    query = build_query(BBox(1.5, 2.5, 3.5, 4.5), timeout=60)
+
+    assert query == (
+        '[out:xml][timeout:60][bbox:1.5,2.5,3.5,4.5];'
+        '(way["building"]["building"!="no"];way["highway"];way["footway"="sidewalk"];);'
+        'out body qt;>;out skel qt;'
+    )
+
+
+def test_query_of_some_classes():
+    query = build_query(AREA, ('road',))
+
+    assert '(way["highway"];);' in query
+    assert 'building' not in query and 'footway' not in query
+
+
+@pytest.mark.parametrize("tags", [
+    {'building': 'yes'},
+    {'building': 'no'},
+    {'building': 'no', 'highway': 'service'},
+    {'highway': 'residential'},
+    {'footway': 'sidewalk'},
+    {'footway': 'crossing'},
+    {'natural': 'tree_row'},
+])
+def test_filters_select_the_imported_ways(tags):
+    selected = [name for name, tag_filter in WAY_CLASS_FILTERS.items() if matches(tag_filter, tags)]
+
+    expected = way_class(tags)
+    assert selected == ([expected] if expected else [])
+
+
+def test_error_remarks_raise():
+    overpass = OverpassDownloader()
+
+    overpass.check_remarks([" runtime remark: Timeout is 180 and maxsize is 536870912. "])
+    with pytest.raises(DownloadError, match="Query timed out"):
+        overpass.check_remarks([TIMED_OUT])
+
+
+def test_fetch(stub_server):
+    with open(OVERPASS_OSM, 'rb') as f:
+        body = f.read()
+    stub_server.respond = lambda path: (200, {'Content-Type': 'application/osm3s+xml'}, body)
+
+    data = downloader(stub_server).download(AREA)
+
+    [path] = stub_server.paths
+    assert path.startswith("/api/interpreter?data=")
+    assert requested_query(path) == build_query(split_bbox(AREA, DEFAULT_OVERPASS_TILE_SIZE)[0])
+    assert sorted(way.id for way in data.ways) == [100, 200, 300]
+    assert sorted(data.nodes.ids.tolist()) == [1, 2, 3, 4, 5, 6, 7, 8]
+
+
+def test_fetch_with_error_remark_fails(stub_server):
+    body = f'<osm version="0.6"><remark>{TIMED_OUT}</remark></osm>'.encode()
+    stub_server.respond = lambda path: (200, {}, body)
+
+    with pytest.raises(DownloadError, match="Query timed out"):
+        downloader(stub_server).download(AREA)
+
+
+def test_rejected_queries_are_not_split(stub_server):
+    stub_server.respond = lambda path: (400, {}, b"Error: line 1: parse error")
+
+    with pytest.raises(DownloadError, match="400"):
+        downloader(stub_server).download(AREA)
+    assert len(stub_server.paths) == 1
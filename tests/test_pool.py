@@ -0,0 +1,32 @@
+import os
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.pipeline import ImportResult, ImportSettings, build_in_processes, data_rect, project_nodes
+from map_bridge_core.pool import map_in_processes
+from map_bridge_core.reader import parse_osm
+from map_bridge_core.spatial import split_rect
+
+
+BASE_OSM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "base.osm")
+
+
+def test_workers_return_classes_of_this_package(capsys):
+    results = map_in_processes(BBox, [(0, 0, 1, 1), (1, 1, 2, 2)], 2)
+
+    assert "running in-process" not in capsys.readouterr().out
+    assert results == [BBox(0, 0, 1, 1), BBox(1, 1, 2, 2)]
+    assert all(type(result) is BBox for result in results)
+
+
+def test_build_in_processes(capsys):
+    bbox = BBox(43.7220, 10.3920, 43.7240, 10.3970)
+    settings = ImportSettings(bbox, 'EQUIRECTANGULAR', 'FILE', BASE_OSM, "", "", 0.01, 1,
+                              False, 0, 0, False, False, False, build_workers=2)
+    osm_data = parse_osm(BASE_OSM)
+    frame, xy = project_nodes(osm_data, settings.center, settings.projection)
+
+    results = build_in_processes(osm_data, xy, settings, frame, split_rect(data_rect(xy), 2))
+
+    assert "running in-process" not in capsys.readouterr().out
+    assert all(isinstance(result, ImportResult) for result in results)
+    assert sum(result.building_count for result in results) == 1
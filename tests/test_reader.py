@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.reader import OsmStreamParser, merge_osm_data, parse_osm
+
+
+BASE_OSM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "base.osm")
+# Around node 6 only, the end of the road
+ROAD_END = BBox(43.7229, 10.3940, 43.7231, 10.3960)
+
+
+def summary(data) -> tuple:
+    nodes = sorted(zip(data.nodes.ids.tolist(), data.nodes.lat.tolist(), data.nodes.lon.tolist()))
+    ways = sorted((way.id, way.refs.tolist(), way.tags) for way in data.ways)
+    return nodes, ways
+
+
+def read_bytes() -> bytes:
+    with open(BASE_OSM, 'rb') as f:
+        return f.read()
+
+
+def test_parse_path():
+    nodes, ways = summary(parse_osm(BASE_OSM))
+
+    # The tree row, its tree node and the relation are not imported
+    assert [node_id for node_id, _, _ in nodes] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert nodes[0] == (1, 43.7225, 10.3930)
+    assert ways == [
+        (100, [1, 2, 3, 4, 1], {'building': 'yes'}),
+        (200, [5, 6], {'highway': 'residential'}),
+        (300, [7, 8], {'footway': 'sidewalk'}),
+    ]
+
+
+@pytest.mark.parametrize("bbox", [None, ROAD_END])
+def test_stream_matches_path(bbox):
+    assert summary(parse_osm(io.BytesIO(read_bytes()), bbox)) == summary(parse_osm(BASE_OSM, bbox))
+
+
+def test_stream_in_small_chunks():
+    content = read_bytes()
+    parser = OsmStreamParser()
+    for start in range(0, len(content), 7):
+        parser.feed(content[start:start + 7])
+
+    assert summary(parser.close()) == summary(parse_osm(BASE_OSM))
+
+
+def test_bbox_keeps_ways_with_a_node_inside():
+    nodes, ways = summary(parse_osm(BASE_OSM, ROAD_END))
+
+    # The road keeps its node outside the bbox
+    assert [way_id for way_id, _, _ in ways] == [200]
+    assert [node_id for node_id, _, _ in nodes] == [5, 6]
+
+
+def test_remarks_are_collected():
+    parser = OsmStreamParser()
+    parser.feed(b'<osm version="0.6"><remark>runtime error: Query timed out</remark></osm>')
+
+    data = parser.close()
+    assert parser.remarks == ["runtime error: Query timed out"]
+    assert data.ways == []
+
+
+def test_merge_keeps_border_elements_once():
+    merged = merge_osm_data([parse_osm(BASE_OSM, ROAD_END), parse_osm(BASE_OSM)])
+
+    assert summary(merged) == summary(parse_osm(BASE_OSM))
@@ -0,0 +1,58 @@
+import numpy as np
+
+from map_bridge_core.spatial import Rect, clip_polylines, clip_to_rect, cull_to_rect
+
+
+# Edges of an import bbox in local meters, float32 rounds 512.3 down and 812.7 up, so ways
+# lying exactly on them end up just outside a float64 rect
+RECT = Rect(512.3, 0.0, 600.0, 812.7)
+ON_EDGES = [
+    [(520.0, 812.7), (580.0, 812.7)],  # on the top edge
+    [(580.0, 812.7), (620.0, 812.7)],  # along the top edge and out through the right one
+    [(512.3, 100.0), (512.3, 200.0)],  # on the left edge
+    [(500.0, 300.0), (550.0, 300.0)],  # across the left edge
+]
+
+
+def polylines(lines: list[list[tuple[float, float]]]) -> tuple[np.ndarray, np.ndarray]:
+    coords = np.array([point for line in lines for point in line], dtype=np.float32)
+    offsets = np.cumsum([0] + [len(line) for line in lines])
+    return coords, offsets
+
+
+def test_rect_edges_are_off_in_float32():
+    assert float(np.float32(RECT.min_x)) < RECT.min_x
+    assert float(np.float32(RECT.max_y)) > RECT.max_y
+
+
+def test_ways_on_the_edges_are_clipped_not_dropped():
+    coords, offsets = polylines(ON_EDGES)
+
+    clipped, clipped_offsets, source = clip_to_rect(coords, offsets, RECT)
+
+    assert clipped.dtype == np.float32
+    assert sorted(source.tolist()) == [0, 1, 2, 3]
+    pieces = {int(way): clipped[start:end].tolist()
+              for way, start, end in zip(source, clipped_offsets[:-1], clipped_offsets[1:])}
+    top = float(np.float32(RECT.max_y))
+    left = float(np.float32(RECT.min_x))
+    assert pieces[0] == [[520.0, top], [580.0, top]]
+    assert pieces[1] == [[580.0, top], [600.0, top]]
+    assert pieces[2] == [[left, 100.0], [left, 200.0]]
+    assert pieces[3] == [[left, 300.0], [550.0, 300.0]]
+
+
+def test_footprints_centered_on_the_edges_are_kept():
+    coords, offsets = polylines(ON_EDGES)
+
+    assert cull_to_rect(coords, offsets, RECT).tolist() == [True, True, True, True]
+
+
+def test_ways_leaving_and_entering_are_split():
+    coords, offsets = polylines([[(0.0, 5.0), (20.0, 5.0), (20.0, 8.0), (0.0, 8.0)]])
+
+    clipped, clipped_offsets, source = clip_polylines(coords, offsets, Rect(0.0, 0.0, 10.0, 10.0))
+
+    assert clipped.tolist() == [[0.0, 5.0], [10.0, 5.0], [10.0, 8.0], [0.0, 8.0]]
+    assert clipped_offsets.tolist() == [0, 2, 4]
+    assert source.tolist() == [0, 0]
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from map_bridge_core import store
+from map_bridge_core.cache import OsmCache
+from map_bridge_core.dataset import DatasetStore
+from map_bridge_core.geometry_cache import GeometryCache
+
+
+def age(cache, key: str, seconds: float) -> None:
+    """
+    Move the last access of an entry back in time
+    """
+    accessed = time.time() - seconds
+    os.utime(cache._record_path(key), (accessed, accessed))
+
+
+def test_osm_cache_round_trip(tmp_path):
+    cache = OsmCache(str(tmp_path), ttl=60)
+    cache.put("a", b"body", {'etag': '"1"'})
+
+    entry = cache.get("a")
+    assert entry.fresh
+    assert entry.conditional_headers() == {'If-None-Match': '"1"'}
+    with open(entry.path, 'rb') as f:
+        assert f.read() == b"body"
+    assert cache.get("b") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OsmCache(str(tmp_path), max_bytes=250)
+    cache.put("a", bytes(100), {})
+    cache.put("b", bytes(100), {})
+    age(cache, "a", 30)
+    age(cache, "b", 10)
+
+    cache.put("c", bytes(100), {})
+    assert cache.get("a") is None
+    age(cache, "b", 10)
+    age(cache, "c", 20)
+
+    cache.put("d", bytes(100), {})
+    assert cache.get("b") is not None
+    assert cache.get("c") is None
+    assert cache.get("d") is not None
+
+
+def test_writes_below_the_limit_do_not_scan(tmp_path, monkeypatch):
+    cache = OsmCache(str(tmp_path), max_bytes=1000)
+    cache.put("a", bytes(100), {})
+
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(store.os, 'scandir', lambda path: scans.append(path) or scandir(path))
+    for key in "bcdefgh":
+        cache.put(key, bytes(100), {})
+    assert scans == []
+
+    # Replacing an entry counts its new size only
+    cache.put("a", bytes(200), {})
+    assert scans == []
+    cache.put("i", bytes(200), {})
+    assert len(scans) == 1
+    assert sum(os.path.getsize(cache._body_path(key)) for key in "abcdefghi"
+               if os.path.exists(cache._body_path(key))) <= 1000
+
+
+def test_geometry_cache_round_trip(tmp_path):
+    cache = GeometryCache(str(tmp_path))
+    arrays = {'vertices': np.arange(12, dtype=np.float32).reshape(4, 3),
+              'ids': np.array([7, 8], dtype=np.int64)}
+    cache.put("k", arrays, {'count': 2})
+
+    cached, meta = cache.get("k")
+    assert meta == {'count': 2}
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(cached[name], array)
+    assert cache.get("k", max_age=0) is None
+    assert cache.get("k", max_age=60) is not None
+
+
+def test_geometry_cache_drops_older_formats(tmp_path):
+    cache = GeometryCache(str(tmp_path))
+    cache.put("k", {'ids': np.array([1], dtype=np.int64)}, {})
+    with open(cache._record_path("k"), 'r', encoding='utf-8') as f:
+        record = json.load(f)
+    record['version'] = 0
+    with open(cache._record_path("k"), 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+
+    assert cache.get("k") is None
+    assert not os.path.exists(cache._body_path("k"))
+
+
+def test_referenced_datasets_are_not_evicted(tmp_path):
+    datasets = DatasetStore(str(tmp_path), max_bytes=250)
+    paths = [datasets.new_path() for _ in range(3)]
+    for path in paths[:2]:
+        with open(path, 'wb') as f:
+            f.write(bytes(100))
+        datasets.added(path)
+    age(datasets, os.path.basename(paths[0])[:-4], 30)
+    age(datasets, os.path.basename(paths[1])[:-4], 20)
+
+    # The oldest dataset is still referenced, the next one goes instead
+    with open(paths[2], 'wb') as f:
+        f.write(bytes(100))
+    datasets.added(paths[2], referenced=[paths[0]])
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
@@ -0,0 +1,165 @@
+import struct
+
+import numpy as np
+import pytest
+
+from map_bridge_core.bbox import BBox
+from map_bridge_core.terrain import Terrain, read_geotiff, read_hgt, sample_raster
+
+
+# 3x3 samples half a degree apart, row 0 is the northmost: the height is 100 * row + column
+GRID = np.array([[0, 1, 2], [100, 101, 102], [200, 201, 202]], dtype=np.int16)
+HGT_VOID = -32768
+
+# TIFF field types
+_SHORT, _LONG, _DOUBLE, _ASCII = 3, 4, 12, 2
+_TYPE_FORMATS = {_SHORT: 'H', _LONG: 'I', _DOUBLE: 'd'}
+
+
+def write_hgt(path, values: np.ndarray) -> str:
+    values.astype('>i2').tofile(path)
+    return str(path)
+
+
+def write_geotiff(path, values: np.ndarray, west: float, north: float, step: float,
+                  pixel_is_point: bool = True, nodata: str | None = None, compression: int = 1) -> str:
+    """
+    Minimal little-endian single strip GeoTIFF of int16 values, georeferenced at its first
+    sample
+    """
+    height, width = values.shape
+    fields = {
+        256: (_LONG, [width]),
+        257: (_LONG, [height]),
+        258: (_SHORT, [16]),
+        259: (_SHORT, [compression]),
+        273: (_LONG, [0]),  # strip offset, set once the layout is known
+        277: (_SHORT, [1]),
+        279: (_LONG, [values.nbytes]),
+        339: (_SHORT, [2]),  # signed integers
+        33550: (_DOUBLE, [step, step, 0.0]),
+        33922: (_DOUBLE, [0.0, 0.0, 0.0, west, north, 0.0]),
+        34735: (_SHORT, [1, 1, 0, 1, 1025, 0, 1, 2 if pixel_is_point else 1]),
+    }
+    if nodata is not None:
+        fields[42113] = (_ASCII, nodata)
+
+    def payload(field_type, value) -> bytes:
+        if field_type == _ASCII:
+            return value.encode() + b'\0'
+        return struct.pack(f"<{len(value)}{_TYPE_FORMATS[field_type]}", *value)
+
+    directory_end = 8 + 2 + 12 * len(fields) + 4
+    extra_size = sum(len(payload(*field)) for field in fields.values() if len(payload(*field)) > 4)
+    fields[273] = (_LONG, [directory_end + extra_size])
+
+    entries = b""
+    extra = b""
+    for tag, (field_type, value) in sorted(fields.items()):
+        data = payload(field_type, value)
+        count = len(data) if field_type == _ASCII else len(value)
+        if len(data) > 4:
+            entries += struct.pack('<HHII', tag, field_type, count, directory_end + len(extra))
+            extra += data
+        else:
+            entries += struct.pack('<HHI4s', tag, field_type, count, data.ljust(4, b'\0'))
+
+    with open(path, 'wb') as f:
+        f.write(b'II*\0' + struct.pack('<I', 8))
+        f.write(struct.pack('<H', len(fields)) + entries + struct.pack('<I', 0))
+        f.write(extra)
+        f.write(values.astype('<i2').tobytes())
+    return str(path)
+
+
+def sample(raster, points: list[tuple[float, float]]) -> np.ndarray:
+    lat, lon = np.array(points, dtype=np.float64).T
+    return sample_raster(raster, lat, lon)
+
+
+def test_hgt_georeferencing(tmp_path):
+    raster = read_hgt(write_hgt(tmp_path / "N43E010.hgt", GRID))
+
+    assert raster.bbox == BBox(43.0, 10.0, 44.0, 11.0)
+    assert (raster.dlat, raster.dlon) == (0.5, 0.5)
+    raster = read_hgt(write_hgt(tmp_path / "S01W002.hgt", GRID))
+    assert raster.bbox == BBox(-1.0, -2.0, 0.0, -1.0)
+
+
+def test_hgt_sampling(tmp_path):
+    raster = read_hgt(write_hgt(tmp_path / "N43E010.hgt", GRID))
+
+    heights = sample(raster, [(44.0, 10.0), (44.0, 11.0), (43.0, 10.0), (43.75, 10.25), (43.5, 10.75),
+                              (42.9, 10.5), (43.5, 11.1)])
+
+    np.testing.assert_allclose(heights[:5], [0, 2, 200, 50.5, 101.5])
+    assert np.isnan(heights[5:]).all()
+
+
+def test_void_samples_drop_out(tmp_path):
+    grid = GRID.copy()
+    grid[1, 1] = HGT_VOID
+    raster = read_hgt(write_hgt(tmp_path / "N43E010.hgt", grid))
+
+    heights = sample(raster, [(43.75, 10.25), (43.5, 10.5)])
+
+    # The three other corners weighted up, nothing left on the void sample itself
+    np.testing.assert_allclose(heights[0], (0 + 1 + 100) / 3, rtol=1e-6)
+    assert np.isnan(heights[1])
+
+
+@pytest.mark.parametrize("name, size", [("elevation.hgt", 9), ("N43E010.hgt", 8)])
+def test_invalid_hgt_files_are_refused(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(bytes(2 * size))
+
+    with pytest.raises(ValueError):
+        read_hgt(str(path))
+
+
+def test_geotiff_matches_hgt(tmp_path):
+    hgt = read_hgt(write_hgt(tmp_path / "N43E010.hgt", GRID))
+    tiff = read_geotiff(write_geotiff(tmp_path / "dem.tif", GRID, 10.0, 44.0, 0.5))
+
+    assert tiff.bbox == hgt.bbox
+    points = [(43.0 + lat, 10.0 + lon) for lat in np.linspace(0, 1, 7) for lon in np.linspace(0, 1, 5)]
+    np.testing.assert_allclose(sample(tiff, points), sample(hgt, points))
+
+
+def test_geotiff_pixel_is_area(tmp_path):
+    # Georeferenced at the outer corner of the first pixel, a quarter degree off its centre
+    raster = read_geotiff(write_geotiff(tmp_path / "dem.tif", GRID, 9.75, 44.25, 0.5, pixel_is_point=False))
+
+    assert (raster.north, raster.west) == (44.0, 10.0)
+    np.testing.assert_allclose(sample(raster, [(43.75, 10.25)]), [50.5])
+
+
+def test_geotiff_nodata(tmp_path):
+    grid = GRID.copy()
+    grid[0, 0] = -9999
+    raster = read_geotiff(write_geotiff(tmp_path / "dem.tif", grid, 10.0, 44.0, 0.5, nodata="-9999"))
+
+    assert raster.nodata == -9999
+    np.testing.assert_allclose(sample(raster, [(43.75, 10.25)]), [(1 + 100 + 101) / 3], rtol=1e-6)
+
+
+def test_compressed_geotiff_is_refused(tmp_path):
+    path = write_geotiff(tmp_path / "dem.tif", GRID, 10.0, 44.0, 0.5, compression=5)
+
+    with pytest.raises(ValueError, match="uncompressed"):
+        read_geotiff(path)
+
+
+def test_terrain_opens_the_rasters_of_the_area(tmp_path):
+    write_hgt(tmp_path / "N43E010.hgt", GRID)
+    # Far from the area and not even a valid tile, never opened
+    (tmp_path / "N10E010.hgt").write_bytes(b"\0")
+
+    terrain = Terrain.open(str(tmp_path), BBox(43.2, 10.2, 43.8, 10.8))
+    heights = terrain.sample(np.array([43.75, 45.0]), np.array([10.25, 10.0]))
+
+    assert len(terrain.rasters) == 1
+    # The point outside every raster gets the mean of the others
+    np.testing.assert_allclose(heights, [50.5, 50.5])
+    with pytest.raises(ValueError, match="No elevation data"):
+        Terrain.open(str(tmp_path), BBox(20.0, 20.0, 21.0, 21.0))